@@ -1,6 +1,6 @@
 """
 AI Model package for anomaly detection using Isolation Forest
 """
-from .model import train_model, predict
+from .model import train_model, predict, predict_batch
 
-__all__ = ["train_model", "predict"]
+__all__ = ["train_model", "predict", "predict_batch"]
@@ -1,93 +1,273 @@
 """
 Script to generate training data from existing metrics in the database.
-This extracts heart_rate and motion_intensity from the metrics table.
+This extracts heart_rate and motion_intensity from the metrics table, with the
+user and the hour of day (UTC) of each reading for stratified sampling (ai_model/sampling.py).
+
+Rows are filtered in SQL, streamed from a server-side cursor (`yield_per`) and
+written in chunks, so memory stays flat however large the table is. The id of
+the last exported metric is kept in training_data.meta.json; with --incremental
+only newer rows are read and appended (nightly refresh). Without it, or when the
+existing output cannot be appended to, the file is rebuilt from scratch.
+
+Ingestion commits its shards in parallel, so a reading can become visible after
+one with a higher id. Each incremental run therefore re-reads the last
+TRAINING_OVERLAP_IDS ids before the previous high-water mark and skips the ids
+that run already exported (kept in the meta file), instead of losing late rows.
+
+Usage: python ai_model/generate_training_data.py [--incremental] [--format csv|parquet] [--chunk-rows 50000]
 """
-import sys
+import argparse
+import csv
+import json
 import os
-import pandas as pd
+import shutil
+import sys
+from datetime import datetime, timezone
 
 # Add parent directory to path to import database modules
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from sqlalchemy import func, select
 from database import SessionLocal
 from models_db import Metrics
+from services.export import pyarrow_available
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 OUTPUT_PATH = os.path.join(BASE_DIR, "training_data.csv")
+# Parquet output is a directory of part files, one per run, so refreshes can append
+PARQUET_OUTPUT_PATH = os.path.join(BASE_DIR, "training_data.parquet")
+META_PATH = os.path.join(BASE_DIR, "training_data.meta.json")
+
+TRAINING_CHUNK_ROWS = 50000
+# Ids re-read below the previous high-water mark; far more than ingestion can have
+# uncommitted at once (INGEST_MAX_INFLIGHT_BATCHES x INGEST_BATCH_SIZE)
+TRAINING_OVERLAP_IDS = 10000
+TRAINING_COLUMNS = ("heart_rate", "motion_intensity", "user_id", "hour")
+
+# CRITICAL: Only normal, healthy data is used for training
+# Isolation Forest learns "normal" patterns, then flags everything else as anomaly
+# Training on anomalies will confuse the model!
+NORMAL_HEART_RATE = (60, 100)   # Normal HR range (BPM)
+NORMAL_MOTION = (0, 60)         # Normal motion (not vigorous exercise)
+
+
+def read_meta():
+    """The high-water mark of the last run, or None when there is none."""
+    if not os.path.exists(META_PATH):
+        return None
+    try:
+        with open(META_PATH) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
 
+def _write_meta(meta):
+    tmp_path = META_PATH + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(meta, f, indent=2)
+    os.replace(tmp_path, META_PATH)
 
-def generate_training_data(min_samples=100):
+
+def _row_chunks(db, after_id: int, upto_id: int, chunk_rows: int):
+    """
+    Normal-range (id, heart_rate, motion_intensity, user_id, timestamp) rows with
+    after_id < id <= upto_id, by id, in chunks.
+    """
+    stmt = select(Metrics.id, Metrics.heart_rate, Metrics.motion_intensity, Metrics.user_id, Metrics.timestamp).where(
+        Metrics.id > after_id,
+        Metrics.id <= upto_id,
+        Metrics.heart_rate.between(*NORMAL_HEART_RATE),
+        Metrics.motion_intensity.between(*NORMAL_MOTION)
+    ).order_by(Metrics.id).execution_options(yield_per=chunk_rows)
+
+    for partition in db.execute(stmt).partitions():
+        yield partition
+
+
+def _unexported(chunks, exported_ids: set, recent_from: int, recent_ids: list):
+    """
+    Drop rows whose id was already exported; collect the ids above recent_from
+    that are exported now. Empty chunks are skipped.
+    """
+    for rows in chunks:
+        rows = [row for row in rows if row[0] not in exported_ids]
+        recent_ids.extend(row[0] for row in rows if row[0] > recent_from)
+        if rows:
+            yield rows
+
+
+def _write_csv(chunks, path: str, append: bool):
+    """Write (or append) the chunks to a CSV file. Returns the number of rows written."""
+    rows_written = 0
+    with open(path, "a" if append else "w", newline="") as f:
+        writer = csv.writer(f)
+        if not append:
+            writer.writerow(TRAINING_COLUMNS)
+        for rows in chunks:
+            writer.writerows(
+                (heart_rate, motion_intensity, user_id, _hour(timestamp))
+                for _, heart_rate, motion_intensity, user_id, timestamp in rows
+            )
+            rows_written += len(rows)
+    return rows_written
+
+
+def _write_parquet(chunks, path: str):
+    """Write the chunks to one Parquet file, a row group per chunk. Returns the number of rows written."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ("heart_rate", pa.float64()),
+        ("motion_intensity", pa.float64()),
+        ("user_id", pa.int64()),
+        ("hour", pa.int8()),
+    ])
+    rows_written = 0
+    with pq.ParquetWriter(path, schema) as writer:
+        for rows in chunks:
+            _, heart_rates, motion_intensities, user_ids, timestamps = zip(*rows)
+            writer.write_table(pa.Table.from_arrays([
+                pa.array(heart_rates, pa.float64()),
+                pa.array(motion_intensities, pa.float64()),
+                pa.array(user_ids, pa.int64()),
+                pa.array([_hour(t) for t in timestamps], pa.int8()),
+            ], schema=schema))
+            rows_written += len(rows)
+    return rows_written
+
+
+def _hour(timestamp):
+    if timestamp is None:
+        return None
+    return timestamp.astimezone(timezone.utc).hour if timestamp.tzinfo else timestamp.hour
+
+
+def _can_append(meta, file_format: str) -> bool:
+    if not meta or meta.get("format") != file_format or meta.get("columns") != list(TRAINING_COLUMNS):
+        return False
+    if file_format == "csv":
+        # The file must still be exactly what the last run left behind
+        return os.path.exists(OUTPUT_PATH) and os.path.getsize(OUTPUT_PATH) >= meta.get("bytes", 0)
+    return os.path.isdir(PARQUET_OUTPUT_PATH)
+
+
+def generate_training_data(min_samples=100, incremental=False, file_format="csv", chunk_rows=TRAINING_CHUNK_ROWS):
     """
     Extract training data from the metrics table.
 
     Args:
         min_samples: Minimum number of samples needed for training
+        incremental: Append only the rows added since the last run
+        file_format: "csv" (training_data.csv) or "parquet" (training_data.parquet/)
+        chunk_rows: Rows fetched and written per chunk
 
     Returns:
-        Number of samples extracted
+        Number of samples extracted by this run
     """
+    if file_format not in ("csv", "parquet"):
+        raise ValueError("file_format must be csv or parquet")
+    if file_format == "parquet" and not pyarrow_available():
+        raise ValueError("Parquet output requires the pyarrow package")
+
+    meta = read_meta()
+    append = incremental and _can_append(meta, file_format)
+    if incremental and not append:
+        print("No usable previous output - rebuilding from scratch")
+
+    after_id = meta["last_metric_id"] if append else 0
+    previous_rows = meta["rows"] if append else 0
+    output = OUTPUT_PATH if file_format == "csv" else PARQUET_OUTPUT_PATH
+    # A rebuild is written next to the old output and swapped in once complete
+    target = output if append else output + ".tmp"
+
     db = SessionLocal()
 
     try:
-        # Query all metrics
-        metrics = db.query(Metrics).all()
-
-        if len(metrics) < min_samples:
-            print(f"Warning: Only {len(metrics)} samples found. Recommended minimum: {min_samples}")
-            if len(metrics) < 10:
-                raise ValueError("Not enough data to train. Need at least 10 samples.")
-
-        # Extract data into DataFrame
-        data = {
-            "heart_rate": [m.heart_rate for m in metrics],
-            "motion_intensity": [m.motion_intensity for m in metrics]
-        }
-
-        df = pd.DataFrame(data)
-
-        # Remove any invalid values (NaN, inf, etc.)
-        df = df.apply(pd.to_numeric, errors="coerce").dropna()
-
-        # Filter out obviously invalid values
-        df = df[
-            (df["heart_rate"] >= 20) & (df["heart_rate"] <= 255) &  # Valid BPM range
-            (df["motion_intensity"] >= 0) & (df["motion_intensity"] <= 100)  # Valid motion range
-        ]
-
-        # CRITICAL: Filter to ONLY normal, healthy data for training
-        # Isolation Forest learns "normal" patterns, then flags everything else as anomaly
-        # Training on anomalies will confuse the model!
-        df = df[
-            (df["heart_rate"] >= 60) & (df["heart_rate"] <= 100) &  # Normal HR range
-            (df["motion_intensity"] >= 0) & (df["motion_intensity"] <= 60)  # Normal motion (not vigorous exercise)
-        ]
-
-        print(f"\n✓ Filtered to normal data only:")
-        print(f"  - Heart Rate: 60-100 BPM")
-        print(f"  - Motion: 0-60%")
-        print(f"  - Samples after filtering: {len(df)}")
-
-        if len(df) < 10:
-            raise ValueError(f"After filtering, only {len(df)} valid samples remain. Need at least 10.")
-
-        # Save to CSV
-        df.to_csv(OUTPUT_PATH, index=False)
-
-        print(f"✓ Training data generated successfully!")
-        print(f"  - Total samples: {len(df)}")
-        print(f"  - Output file: {OUTPUT_PATH}")
-        print(f"\nData statistics:")
-        print(df.describe())
-
-        return len(df)
+        # Fix the upper bound first, so rows inserted while we stream wait for the next run
+        upto_id = db.query(func.max(Metrics.id)).scalar() or 0
+
+        # Re-read the overlap for rows committed late; older meta files have no
+        # recent_ids, so their runs start at the high-water mark
+        exported_ids = set(meta.get("recent_ids", [])) if append else set()
+        scan_from = max(after_id - TRAINING_OVERLAP_IDS, 0) if append and "recent_ids" in meta else after_id
+        recent_from = max(upto_id, after_id) - TRAINING_OVERLAP_IDS
+        recent_ids = [i for i in exported_ids if i > recent_from]
+        chunks = _unexported(_row_chunks(db, scan_from, upto_id, chunk_rows), exported_ids, recent_from, recent_ids)
 
+        if file_format == "csv":
+            if append:
+                # Drop anything a crashed run appended after the last recorded state
+                with open(target, "r+") as f:
+                    f.truncate(meta["bytes"])
+            written = _write_csv(chunks, target, append)
+            parts = None
+        else:
+            parts = list(meta.get("parts", [])) if append else []
+            if not append:
+                shutil.rmtree(target, ignore_errors=True)
+            os.makedirs(target, exist_ok=True)
+            # Runs that only found late rows keep the same ids range: number the parts
+            part = f"part-{after_id:012d}-{upto_id:012d}-{len(parts):05d}.parquet"
+            written = _write_parquet(chunks, os.path.join(target, part))
+            if written:
+                parts.append(part)
+            else:
+                os.remove(os.path.join(target, part))
     finally:
         db.close()
 
+    total = previous_rows + written
+    if total < 10:
+        if not append and os.path.isdir(target):
+            shutil.rmtree(target)
+        elif not append:
+            os.remove(target)
+        raise ValueError(f"After filtering, only {total} valid samples remain. Need at least 10.")
+
+    if not append:
+        if os.path.isdir(output):
+            shutil.rmtree(output)
+        os.replace(target, output)
+
+    new_meta = {
+        "format": file_format,
+        "columns": list(TRAINING_COLUMNS),
+        "last_metric_id": max(upto_id, after_id),
+        "recent_ids": sorted(recent_ids),
+        "rows": total,
+        "updated_at": datetime.now(timezone.utc).isoformat()
+    }
+    if file_format == "csv":
+        new_meta["bytes"] = os.path.getsize(OUTPUT_PATH)
+    else:
+        new_meta["parts"] = parts
+    _write_meta(new_meta)
+
+    print("\n✓ Filtered to normal data only:")
+    print(f"  - Heart Rate: {NORMAL_HEART_RATE[0]}-{NORMAL_HEART_RATE[1]} BPM")
+    print(f"  - Motion: {NORMAL_MOTION[0]}-{NORMAL_MOTION[1]}%")
+    print(f"  - Samples added by this run: {written}")
+    print(f"  - Total samples: {total}")
+    print(f"  - Output: {OUTPUT_PATH if file_format == 'csv' else PARQUET_OUTPUT_PATH}")
+    print(f"  - Last metric id: {upto_id}")
+
+    if total < min_samples:
+        print(f"Warning: Only {total} samples found. Recommended minimum: {min_samples}")
+
+    return written
+
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate training data from the metrics table")
+    parser.add_argument("--incremental", action="store_true", help="Append only rows added since the last run")
+    parser.add_argument("--format", choices=["csv", "parquet"], default="csv", help="Output format")
+    parser.add_argument("--chunk-rows", type=int, default=TRAINING_CHUNK_ROWS, help="Rows fetched and written per chunk")
+    args = parser.parse_args()
+
     try:
-        count = generate_training_data()
+        count = generate_training_data(incremental=args.incremental, file_format=args.format, chunk_rows=args.chunk_rows)
         print(f"\n✓ Successfully generated {count} training samples")
     except Exception as e:
         print(f"✗ Error: {e}")
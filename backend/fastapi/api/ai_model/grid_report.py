@@ -0,0 +1,97 @@
+"""
+Accuracy report for the compiled (score grid) inference mode.
+Compares bilinear interpolation in grids of several resolutions against the
+exact Isolation Forest on random readings from the valid input range.
+
+Usage: python ai_model/grid_report.py
+"""
+import sys
+import os
+import time
+import numpy as np
+
+# Add parent directory to path to import the ai_model package
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ai_model.model import (
+    compile_score_grid, current_version, interpolate_scores, load_version,
+    MIN_HEART_RATE, MAX_HEART_RATE, MIN_MOTION, MAX_MOTION, MIN_SCORE, MAX_SCORE
+)
+
+# (heart rate step in BPM, motion step in %)
+RESOLUTIONS = [(5.0, 5.0), (2.0, 2.0), (1.0, 1.0), (0.5, 0.5), (0.25, 0.25)]
+
+
+def _confidence_anomaly(scores):
+    return np.clip((MAX_SCORE - scores) / (MAX_SCORE - MIN_SCORE) * 100, 0, 100)
+
+
+def grid_accuracy_report(resolutions=RESOLUTIONS, samples: int = 20000, seed: int = 42):
+    """
+    Score `samples` random readings exactly and through grids of each resolution.
+    Returns one row per resolution with score and confidence errors, label agreement,
+    grid size and lookup time.
+    """
+    try:
+        loaded = load_version(current_version())
+    except FileNotFoundError:
+        raise FileNotFoundError("Model is not trained. Run ai_model/model.py first.")
+    model, scaler = loaded.model, loaded.scaler
+
+    rng = np.random.default_rng(seed)
+    heart_rates = rng.uniform(MIN_HEART_RATE, MAX_HEART_RATE, samples)
+    motion_intensities = rng.uniform(MIN_MOTION, MAX_MOTION, samples)
+
+    start = time.perf_counter()
+    features = np.column_stack((heart_rates, motion_intensities))
+    exact = model.decision_function((features - scaler.mean_) / scaler.scale_)
+    exact_seconds = time.perf_counter() - start
+
+    rows = []
+    for hr_step, motion_step in resolutions:
+        start = time.perf_counter()
+        grid = compile_score_grid(model, scaler, hr_step, motion_step)
+        compile_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        approx = interpolate_scores(grid, heart_rates, motion_intensities)
+        lookup_seconds = time.perf_counter() - start
+
+        error = np.abs(approx - exact)
+        confidence_error = np.abs(_confidence_anomaly(approx) - _confidence_anomaly(exact))
+
+        rows.append({
+            "resolution": f"{hr_step:g} BPM x {motion_step:g}%",
+            "grid_points": grid["scores"].size,
+            "grid_kb": round(grid["scores"].nbytes / 1024, 1),
+            "score_mae": float(error.mean()),
+            "score_p99": float(np.percentile(error, 99)),
+            "score_max": float(error.max()),
+            "confidence_mae": float(confidence_error.mean()),
+            "confidence_max": float(confidence_error.max()),
+            "label_agreement": float(((approx < 0) == (exact < 0)).mean() * 100),
+            "compile_s": compile_seconds,
+            "lookup_us_per_reading": lookup_seconds / samples * 1e6,
+        })
+
+    return {
+        "version": loaded.version,
+        "samples": samples,
+        "exact_us_per_reading": exact_seconds / samples * 1e6,
+        "rows": rows,
+    }
+
+
+if __name__ == "__main__":
+    report = grid_accuracy_report()
+
+    print(f"\nCompiled score grid vs exact Isolation Forest, model {report['version']} "
+          f"({report['samples']} random readings)")
+    print(f"Exact forest: {report['exact_us_per_reading']:.2f} us/reading (batched)\n")
+    print(f"{'Resolution':<20}{'Points':>8}{'KB':>8}{'Score MAE':>11}{'Score p99':>11}{'Score max':>11}"
+          f"{'Conf MAE':>10}{'Conf max':>10}{'Labels %':>10}{'us/read':>9}")
+    for row in report["rows"]:
+        print(f"{row['resolution']:<20}{row['grid_points']:>8}{row['grid_kb']:>8}"
+              f"{row['score_mae']:>11.5f}{row['score_p99']:>11.5f}{row['score_max']:>11.5f}"
+              f"{row['confidence_mae']:>10.3f}{row['confidence_max']:>10.3f}"
+              f"{row['label_agreement']:>10.3f}{row['lookup_us_per_reading']:>9.3f}")
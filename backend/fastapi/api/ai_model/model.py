@@ -1,39 +1,381 @@
-import pandas as pd
 import numpy as np
 import joblib
+import json
 import os
-from sklearn.ensemble import IsolationForest
-from sklearn.preprocessing import StandardScaler
+import shutil
+import time
+from datetime import datetime, timezone
+
+# pandas and scikit-learn are imported where they are used: importing this module
+# (and so the API) stays fast, and only training needs them up front. Loading a
+# model imports the scikit-learn modules its pickle refers to.
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DATA_PATH = os.path.join(BASE_DIR, "training_data.csv")
+PARQUET_DATA_PATH = os.path.join(BASE_DIR, "training_data.parquet")
+# Written by generate_training_data.py; says which output is the current one
+DATA_META_PATH = os.path.join(BASE_DIR, "training_data.meta.json")
+# Each training run writes a version directory under ARTIFACTS_DIR; the CURRENT
+# file names the version in use. Without it the original single-file artifacts
+# below are used (version "legacy"). SHADOW names the version shadow-scoring live
+# traffic, if any. Worker processes follow both pointers (services/model_sync.py).
+ARTIFACTS_DIR = os.getenv("MODEL_ARTIFACTS_DIR", os.path.join(BASE_DIR, "artifacts"))
+CURRENT_PATH = os.path.join(ARTIFACTS_DIR, "CURRENT")
+SHADOW_PATH = os.path.join(ARTIFACTS_DIR, "SHADOW")
+LEGACY_VERSION = "legacy"
 MODEL_PATH = os.path.join(BASE_DIR, "model.joblib")
 SCALER_PATH = os.path.join(BASE_DIR, "scaler.joblib")
+GRID_PATH = os.path.join(BASE_DIR, "score_grid.npz")
+
+# "exact" walks the forest for every reading; "compiled" interpolates in the
+# precomputed score grid (see compile_score_grid)
+INFERENCE_MODE = os.getenv("MODEL_INFERENCE_MODE", "exact")
+# joblib mmap_mode for the model artifacts ("r" maps their arrays instead of
+# reading them, so worker processes share the pages); empty = read normally.
+# scikit-learn copies the tree nodes out of the pickle anyway, so for forests of
+# the default size mapping is not faster (see scripts/measure_startup.py)
+MODEL_MMAP_MODE = os.getenv("MODEL_MMAP_MODE", "") or None
+
+# Valid heart rate range is 20-255 BPM; outside it the finger is not detected
+MIN_HEART_RATE = 20
+MAX_HEART_RATE = 255
+
+# Isolation Forest: positive score = normal, negative score = anomaly
+# Our model's actual range is roughly +0.15 (very normal) to -0.05 (anomaly)
+# Map: +0.15 -> 0% stress, -0.05 -> 100% stress
+# Using wider range for better sensitivity: +0.2 to -0.1
+MIN_SCORE = -0.1  # High anomaly = 100% stress
+MAX_SCORE = 0.2   # Very normal = 0% stress
+
+# Motion intensity is reported as a percentage
+MIN_MOTION = 0
+MAX_MOTION = 100
+
+# Default grid resolution: 1 BPM x 1% motion (236 x 101 points)
+GRID_HR_STEP = 1.0
+GRID_MOTION_STEP = 1.0
+
+# Training reads the data in chunks and keeps a stratified sample of at most
+# TRAINING_MAX_SAMPLES rows; the seed makes the sample and the forest reproducible
+TRAINING_MAX_SAMPLES = int(os.getenv("TRAINING_MAX_SAMPLES", "100000"))
+TRAINING_SEED = int(os.getenv("TRAINING_SEED", "42"))
+TRAINING_READ_CHUNK_ROWS = 100000
+# Cores used to fit the forest (-1 = all)
+TRAINING_N_JOBS = int(os.getenv("TRAINING_N_JOBS", "-1"))
+
+# A freshly trained model is rejected if it flags more than this share of its own
+# training sample, or scores readings far outside the normal range as more normal
+# than a typical training reading (forests do not extrapolate, so the probes are
+# only required to rank below the training median)
+MAX_TRAINING_ANOMALY_RATE = 0.05
+VALIDATION_PROBES = np.array([[200.0, 5.0], [30.0, 5.0], [40.0, 90.0]])
+
+
+class LoadedModel:
+    """A model version in memory. Never modified: activating a version replaces the whole object."""
+
+    __slots__ = ("version", "model", "scaler", "grid")
+
+    def __init__(self, version: str, model, scaler, grid=None):
+        self.version = version
+        self.model = model
+        self.scaler = scaler
+        self.grid = grid
+
+
+# The model predictions use; swapped in one assignment, so readers see either version, never a mix
+_active = None
+# Whether loading the current version has been attempted. The app does it at startup
+# (load_active_model); after that predictions never touch the filesystem, even with no model
+_load_attempted = False
 
-# Cache loaded models to avoid reloading from disk on every prediction
-_cached_model = None
-_cached_scaler = None
 
 def clear_model_cache():
-    """Clear cached model and scaler to force reload from disk."""
-    global _cached_model, _cached_scaler
-    _cached_model = None
-    _cached_scaler = None
+    """Drop the loaded model so the next prediction loads the current version from disk."""
+    global _active, _load_attempted
+    _active = None
+    _load_attempted = False
+
+
+def version_dir(version: str) -> str:
+    return os.path.join(ARTIFACTS_DIR, version)
+
+
+def artifact_paths(version: str | None):
+    """(model, scaler, grid) paths of a version; the legacy files for None or "legacy"."""
+    if version is None or version == LEGACY_VERSION:
+        return MODEL_PATH, SCALER_PATH, GRID_PATH
+    directory = version_dir(version)
+    return (os.path.join(directory, "model.joblib"), os.path.join(directory, "scaler.joblib"),
+            os.path.join(directory, "score_grid.npz"))
+
+
+def _read_pointer(path: str) -> str | None:
+    try:
+        with open(path) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def _write_pointer(path: str, version: str | None):
+    """Atomic rename, so readers never see a partial file. None removes the pointer."""
+    if version is None:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        return
+    os.makedirs(ARTIFACTS_DIR, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(version)
+    os.replace(tmp_path, path)
+
+
+def current_version() -> str | None:
+    """Version named by the CURRENT pointer, or None when the legacy files are in use."""
+    return _read_pointer(CURRENT_PATH)
+
+
+def set_current(version: str):
+    """Point CURRENT at a version."""
+    _write_pointer(CURRENT_PATH, version)
+
+
+def shadow_version() -> str | None:
+    """Version named by the SHADOW pointer, or None when there is no shadow."""
+    return _read_pointer(SHADOW_PATH)
+
+
+def set_shadow(version: str | None):
+    """Point SHADOW at a version; None removes the shadow."""
+    _write_pointer(SHADOW_PATH, version)
+
+
+def version_meta(version: str) -> dict | None:
+    """Metadata recorded when a version was trained; None if there is no such version."""
+    if version == LEGACY_VERSION:
+        model_path, scaler_path, _ = artifact_paths(None)
+        if os.path.exists(model_path) and os.path.exists(scaler_path):
+            return {"version": LEGACY_VERSION}
+        return None
+    # Versions come from URLs: only plain names inside ARTIFACTS_DIR
+    if not version or os.path.basename(version) != version or version.startswith(".") or version.endswith(".tmp"):
+        return None
+    try:
+        with open(os.path.join(version_dir(version), "meta.json")) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def list_versions() -> list:
+    """Metadata of every trained version, newest first (the legacy files last, if present)."""
+    names = os.listdir(ARTIFACTS_DIR) if os.path.isdir(ARTIFACTS_DIR) else []
+    versions = [version_meta(name) for name in sorted(names, reverse=True)
+                if os.path.isdir(version_dir(name))]
+    legacy = version_meta(LEGACY_VERSION)
+    return [meta for meta in versions + [legacy] if meta is not None]
+
+
+def load_version(version: str | None = None) -> LoadedModel:
+    """Load a version's artifacts. Raises FileNotFoundError if they do not exist."""
+    model_path, scaler_path, grid_path = artifact_paths(version)
+    model = joblib.load(model_path, mmap_mode=MODEL_MMAP_MODE)
+    scaler = joblib.load(scaler_path, mmap_mode=MODEL_MMAP_MODE)
+
+    grid = None
+    if INFERENCE_MODE == "compiled":
+        if os.path.exists(grid_path):
+            with np.load(grid_path) as data:
+                grid = {name: data[name] for name in ("scores", "hr_axis", "motion_axis")}
+        else:
+            grid = compile_score_grid(model, scaler)
+
+    return LoadedModel(version or LEGACY_VERSION, model, scaler, grid)
+
+
+def activate(version: str | None = None) -> LoadedModel:
+    """Load a version and make it the one predictions use, without pausing them."""
+    global _active, _load_attempted
+    loaded = load_version(version)
+    _active = loaded
+    _load_attempted = True
+    return loaded
 
 
-def train_model():
+def load_active_model() -> LoadedModel | None:
+    """Load the current version and make it active (app startup). None if no model is trained."""
+    global _load_attempted
+    try:
+        return activate(current_version())
+    except FileNotFoundError:
+        _load_attempted = True
+        return None
+
+
+def active_model() -> LoadedModel | None:
     """
-    Train the Isolation Forest model using training data.
-    Returns success message or raises error if training data is missing.
+    The model in use; None if no model is trained. Outside the app (scripts) the
+    current version is loaded on first use.
+    """
+    if not _load_attempted:
+        return load_active_model()
+    return _active
+
+
+def compile_score_grid(model, scaler, hr_step: float = GRID_HR_STEP, motion_step: float = GRID_MOTION_STEP):
     """
-    # Clear cache since we're retraining
-    clear_model_cache()
+    Evaluate decision_function over a regular (heart_rate, motion_intensity) grid
+    covering the valid input range. Returns a dict with the score matrix and both axes.
+    """
+    hr_axis = np.linspace(MIN_HEART_RATE, MAX_HEART_RATE, int(round((MAX_HEART_RATE - MIN_HEART_RATE) / hr_step)) + 1)
+    motion_axis = np.linspace(MIN_MOTION, MAX_MOTION, int(round((MAX_MOTION - MIN_MOTION) / motion_step)) + 1)
+
+    hr_mesh, motion_mesh = np.meshgrid(hr_axis, motion_axis, indexing="ij")
+    features = np.column_stack((hr_mesh.ravel(), motion_mesh.ravel()))
+    scores = model.decision_function((features - scaler.mean_) / scaler.scale_)
+
+    return {
+        "scores": scores.reshape(len(hr_axis), len(motion_axis)),
+        "hr_axis": hr_axis,
+        "motion_axis": motion_axis
+    }
+
+
+def interpolate_scores(grid, heart_rates, motion_intensities):
+    """Bilinear interpolation of anomaly scores in a compiled grid. Inputs are clipped to the grid range."""
+    scores = grid["scores"]
+    hr_axis = grid["hr_axis"]
+    motion_axis = grid["motion_axis"]
+
+    def locate(values, axis):
+        # Axes are uniform, so the cell index is plain arithmetic
+        position = (np.clip(values, axis[0], axis[-1]) - axis[0]) / (axis[1] - axis[0])
+        index = np.minimum(position.astype(np.intp), len(axis) - 2)
+        return index, position - index
+
+    i, tx = locate(np.asarray(heart_rates, dtype=float), hr_axis)
+    j, ty = locate(np.asarray(motion_intensities, dtype=float), motion_axis)
+
+    return (
+        scores[i, j] * (1 - tx) * (1 - ty)
+        + scores[i + 1, j] * tx * (1 - ty)
+        + scores[i, j + 1] * (1 - tx) * ty
+        + scores[i + 1, j + 1] * tx * ty
+    )
+
+
+def _training_data_chunks(chunk_rows: int = TRAINING_READ_CHUNK_ROWS):
+    """
+    The training data written by generate_training_data.py (CSV or Parquet, per
+    its meta file) as DataFrame chunks, so it never has to fit in memory at once.
+    """
+    file_format = "csv"
+    if os.path.exists(DATA_META_PATH):
+        with open(DATA_META_PATH) as f:
+            file_format = json.load(f).get("format", "csv")
+
+    import pandas as pd
+
+    if file_format == "parquet" and os.path.isdir(PARQUET_DATA_PATH):
+        import pyarrow.parquet as pq
+
+        for name in sorted(os.listdir(PARQUET_DATA_PATH)):
+            for batch in pq.ParquetFile(os.path.join(PARQUET_DATA_PATH, name)).iter_batches(batch_size=chunk_rows):
+                yield batch.to_pandas()
+        return
 
     if not os.path.exists(DATA_PATH):
         raise FileNotFoundError(f"training_data.csv is missing at {DATA_PATH}")
+    yield from pd.read_csv(DATA_PATH, chunksize=chunk_rows)
+
+
+def _data_meta() -> dict:
+    """What generate_training_data.py recorded about the training data (empty if unknown)."""
+    try:
+        with open(DATA_META_PATH) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _score_distribution(scores) -> dict:
+    """Summary of decision_function scores, kept with each version to compare retrained models."""
+    quantiles = np.percentile(scores, [1, 5, 25, 50, 75, 95, 99])
+    return {
+        "mean": round(float(scores.mean()), 4),
+        "std": round(float(scores.std()), 4),
+        **{f"p{q}": round(float(value), 4) for q, value in zip((1, 5, 25, 50, 75, 95, 99), quantiles)}
+    }
 
-    df = pd.read_csv(DATA_PATH)
-    df = df.apply(pd.to_numeric, errors="coerce").dropna()
+
+def validate_model(model, scaler, sample) -> dict:
+    """Sanity checks a trained model must pass before it can be activated. Raises ValueError."""
+    scores = model.decision_function((np.asarray(sample, dtype=float) - scaler.mean_) / scaler.scale_)
+    if not np.isfinite(scores).all():
+        raise ValueError("Model produces non-finite scores")
+
+    anomaly_rate = float((scores < 0).mean())
+    if anomaly_rate > MAX_TRAINING_ANOMALY_RATE:
+        raise ValueError(f"Model flags {anomaly_rate:.1%} of its own training data as anomalous")
+
+    median_score = float(np.median(scores))
+    probe_scores = model.decision_function((VALIDATION_PROBES - scaler.mean_) / scaler.scale_)
+    if (probe_scores >= median_score).any():
+        raise ValueError("Model scores out-of-range readings as normal as typical training data")
+
+    return {
+        "training_anomaly_rate": round(anomaly_rate, 4),
+        "training_median_score": round(median_score, 4),
+        "probe_scores": np.round(probe_scores, 4).tolist(),
+        "score_distribution": _score_distribution(scores)
+    }
+
+
+def train_model(max_samples: int = TRAINING_MAX_SAMPLES, seed: int = TRAINING_SEED,
+                n_jobs: int = TRAINING_N_JOBS, progress=None):
+    """
+    Train the Isolation Forest model using training data.
+    The data is read in one streaming pass and reduced to at most max_samples
+    rows, stratified by user, hour of day and activity level (see sampling.py),
+    so training time and memory stay bounded however much data there is.
+
+    The artifacts are written to a new version directory, read back and
+    validated, and only then moved into place; the model in use is not touched.
+    Make the version current with set_current() / activate(). Its meta.json
+    (see version_meta) records the training data window, sample counts, the
+    score distribution over the training sample and the training time.
+    `progress(stage, fraction)` is called as training advances.
+    Returns success message or raises error if training data is missing.
+    """
+    import pandas as pd
+    from sklearn.ensemble import IsolationForest
+    from sklearn.preprocessing import StandardScaler
+
+    try:
+        from .sampling import StratifiedSampler
+    except ImportError:
+        # Run as a script: python ai_model/model.py
+        from sampling import StratifiedSampler
+
+    def report(stage, fraction):
+        if progress is not None:
+            progress(stage, fraction)
+
+    started = time.monotonic()
+    data_meta = _data_meta()
+    total_rows = data_meta.get("rows")
+
+    report("sampling", 0.0)
+    sampler = StratifiedSampler(max_samples, seed)
+    for chunk in _training_data_chunks():
+        chunk = chunk.apply(pd.to_numeric, errors="coerce").dropna(subset=["heart_rate", "motion_intensity"])
+        sampler.add(chunk)
+        if total_rows:
+            report("sampling", min(sampler.rows_seen / total_rows, 1.0) * 0.5)
+    df = sampler.sample()
 
     if len(df) < 10:
         raise ValueError("Not enough training data. Need at least 10 samples.")
@@ -41,6 +383,7 @@ def train_model():
     X = df[["heart_rate", "motion_intensity"]]
 
     # Scale features
+    report("fitting", 0.5)
     scaler = StandardScaler()
     X_scaled = scaler.fit_transform(X)
 
@@ -50,107 +393,169 @@ def train_model():
     model = IsolationForest(
         n_estimators=200,
         contamination=0.01,  # Changed from 0.05 - expect only 1% outliers in clean training data
-        random_state=42
+        random_state=seed,
+        n_jobs=n_jobs
     )
     model.fit(X_scaled)
 
-    # Save model and scaler
-    joblib.dump(model, MODEL_PATH)
-    joblib.dump(scaler, SCALER_PATH)
+    # Save model and scaler into a staging directory
+    report("saving", 0.8)
+    version = datetime.now(timezone.utc).strftime("%Y%m%d%H%M%S")
+    staging = version_dir(version) + ".tmp"
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+    try:
+        joblib.dump(model, os.path.join(staging, "model.joblib"))
+        joblib.dump(scaler, os.path.join(staging, "scaler.joblib"))
+        # Precompute the score grid used by the compiled inference mode
+        np.savez(os.path.join(staging, "score_grid.npz"), **compile_score_grid(model, scaler))
+
+        # Validate what was written, not what is in memory
+        report("validating", 0.9)
+        validation = validate_model(
+            joblib.load(os.path.join(staging, "model.joblib")),
+            joblib.load(os.path.join(staging, "scaler.joblib")),
+            X.to_numpy()
+        )
 
+        meta = {
+            "version": version,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            # Training window: the metrics exported up to last_metric_id, as of extracted_at
+            "training_data": {
+                "format": data_meta.get("format", "csv"),
+                "last_metric_id": data_meta.get("last_metric_id"),
+                "extracted_at": data_meta.get("updated_at")
+            },
+            "training_samples": len(df),
+            "source_rows": sampler.rows_seen,
+            "strata": sampler.strata,
+            "seed": seed,
+            "score_distribution": validation.pop("score_distribution"),
+            "validation": validation,
+            "training_seconds": round(time.monotonic() - started, 2)
+        }
+        with open(os.path.join(staging, "meta.json"), "w") as f:
+            json.dump(meta, f, indent=2)
+
+        os.replace(staging, version_dir(version))
+    except Exception:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    report("done", 1.0)
     return {
         "message": "Model trained successfully",
-        "training_samples": len(df),
-        "model_path": MODEL_PATH,
-        "scaler_path": SCALER_PATH
+        **meta,
+        "path": version_dir(version)
     }
 
 
-def predict(heart_rate: float, motion_intensity: float):
+def to_population_scale(values, center, scale, population_mean, population_std):
     """
-    Make prediction on sensor data using trained Isolation Forest model.
+    Map readings from a user's own scale onto the training population's: the
+    user's center lands on the population mean, one user spread on one population
+    standard deviation. Readings with a NaN center (no baseline) are unchanged.
+    """
+    mapped = population_mean + (values - center) / scale * population_std
+    return np.where(np.isnan(center), values, mapped)
 
-    Returns dict with keys matching database schema:
-    - prediction: "NORMAL" or "ANOMALY"
-    - anomaly_score: Raw anomaly score from model
-    - confidence_normal: Confidence percentage for normal state (0-100)
-    - confidence_anomaly: Confidence percentage for anomaly state (0-100)
+
+def predict_batch(heart_rates, motion_intensities, baseline=None, loaded=None):
     """
-    # Don't run AI if heart rate is 0 or invalid (finger not detected)
-    # Valid heart rate range is 20-255 BPM
-    if heart_rate < 20 or heart_rate > 255:
-        return {
-            "prediction": "NORMAL",
-            "anomaly_score": 0.0,
-            "confidence_normal": 100.0,
-            "confidence_anomaly": 0.0
-        }
+    Score many readings in one call.
 
-    # Check if model exists, return defaults if not trained
-    if not os.path.exists(MODEL_PATH) or not os.path.exists(SCALER_PATH):
-        return {
-            "prediction": "NORMAL",
-            "anomaly_score": 0.0,
-            "confidence_normal": 100.0,
-            "confidence_anomaly": 0.0
-        }
+    Takes two equal-length array-likes and returns a dict of NumPy arrays with the
+    same keys as predict(). Label and score come from a single decision_function
+    pass (the forest labels a sample ANOMALY exactly when its score is below 0),
+    or from the precomputed score grid when MODEL_INFERENCE_MODE=compiled.
+    Readings with an invalid heart rate, or all readings when no model is trained,
+    get the default NORMAL result.
+
+    `baseline` optionally maps "heart_rate" and "motion_intensity" to per-reading
+    (center, scale) arrays of the readings' users (services/baselines.py); those
+    readings are scored relative to their user's baseline.
+
+    `loaded` scores with that LoadedModel instead of the active one (shadow scoring).
+    """
+    heart_rates = np.asarray(heart_rates, dtype=float)
+    motion_intensities = np.asarray(motion_intensities, dtype=float)
+
+    scores = np.zeros(len(heart_rates))
+    valid = (heart_rates >= MIN_HEART_RATE) & (heart_rates <= MAX_HEART_RATE)
 
     try:
-        # Load model and scaler from cache or disk
-        global _cached_model, _cached_scaler
-
-        if _cached_model is None or _cached_scaler is None:
-            _cached_model = joblib.load(MODEL_PATH)
-            _cached_scaler = joblib.load(SCALER_PATH)
-
-        model = _cached_model
-        scaler = _cached_scaler
-
-        # Prepare data with feature names to match training data
-        data = pd.DataFrame([[heart_rate, motion_intensity]], columns=["heart_rate", "motion_intensity"])
-        scaled = scaler.transform(data)
-
-        # Make prediction
-        pred = model.predict(scaled)[0]
-        score = model.decision_function(scaled)[0]
-
-        # Convert prediction to status
-        status = "NORMAL" if pred == 1 else "ANOMALY"
-
-        # Convert anomaly score to confidence percentages (0-100)
-        # Isolation Forest: positive score = normal, negative score = anomaly
-        # Our model's actual range is roughly +0.15 (very normal) to -0.05 (anomaly)
-        # Map: +0.15 -> 0% stress, -0.05 -> 100% stress
-        # Using wider range for better sensitivity: +0.2 to -0.1
-        min_score = -0.1  # High anomaly = 100% stress
-        max_score = 0.2   # Very normal = 0% stress
-
-        # Normalize score to 0-100 range (inverted: higher score = lower stress)
-        confidence_anomaly = max(0, min(100, ((max_score - score) / (max_score - min_score)) * 100))
-        confidence_normal = 100 - confidence_anomaly
-
-        return {
-            "prediction": status,
-            "anomaly_score": float(round(float(score), 4)),
-            "confidence_normal": float(round(float(confidence_normal), 2)),
-            "confidence_anomaly": float(round(float(confidence_anomaly), 2))
-        }
+        if loaded is None:
+            loaded = active_model()
+        if loaded is not None and valid.any():
+            scaler = loaded.scaler
+            hr_input = heart_rates[valid]
+            motion_input = motion_intensities[valid]
+            if baseline is not None:
+                center, scale = baseline["heart_rate"]
+                hr_input = to_population_scale(hr_input, center[valid], scale[valid], scaler.mean_[0], scaler.scale_[0])
+                center, scale = baseline["motion_intensity"]
+                motion_input = to_population_scale(motion_input, center[valid], scale[valid], scaler.mean_[1], scaler.scale_[1])
 
+            if INFERENCE_MODE == "compiled":
+                scores[valid] = interpolate_scores(loaded.grid, hr_input, motion_input)
+            else:
+                features = np.column_stack((hr_input, motion_input))
+                # Same as scaler.transform, without the DataFrame round trip
+                scaled = (features - scaler.mean_) / scaler.scale_
+                scores[valid] = loaded.model.decision_function(scaled)
+        else:
+            valid[:] = False
     except Exception as e:
         print(f"Error in prediction: {e}")
         # Return defaults on error
-        return {
-            "prediction": "NORMAL",
-            "anomaly_score": 0.0,
-            "confidence_normal": 100.0,
-            "confidence_anomaly": 0.0
-        }
+        valid[:] = False
+        scores[:] = 0.0
+
+    # Normalize score to 0-100 range (inverted: higher score = lower stress)
+    confidence_anomaly = np.clip((MAX_SCORE - scores) / (MAX_SCORE - MIN_SCORE) * 100, 0, 100)
+    confidence_anomaly[~valid] = 0.0
+    confidence_normal = 100 - confidence_anomaly
+
+    return {
+        "prediction": np.where(valid & (scores < 0), "ANOMALY", "NORMAL"),
+        "anomaly_score": np.round(scores, 4),
+        "confidence_normal": np.round(confidence_normal, 2),
+        "confidence_anomaly": np.round(confidence_anomaly, 2)
+    }
+
+
+def predict(heart_rate: float, motion_intensity: float, baseline=None):
+    """
+    Make prediction on sensor data using trained Isolation Forest model.
+    `baseline` optionally maps each field to the user's (center, scale), see predict_batch().
+
+    Returns dict with keys matching database schema:
+    - prediction: "NORMAL" or "ANOMALY"
+    - anomaly_score: Raw anomaly score from model
+    - confidence_normal: Confidence percentage for normal state (0-100)
+    - confidence_anomaly: Confidence percentage for anomaly state (0-100)
+    """
+    if baseline is not None:
+        baseline = {field: (np.array([center], dtype=float), np.array([scale], dtype=float))
+                    for field, (center, scale) in baseline.items()}
+    result = predict_batch([heart_rate], [motion_intensity], baseline)
+
+    return {
+        "prediction": str(result["prediction"][0]),
+        "anomaly_score": float(result["anomaly_score"][0]),
+        "confidence_normal": float(result["confidence_normal"][0]),
+        "confidence_anomaly": float(result["confidence_anomaly"][0])
+    }
 
 
 def is_model_trained():
     """Check if the model has been trained and files exist."""
-    return os.path.exists(MODEL_PATH) and os.path.exists(SCALER_PATH)
+    model_path, scaler_path, _ = artifact_paths(current_version())
+    return os.path.exists(model_path) and os.path.exists(scaler_path)
 
 
 if __name__ == "__main__":
-    print(train_model())
+    result = train_model()
+    set_current(result["version"])
+    print(result)
@@ -0,0 +1,83 @@
+"""
+Bounded, stratified sampling of the training data in a single pass.
+
+Readings are grouped into strata by user, hour of day and activity level, so
+that a few very active devices or the busiest hours do not dominate the
+training set. Within each stratum the sample is a uniform reservoir: every row
+gets a random priority from a seeded generator and each stratum keeps the rows
+with the smallest priorities (bottom-k sampling, which is reservoir sampling
+done with vectorized operations on whole chunks).
+
+The number of rows kept per stratum is chosen by water-filling: strata with
+few rows keep all of them and the remaining room is shared equally by the
+others, so the sample never exceeds max_samples (unless there are more strata
+than that; every stratum keeps at least one row). The quota only ever
+shrinks, which keeps each stratum a uniform sample of everything it has seen.
+"""
+import math
+
+import numpy as np
+import pandas as pd
+
+# Upper bounds of the activity levels by motion intensity: rest < 20 <= light < 40 <= moderate
+ACTIVITY_BANDS = (20, 40)
+
+
+def stratum_keys(chunk: pd.DataFrame) -> np.ndarray:
+    """
+    One integer per row identifying its (user, hour of day, activity level) stratum.
+    Columns missing from the data (older training files) count as a single value.
+    """
+    activity = np.searchsorted(ACTIVITY_BANDS, chunk["motion_intensity"].to_numpy(), side="right")
+    hour = chunk["hour"].fillna(0).to_numpy(dtype=np.int64) if "hour" in chunk else 0
+    user = chunk["user_id"].fillna(0).to_numpy(dtype=np.int64) if "user_id" in chunk else 0
+    return (user * 24 + hour) * (len(ACTIVITY_BANDS) + 1) + activity
+
+
+def _water_fill(sizes: np.ndarray, capacity: int) -> float:
+    """Largest per-stratum quota with sum(min(size, quota)) <= capacity; inf if everything fits."""
+    if sizes.sum() <= capacity:
+        return math.inf
+    sizes = np.sort(sizes)
+    remaining = capacity
+    for i, size in enumerate(sizes):
+        share = remaining // (len(sizes) - i)
+        if size > share:
+            return max(share, 1)
+        remaining -= size
+    return math.inf
+
+
+class StratifiedSampler:
+    """Feed DataFrame chunks with add(); sample() returns the bounded training set."""
+
+    def __init__(self, max_samples: int, seed: int = 42):
+        self.max_samples = max_samples
+        self.rng = np.random.default_rng(seed)
+        self.quota = math.inf
+        self.rows_seen = 0
+        self._kept = None
+
+    def add(self, chunk: pd.DataFrame):
+        if chunk.empty:
+            return
+        self.rows_seen += len(chunk)
+
+        chunk = chunk.assign(_priority=self.rng.random(len(chunk)), _stratum=stratum_keys(chunk))
+        kept = chunk if self._kept is None else pd.concat([self._kept, chunk], ignore_index=True)
+
+        sizes = kept["_stratum"].value_counts().to_numpy()
+        self.quota = min(self.quota, _water_fill(sizes, self.max_samples))
+        if self.quota != math.inf:
+            kept = kept.sort_values("_priority", kind="stable").groupby("_stratum", sort=False).head(int(self.quota))
+        self._kept = kept
+
+    @property
+    def strata(self) -> int:
+        return 0 if self._kept is None else int(self._kept["_stratum"].nunique())
+
+    def sample(self) -> pd.DataFrame:
+        if self._kept is None:
+            return pd.DataFrame()
+        # Back in priority order, which is a random order independent of the input
+        return self._kept.sort_values("_priority", kind="stable").drop(columns=["_priority", "_stratum"]).reset_index(drop=True)
@@ -1,7 +1,11 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 from sqlalchemy.orm import sessionmaker, declarative_base
-from sqlalchemy.pool import NullPool
+from sqlalchemy.pool import NullPool, QueuePool
 import os
+import threading
+import time
+import uuid
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -13,29 +17,107 @@ SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./vitalink.db")
 is_sqlite = "sqlite" in SQLALCHEMY_DATABASE_URL
 is_postgres = SQLALCHEMY_DATABASE_URL.startswith("postgresql")
 
+# PostgreSQL connection pooling profile:
+# - "pooled": connections stay open in the app (QueuePool), opened at startup
+#   (warmup) and replaced after DB_POOL_RECYCLE seconds, before the server drops them
+# - "pgbouncer": for PgBouncer in transaction mode (or Neon's -pooler endpoint). The
+#   bouncer owns the server connections; the app keeps a few client connections to it,
+#   without pre-ping. Safe because nothing here keeps session state across
+#   transactions (no SET, advisory locks, LISTEN or named prepared statements)
+# - "serverless": a new connection for every session (NullPool) plus a pre-ping, for
+#   platforms that freeze the process between requests
+DB_POOL_PROFILE = os.getenv("DB_POOL_PROFILE", "pooled")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_POOL_MAX_OVERFLOW = int(os.getenv("DB_POOL_MAX_OVERFLOW", "15"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+# Neon suspends idle computes after 5 minutes, which closes their connections
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "240"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "false").lower() == "true"
+DB_POOL_WARMUP = os.getenv("DB_POOL_WARMUP", "true").lower() == "true"
+# Also create an async engine (asyncpg for PostgreSQL, aiosqlite for SQLite) for the
+# hot request paths in services/data_access.py; needs the driver package installed
+DB_ASYNC = os.getenv("DB_ASYNC", "false").lower() == "true"
+
+# Checkout counters for pool_stats(); shared by every pool the engine creates
+_pool_lock = threading.Lock()
+_pool_counters = {"checkouts": 0, "timeouts": 0, "connections_opened": 0, "total_wait": 0.0, "max_wait": 0.0}
+
+
+class _TimedPool:
+    """Pool mixin timing checkouts: the wait for a free connection, or for opening a new one."""
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            return super().connect()
+        except PoolTimeoutError:
+            with _pool_lock:
+                _pool_counters["timeouts"] += 1
+            raise
+        finally:
+            wait = time.perf_counter() - started
+            with _pool_lock:
+                _pool_counters["checkouts"] += 1
+                _pool_counters["total_wait"] += wait
+                _pool_counters["max_wait"] = max(_pool_counters["max_wait"], wait)
+
+
+class TimedQueuePool(_TimedPool, QueuePool):
+    pass
+
+
+class TimedNullPool(_TimedPool, NullPool):
+    pass
+
+
 # Configure engine based on database type
 if is_sqlite:
     # SQLite configuration
+    sqlite_pool = {} if ":memory:" in SQLALCHEMY_DATABASE_URL else {"poolclass": TimedQueuePool}
     engine = create_engine(
         SQLALCHEMY_DATABASE_URL,
-        connect_args={"check_same_thread": False}
+        connect_args={"check_same_thread": False},
+        **sqlite_pool
     )
+    DB_POOL_PROFILE = "sqlite"
     print("🗄️  Using SQLite database (local development)")
 elif is_postgres:
     # PostgreSQL/Neon configuration
-    # Use NullPool for serverless environments (Neon, Supabase, etc.)
+    if DB_POOL_PROFILE == "serverless":
+        pool_options = {"poolclass": TimedNullPool, "pool_pre_ping": True}
+    elif DB_POOL_PROFILE in ("pooled", "pgbouncer"):
+        pool_options = {
+            "poolclass": TimedQueuePool,
+            "pool_size": DB_POOL_SIZE,
+            "max_overflow": DB_POOL_MAX_OVERFLOW,
+            "pool_timeout": DB_POOL_TIMEOUT,
+            "pool_recycle": DB_POOL_RECYCLE,
+            # Most recently used first: surplus connections go idle and get recycled
+            "pool_use_lifo": True,
+            "pool_pre_ping": DB_POOL_PRE_PING and DB_POOL_PROFILE == "pooled",
+        }
+    else:
+        raise ValueError(f"Unknown DB_POOL_PROFILE {DB_POOL_PROFILE!r} (pooled, pgbouncer or serverless)")
     engine = create_engine(
         SQLALCHEMY_DATABASE_URL,
-        poolclass=NullPool,  # Better for serverless
-        pool_pre_ping=True,  # Verify connections before using
-        echo=False
+        echo=False,
+        **pool_options
     )
-    print("🐘 Using PostgreSQL database (Neon)")
+    print(f"🐘 Using PostgreSQL database (Neon), {DB_POOL_PROFILE} connections")
 else:
     # Fallback for other databases
     engine = create_engine(SQLALCHEMY_DATABASE_URL)
     print(f"🗄️  Using database: {SQLALCHEMY_DATABASE_URL.split('://')[0]}")
 
+
+@event.listens_for(engine, "connect")
+def _count_connection(dbapi_connection, connection_record):
+    with _pool_lock:
+        _pool_counters["connections_opened"] += 1
+
+
+# Sessions only check out a connection at their first query, so requests that never
+# query (e.g. authenticated from the principal cache) never touch the pool
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
@@ -48,6 +130,91 @@ def get_db():
         db.close()
 
 
+def _async_url(url: str):
+    """The async driver's version of a database URL."""
+    url = make_url(url)
+    if url.get_backend_name() == "sqlite":
+        return url.set(drivername="sqlite+aiosqlite")
+    # asyncpg takes ssl instead of libpq's sslmode and has no channel_binding option
+    sslmode = url.query.get("sslmode")
+    url = url.set(drivername="postgresql+asyncpg").difference_update_query(["sslmode", "channel_binding"])
+    return url.update_query_dict({"ssl": sslmode}) if sslmode else url
+
+
+def _create_async_engine():
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    if is_sqlite:
+        return create_async_engine(_async_url(SQLALCHEMY_DATABASE_URL))
+    if DB_POOL_PROFILE == "serverless":
+        return create_async_engine(_async_url(SQLALCHEMY_DATABASE_URL), poolclass=NullPool, pool_pre_ping=True)
+
+    options = {}
+    if DB_POOL_PROFILE == "pgbouncer":
+        # asyncpg prepares every statement; in transaction mode consecutive statements may run
+        # on different server connections, so nothing is cached and names never collide
+        options["connect_args"] = {
+            "statement_cache_size": 0,
+            "prepared_statement_cache_size": 0,
+            "prepared_statement_name_func": lambda: f"__asyncpg_{uuid.uuid4()}__",
+        }
+    return create_async_engine(
+        _async_url(SQLALCHEMY_DATABASE_URL),
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_POOL_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_use_lifo=True,
+        pool_pre_ping=DB_POOL_PRE_PING and DB_POOL_PROFILE == "pooled",
+        **options
+    )
+
+
+async_engine = None
+AsyncSessionLocal = None
+if DB_ASYNC:
+    if not (is_sqlite or is_postgres):
+        raise ValueError("DB_ASYNC supports PostgreSQL and SQLite only")
+    from sqlalchemy.ext.asyncio import async_sessionmaker
+
+    async_engine = _create_async_engine()
+    # Not expiring on commit: objects stay readable after the session is closed
+    AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False)
+    print("⚡ Async database access enabled")
+
 
+def warm_pool():
+    """Open the pool's connections up front (app startup), so early requests do not pay for them."""
+    if DB_POOL_PROFILE not in ("pooled", "pgbouncer") or not DB_POOL_WARMUP:
+        return 0
+    connections = [engine.connect() for _ in range(DB_POOL_SIZE)]
+    for connection in connections:
+        connection.close()
+    return len(connections)
 
 
+def pool_stats() -> dict:
+    """Connection pool state and checkout timings (milliseconds)."""
+    pool = engine.pool
+    with _pool_lock:
+        counters = dict(_pool_counters)
+    checkouts = counters["checkouts"]
+    stats = {
+        "profile": DB_POOL_PROFILE,
+        "pool": type(pool).__name__,
+        "checkouts": checkouts,
+        "connections_opened": counters["connections_opened"],
+        "timeouts": counters["timeouts"],
+        "avg_checkout_ms": round(counters["total_wait"] / checkouts * 1000, 3) if checkouts else 0.0,
+        "max_checkout_ms": round(counters["max_wait"] * 1000, 3),
+    }
+    if isinstance(pool, QueuePool):
+        stats.update({
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "idle": pool.checkedin(),
+            "overflow": max(pool.overflow(), 0),
+        })
+    if async_engine is not None:
+        stats["async_pool"] = async_engine.pool.status()
+    return stats
@@ -1,8 +1,20 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.openapi.utils import get_openapi
 from fastapi.middleware.cors import CORSMiddleware
-from routers import metrics, auth, devices, alerts, websocket
-from database import Base, engine
+from routers import metrics, auth, devices, alerts, websocket, system, model
+from database import Base, async_engine, engine, warm_pool
+from utils.timeseries import ensure_metrics_partitions
+from utils.timestamp_migration import convert_legacy_timestamps
+from services.ingestion import ingestion_pipeline
+from services.executors import db_executor, inference_executor, shutdown_executors
+from services.device_registry import device_registry
+from services.alert_engine import alert_engine
+from services.baselines import baseline_store
+from services.training import training_jobs
+from services.model_sync import model_sync
+from services.hashing import password_hasher
+from ai_model.model import load_active_model
 import os
 from dotenv import load_dotenv
 
@@ -10,7 +22,40 @@ load_dotenv()
 
 
 Base.metadata.create_all(bind=engine)
-app = FastAPI(title="VitaLink AI API")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Open the database connection pool, convert timestamps a SQLite database stored in
+    # local time (once), make sure the upcoming monthly metrics partitions
+    # exist (PostgreSQL, once partitioned), load device pairing state, the alert rules, the
+    # user baselines and the anomaly model (so the first sensor frame does not wait for it)
+    # and follow model promotions made in other workers, then start the sensor ingestion
+    # writer; on shutdown, flush what is still queued and save the baselines
+    await db_executor.run(warm_pool)
+    await db_executor.run(convert_legacy_timestamps, engine)
+    await db_executor.run(ensure_metrics_partitions, engine)
+    await db_executor.run(device_registry.load_all)
+    alert_engine.load_rules()
+    await db_executor.run(alert_engine.rehydrate)
+    await db_executor.run(baseline_store.load_all)
+    await baseline_store.start()
+    await inference_executor.run(load_active_model)
+    await model_sync.start()
+    password_hasher.start()
+    await ingestion_pipeline.start()
+    yield
+    await ingestion_pipeline.stop()
+    await baseline_store.stop()
+    await model_sync.stop()
+    training_jobs.stop()
+    password_hasher.shutdown()
+    if async_engine is not None:
+        await async_engine.dispose()
+    shutdown_executors()
+
+
+app = FastAPI(title="VitaLink AI API", lifespan=lifespan)
 
 
 # Configure CORS
@@ -56,6 +101,8 @@ app.include_router(auth.router, prefix="/auth")
 app.include_router(devices.router)
 app.include_router(alerts.router)
 app.include_router(websocket.router)  # WebSocket endpoint
+app.include_router(system.router)
+app.include_router(model.router)
 
 
 
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Boolean, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 from sqlalchemy.types import TypeDecorator
 from datetime import datetime, timezone
@@ -14,6 +14,9 @@ class TZDateTime(TypeDecorator):
         if value is not None:
             if not value.tzinfo:
                 raise ValueError("datetime must be timezone-aware")
+            # Stored as UTC: the column keeps no offset (SQLite would store the local wall time;
+            # rows written that way are converted by utils/timestamp_migration.py)
+            value = value.astimezone(timezone.utc)
         return value
 
     def process_result_value(self, value, dialect):
@@ -42,6 +45,8 @@ class User(Base):
     metrics = relationship("Metrics", back_populates="user", cascade="all, delete-orphan")
     devices = relationship("Device", back_populates="user", cascade="all, delete-orphan")
     alerts = relationship("Alert", back_populates="user", cascade="all, delete-orphan")
+    rollups = relationship("MetricsRollup", back_populates="user", cascade="all, delete-orphan")
+    baseline = relationship("UserBaseline", back_populates="user", uselist=False, cascade="all, delete-orphan")
 
 
 class Metrics(Base):
@@ -63,6 +68,62 @@ class Metrics(Base):
 
     user = relationship("User", back_populates="metrics")
 
+    # Every read path filters by user and orders/ranges by time.
+    # On PostgreSQL the table can also be range-partitioned by month (scripts/partition_metrics.py).
+    __table_args__ = (
+        Index("ix_metrics_user_id_timestamp", "user_id", "timestamp"),
+    )
+
+
+class MetricsRollup(Base):
+    """Pre-aggregated metrics per user and time bucket, maintained by the ingestion path."""
+    __tablename__ = "metrics_rollups"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    resolution = Column(Integer, nullable=False)  # Bucket width in seconds: 60, 900 or 3600
+    bucket_start = Column(TZDateTime, nullable=False)
+
+    sample_count = Column(Integer, nullable=False)
+    heart_rate_min = Column(Float, nullable=False)
+    heart_rate_max = Column(Float, nullable=False)
+    heart_rate_sum = Column(Float, nullable=False)
+    motion_intensity_min = Column(Float, nullable=False)
+    motion_intensity_max = Column(Float, nullable=False)
+    motion_intensity_sum = Column(Float, nullable=False)
+    confidence_anomaly_min = Column(Float, nullable=False)
+    confidence_anomaly_max = Column(Float, nullable=False)
+    confidence_anomaly_sum = Column(Float, nullable=False)
+    anomaly_count = Column(Integer, nullable=False)
+
+    user = relationship("User", back_populates="rollups")
+
+    # One row per bucket; also serves range scans by (user_id, resolution, bucket_start)
+    __table_args__ = (
+        UniqueConstraint("user_id", "resolution", "bucket_start", name="uq_metrics_rollups_bucket"),
+    )
+
+
+class UserBaseline(Base):
+    """Running statistics of one user's readings, kept by the ingestion path (services/baselines.py)."""
+    __tablename__ = "user_baselines"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), unique=True, nullable=False)
+
+    sample_count = Column(Integer, nullable=False)
+    heart_rate_mean = Column(Float, nullable=False)
+    heart_rate_std = Column(Float, nullable=False)
+    heart_rate_p50 = Column(Float, nullable=True)
+    motion_intensity_mean = Column(Float, nullable=False)
+    motion_intensity_std = Column(Float, nullable=False)
+    motion_intensity_p50 = Column(Float, nullable=True)
+    state = Column(String, nullable=False)  # JSON with the full estimator state, to resume after a restart
+
+    updated_at = Column(TZDateTime, default=lambda: datetime.now(timezone.utc))
+
+    user = relationship("User", back_populates="baseline")
+
 
 class Device(Base):
     __tablename__ = "devices"
@@ -77,6 +138,13 @@ class Device(Base):
 
     user = relationship("User", back_populates="devices")
 
+    # Device of a user (fleet snapshot, /my-device); admin device list filtered by
+    # status and paged by id
+    __table_args__ = (
+        Index("ix_devices_user_id", "user_id"),
+        Index("ix_devices_paired_id", "paired", "id"),
+    )
+
 
 class Alert(Base):
     __tablename__ = "alerts"
@@ -105,3 +173,8 @@ class Alert(Base):
 
     user = relationship("User", back_populates="alerts")
 
+    # Per-user alert lists and unread counts
+    __table_args__ = (
+        Index("ix_alerts_user_id_is_read", "user_id", "is_read"),
+    )
+
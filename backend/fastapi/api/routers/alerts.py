@@ -1,104 +1,47 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
-from database import get_db
 from models_db import User, Alert
-from utils.auth_utils import get_current_user
-from datetime import datetime, timedelta, timezone
+from utils.auth_utils import get_current_principal
+from services.alert_engine import alert_engine
+from services import data_access
+from datetime import datetime, timezone
 
 router = APIRouter(prefix="/metrics", tags=["Alerts"])
 
 
 def generate_alert_if_needed(db: Session, user_id: int, heart_rate: float, motion_intensity: float,
                               prediction: str, anomaly_score: float, confidence_anomaly: float,
-                              timestamp: datetime = None):
+                              timestamp: datetime = None, commit: bool = True):
     """
     Generate AI-driven alerts based on sensor data and predictions.
     Alerts are only created for: High Heart Rate, High Activity, and AI-detected Anomalies (stress/fatigue).
     Pauses alert generation if data is stale (older than 5 seconds from device offline).
+    Duplicates within the cooldown are filtered in memory by the alert engine.
+    Pass commit=False to leave the commit to the caller. Returns the alerts that were created.
     """
-    # Check if data is stale (older than 5 seconds) - don't generate alerts for offline devices
-    if timestamp:
-        age_seconds = (datetime.now(timezone.utc) - timestamp).total_seconds()
-        if age_seconds > 5:
-            # Data is stale, device is offline - don't generate new alerts
-            return
-
-    alerts_to_create = []
-
-    # 1. AI Anomaly Detection Alert (covers stress and fatigue detection)
-    if prediction == "ANOMALY" and confidence_anomaly >= 60:
-        severity = "CRITICAL" if confidence_anomaly >= 80 else "HIGH"
-        alerts_to_create.append({
-            "alert_type": "AI_ANOMALY",
-            "severity": severity,
-            "title": "Abnormal Pattern Detected",
-            "message": "AI detected abnormal health pattern. Early signs of stress or fatigue may be present.",
-            "stress_level": confidence_anomaly,
-            "anomaly_score": anomaly_score
-        })
-
-    # 2. High Heart Rate Alert
-    if heart_rate > 100:
-        severity = "CRITICAL" if heart_rate > 120 else "HIGH"
-        alerts_to_create.append({
-            "alert_type": "HIGH_HEART_RATE",
-            "severity": severity,
-            "title": "Elevated Heart Rate",
-            "message": "Your heart rate is elevated. Monitor your condition and rest if necessary.",
-            "heart_rate": heart_rate
-        })
-
-    # 3. High Activity Level Alert
-    if motion_intensity > 80:
-        severity = "HIGH"
-        alerts_to_create.append({
-            "alert_type": "HIGH_ACTIVITY",
-            "severity": severity,
-            "title": "High Activity Detected",
-            "message": "Your activity level is very high. Take breaks to avoid overexertion.",
-            "motion_intensity": motion_intensity
-        })
-
-    # Create alerts in database (avoid duplicates within last 5 minutes)
-    for alert_data in alerts_to_create:
-        # Check if similar alert exists in last 5 minutes
-        recent_similar = db.query(Alert).filter(
-            Alert.user_id == user_id,
-            Alert.alert_type == alert_data["alert_type"],
-            Alert.created_at >= datetime.now(timezone.utc) - timedelta(minutes=5)
-        ).first()
-
-        if not recent_similar:
-            new_alert = Alert(
-                user_id=user_id,
-                alert_type=alert_data["alert_type"],
-                severity=alert_data["severity"],
-                title=alert_data["title"],
-                message=alert_data["message"],
-                heart_rate=alert_data.get("heart_rate", heart_rate),
-                motion_intensity=alert_data.get("motion_intensity", motion_intensity),
-                stress_level=alert_data.get("stress_level", confidence_anomaly),
-                anomaly_score=alert_data.get("anomaly_score", anomaly_score)
-            )
-            db.add(new_alert)
-
-    db.commit()
-
-
-@router.get("/alerts")
-def get_user_alerts(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
-):
-    """
-    Get alerts for the current user (student view).
-    Returns all alerts ordered by creation date.
-    """
-    alerts = db.query(Alert).filter(
-        Alert.user_id == current_user.id
-    ).order_by(Alert.created_at.desc()).limit(50).all()
-
-    return [{
+    created, undo = alert_engine.evaluate(db, [{
+        "user_id": user_id,
+        "heart_rate": heart_rate,
+        "motion_intensity": motion_intensity,
+        "prediction": prediction,
+        "anomaly_score": anomaly_score,
+        "confidence_anomaly": confidence_anomaly,
+        "timestamp": timestamp
+    }])
+
+    # Nothing new: no commit needed
+    if commit and created:
+        try:
+            db.commit()
+        except Exception:
+            alert_engine.restore(undo)
+            raise
+
+    return created
+
+
+def alert_to_dict(a: Alert) -> dict:
+    return {
         "id": a.id,
         "alert_type": a.alert_type,
         "severity": a.severity,
@@ -111,60 +54,57 @@ def get_user_alerts(
         "is_read": a.is_read,
         "created_at": a.created_at.isoformat(),
         "read_at": a.read_at.isoformat() if a.read_at else None
-    } for a in alerts]
+    }
+
+
+# The alert endpoints are polled by the dashboards: they are async and go through
+# services.data_access (the async engine with DB_ASYNC=true)
+@router.get("/alerts")
+async def get_user_alerts(
+    current_user: User = Depends(get_current_principal)
+):
+    """
+    Get alerts for the current user (student view).
+    Returns all alerts ordered by creation date.
+    """
+    alerts = await data_access.recent_alerts(current_user.id, 50)
+
+    return [alert_to_dict(a) for a in alerts]
 
 
 @router.put("/alerts/{alert_id}/mark-read")
-def mark_alert_read(
+async def mark_alert_read(
     alert_id: int,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_principal)
 ):
     """
     Mark an alert as read.
     """
-    alert = db.query(Alert).filter(
-        Alert.id == alert_id,
-        Alert.user_id == current_user.id
-    ).first()
+    updated = await data_access.mark_alerts_read(current_user.id, datetime.now(timezone.utc), alert_id)
 
-    if not alert:
+    # Nothing changed: already read, or not one of this user's alerts
+    if not updated and not await data_access.alert_exists(alert_id, current_user.id):
         raise HTTPException(status_code=404, detail="Alert not found")
 
-    if not alert.is_read:
-        alert.is_read = True
-        alert.read_at = datetime.now(timezone.utc)
-        db.commit()
-
     return {"message": "Alert marked as read"}
 
 
 @router.put("/alerts/mark-all-read")
-def mark_all_alerts_read(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+async def mark_all_alerts_read(
+    current_user: User = Depends(get_current_principal)
 ):
     """
     Mark all unread alerts as read for the current user.
     """
-    updated_count = db.query(Alert).filter(
-        Alert.user_id == current_user.id,
-        Alert.is_read == False
-    ).update({
-        "is_read": True,
-        "read_at": datetime.now(timezone.utc)
-    })
-
-    db.commit()
+    updated_count = await data_access.mark_alerts_read(current_user.id, datetime.now(timezone.utc))
 
     return {"message": f"Marked {updated_count} alerts as read", "count": updated_count}
 
 
 @router.get("/student/{student_id}/alerts")
-def get_student_alerts(
+async def get_student_alerts(
     student_id: int,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_principal)
 ):
     """
     Get alerts for a specific student. Admin/Super Admin only.
@@ -174,25 +114,10 @@ def get_student_alerts(
         raise HTTPException(status_code=403, detail="Only admins can access student alerts")
 
     # Verify the student exists
-    student = db.query(User).filter(User.id == student_id).first()
+    student = await data_access.get_user(student_id)
     if not student:
         raise HTTPException(status_code=404, detail="Student not found")
 
-    alerts = db.query(Alert).filter(
-        Alert.user_id == student_id
-    ).order_by(Alert.created_at.desc()).limit(50).all()
+    alerts = await data_access.recent_alerts(student_id, 50)
 
-    return [{
-        "id": a.id,
-        "alert_type": a.alert_type,
-        "severity": a.severity,
-        "title": a.title,
-        "message": a.message,
-        "heart_rate": a.heart_rate,
-        "motion_intensity": a.motion_intensity,
-        "stress_level": a.stress_level,
-        "anomaly_score": a.anomaly_score,
-        "is_read": a.is_read,
-        "created_at": a.created_at.isoformat(),
-        "read_at": a.read_at.isoformat() if a.read_at else None
-    } for a in alerts]
+    return [alert_to_dict(a) for a in alerts]
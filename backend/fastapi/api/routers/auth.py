@@ -3,13 +3,34 @@ from sqlalchemy.orm import Session
 from pydantic import BaseModel, EmailStr
 from datetime import timedelta
 from database import get_db
-from models_db import User
+from models_db import User, Device
 from models import UserLogin, Token, UserRole
-from utils.auth_utils import hash_password, verify_password, create_access_token, get_current_user, require_role, ACCESS_TOKEN_EXPIRE_MINUTES
+from services.baselines import baseline_store
+from services.device_registry import device_registry
+from services.ring_buffer import metrics_buffer
+from services.executors import db_executor
+from services.hashing import HashingBusy, password_hasher
+from utils.auth_utils import create_access_token, get_current_user, require_role, principal_cache, ACCESS_TOKEN_EXPIRE_MINUTES
 
 router = APIRouter(tags=["Authentication"])
 
 
+# bcrypt runs in the hashing process pool (services/hashing.py), so the handlers that
+# hash are async and run their queries on the DB executor around it
+async def _hash_password(password: str) -> str:
+    try:
+        return await password_hasher.hash(password)
+    except HashingBusy as e:
+        raise HTTPException(status_code=503, detail=f"{e}, please retry", headers={"Retry-After": "1"})
+
+
+async def _verify_password(password: str, hashed_password: str) -> tuple[bool, str | None]:
+    try:
+        return await password_hasher.verify(password, hashed_password)
+    except HashingBusy as e:
+        raise HTTPException(status_code=503, detail=f"{e}, please retry", headers={"Retry-After": "1"})
+
+
 class SignupRequest(BaseModel):
     full_name: str
     username: str
@@ -25,7 +46,7 @@ class LoginRequest(BaseModel):
 
 
 @router.post("/signup", response_model=Token, status_code=status.HTTP_201_CREATED)
-def signup(user: SignupRequest, db: Session = Depends(get_db)):
+async def signup(user: SignupRequest, db: Session = Depends(get_db)):
    
     if user.password != user.confirm_password:
         raise HTTPException(status_code=400, detail="Passwords do not match")
@@ -34,6 +55,11 @@ def signup(user: SignupRequest, db: Session = Depends(get_db)):
     if len(user.password) < 8:
         raise HTTPException(status_code=400, detail="Password must be at least 8 characters long")
 
+    hashed_pw = await _hash_password(user.password)
+    return await db_executor.run(_create_student, db, user, hashed_pw)
+
+
+def _create_student(db: Session, user: SignupRequest, hashed_pw: str):
     existing_user = db.query(User).filter(User.email == user.email).first()
     if existing_user:
         raise HTTPException(status_code=400, detail="Email already registered")
@@ -46,8 +72,6 @@ def signup(user: SignupRequest, db: Session = Depends(get_db)):
     if existing_student_id:
         raise HTTPException(status_code=400, detail="Student ID already registered")
 
-    hashed_pw = hash_password(user.password)
-
     new_user = User(
         full_name=user.full_name,
         username=user.username,
@@ -74,26 +98,42 @@ def signup(user: SignupRequest, db: Session = Depends(get_db)):
 
 
 @router.post("/login", response_model=Token)
-def login(user_credentials: UserLogin, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == user_credentials.email).first()
+async def login(user_credentials: UserLogin, db: Session = Depends(get_db)):
+    user = await db_executor.run(_find_login, db, user_credentials.email)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid email or password"
         )
+    user_id, hashed_password, role = user
 
-    if not verify_password(user_credentials.password, user.password):
+    valid, new_hash = await _verify_password(user_credentials.password, hashed_password)
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid email or password"
         )
+    if new_hash:
+        # Stored with another bcrypt cost than BCRYPT_ROUNDS: upgrade it now that we have the password
+        await db_executor.run(_store_password_hash, db, user_id, new_hash)
 
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": str(user.id)}, expires_delta=access_token_expires
+        data={"sub": str(user_id)}, expires_delta=access_token_expires
     )
 
-    return {"access_token": access_token, "token_type": "bearer", "role": user.role}
+    return {"access_token": access_token, "token_type": "bearer", "role": role}
+
+
+def _find_login(db: Session, email: str):
+    """(id, password hash, role) of the user with this email, or None."""
+    return db.query(User.id, User.password, User.role).filter(User.email == email).first()
+
+
+def _store_password_hash(db: Session, user_id: int, hashed_password: str):
+    db.query(User).filter(User.id == user_id).update({User.password: hashed_password}, synchronize_session=False)
+    db.commit()
+    principal_cache.invalidate_user(user_id)
 
 
 @router.get("/me", response_model=dict)
@@ -135,7 +175,7 @@ class AdminSignupRequest(BaseModel):
 
 
 @router.post("/admin/signup", status_code=status.HTTP_201_CREATED)
-def admin_signup(
+async def admin_signup(
     user: AdminSignupRequest,
     db: Session = Depends(get_db),
     current_user: User = Depends(require_role([UserRole.SUPER_ADMIN]))
@@ -150,6 +190,11 @@ def admin_signup(
     if len(user.password) < 8:
         raise HTTPException(status_code=400, detail="Password must be at least 8 characters long")
 
+    hashed_pw = await _hash_password(user.password)
+    return await db_executor.run(_create_admin, db, user, hashed_pw)
+
+
+def _create_admin(db: Session, user: AdminSignupRequest, hashed_pw: str):
     existing_user = db.query(User).filter(User.email == user.email).first()
     if existing_user:
         raise HTTPException(status_code=400, detail="Email already registered")
@@ -162,8 +207,6 @@ def admin_signup(
     if existing_admin_id:
         raise HTTPException(status_code=400, detail="Admin ID already registered")
 
-    hashed_pw = hash_password(user.password)
-
     new_admin = User(
         full_name=user.full_name,
         username=user.username,
@@ -218,7 +261,7 @@ class AdminUserUpdate(BaseModel):
 
 
 @router.put("/me/update")
-def update_profile(
+async def update_profile(
     data: ProfileUpdate,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
@@ -226,6 +269,17 @@ def update_profile(
     """
     Allows updating own profile. Admins/super admins can update all fields, students can only update limited fields.
     """
+    hashed_pw = None
+    if data.password is not None:
+        if len(data.password) < 8:
+            raise HTTPException(status_code=400, detail="Password must be at least 8 characters long")
+        hashed_pw = await _hash_password(data.password)
+
+    await db_executor.run(_update_own_profile, db, current_user, data, hashed_pw)
+    return {"message": "Profile updated successfully"}
+
+
+def _update_own_profile(db: Session, current_user: User, data: ProfileUpdate, hashed_pw: str | None):
     # Check for unique constraints before updating
     if data.email is not None:
         existing_email = db.query(User).filter(
@@ -272,15 +326,12 @@ def update_profile(
         current_user.emergency_contact = data.emergency_contact
     if data.avatar_url is not None:
         current_user.avatar_url = data.avatar_url
-    if data.password is not None:
-        if len(data.password) < 8:
-            raise HTTPException(status_code=400, detail="Password must be at least 8 characters long")
-        current_user.password = hash_password(data.password)
+    if hashed_pw is not None:
+        current_user.password = hashed_pw
 
     db.commit()
     db.refresh(current_user)
-
-    return {"message": "Profile updated successfully"}
+    principal_cache.invalidate_user(current_user.id)
 
 
 @router.get("/students", response_model=list)
@@ -394,14 +445,24 @@ def delete_user(
                 detail="Cannot delete super admin accounts"
             )
     
+    # The user's devices are deleted with them (cascade), so drop them from the registry too
+    device_ids = [device_id for (device_id,) in db.query(Device.device_id).filter(Device.user_id == user_id).all()]
+
     db.delete(user_to_delete)
     db.commit()
+    principal_cache.invalidate_user(user_id)
+    # The baseline row went with the user; the in-memory one must not be flushed back
+    baseline_store.reset(user_id)
+    metrics_buffer.remove(user_id)
+
+    for device_id in device_ids:
+        device_registry.remove(device_id)
     
     return {"message": "User deleted successfully", "deleted_user_id": user_id}
 
 
 @router.put("/users/{user_id}/update")
-def update_user_profile(
+async def update_user_profile(
     user_id: int,
     data: AdminUserUpdate,
     db: Session = Depends(get_db),
@@ -410,6 +471,17 @@ def update_user_profile(
     """
     Allows admins/super admins to update any user's profile.
     """
+    hashed_pw = None
+    if data.password is not None:
+        if len(data.password) < 8:
+            raise HTTPException(status_code=400, detail="Password must be at least 8 characters long")
+        hashed_pw = await _hash_password(data.password)
+
+    await db_executor.run(_update_user_profile, db, user_id, data, hashed_pw)
+    return {"message": "User profile updated successfully"}
+
+
+def _update_user_profile(db: Session, user_id: int, data: AdminUserUpdate, hashed_pw: str | None):
     user_to_update = db.query(User).filter(User.id == user_id).first()
     if not user_to_update:
         raise HTTPException(status_code=404, detail="User not found")
@@ -451,12 +523,9 @@ def update_user_profile(
         user_to_update.emergency_contact = data.emergency_contact
     if data.avatar_url is not None:
         user_to_update.avatar_url = data.avatar_url
-    if data.password is not None:
-        if len(data.password) < 8:
-            raise HTTPException(status_code=400, detail="Password must be at least 8 characters long")
-        user_to_update.password = hash_password(data.password)
+    if hashed_pw is not None:
+        user_to_update.password = hashed_pw
 
     db.commit()
     db.refresh(user_to_update)
-
-    return {"message": "User profile updated successfully"}
+    principal_cache.invalidate_user(user_id)
@@ -1,15 +1,23 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import func, or_, select
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 from database import get_db
-from models_db import Device, User
+from models_db import Device, Metrics, User
 from datetime import datetime, timezone, timedelta
 from utils.auth_utils import get_current_user, require_admin
+from services.device_registry import DEVICE_ONLINE_SECONDS, device_registry
+import os
 import secrets
 
 # Philippine timezone (UTC+8)
 PH_TZ = timezone(timedelta(hours=8))
 
+# Admin device list (GET /all): page size, default and largest
+DEVICE_PAGE_SIZE = int(os.getenv("DEVICE_PAGE_SIZE", "50"))
+DEVICE_MAX_PAGE_SIZE = int(os.getenv("DEVICE_MAX_PAGE_SIZE", "200"))
+DEVICE_STATUSES = ("paired", "unpaired", "online", "offline")
+
 router = APIRouter(prefix="/api/devices", tags=["devices"])
 
 
@@ -51,6 +59,7 @@ def register_device_for_pairing(request: PairRequest, db: Session = Depends(get_
             device.created_at = datetime.now(PH_TZ)
             db.commit()
             db.refresh(device)
+            device_registry.update(device)
             return {"message": "Device pairing code updated", "device_id": device.device_id}
         else:
             return {"message": "Device already paired", "device_id": device.device_id, "paired": True}
@@ -65,6 +74,7 @@ def register_device_for_pairing(request: PairRequest, db: Session = Depends(get_
     db.add(new_device)
     db.commit()
     db.refresh(new_device)
+    device_registry.update(new_device)
     
     return {
         "message": "Device registered for pairing",
@@ -135,6 +145,7 @@ def pair_device_with_code(
     
     db.commit()
     db.refresh(device)
+    device_registry.update(device)
     
     return {
         "message": "Device successfully paired",
@@ -184,6 +195,7 @@ def unpair_device(current_user: User = Depends(get_current_user), db: Session =
     device.paired_at = None
     
     db.commit()
+    device_registry.update(device)
     
     return {
         "message": "Device unpaired successfully",
@@ -193,38 +205,81 @@ def unpair_device(current_user: User = Depends(get_current_user), db: Session =
 
 @router.get("/all")
 def get_all_devices(
+    device_status: str = Query(None, alias="status", description="paired, unpaired, online or offline"),
+    search: str = Query(None, description="Part of the device id, owner name or owner email"),
+    after_id: int = Query(None, description="Return devices with a greater id (next page)"),
+    limit: int = Query(DEVICE_PAGE_SIZE, ge=1, le=DEVICE_MAX_PAGE_SIZE, description="Maximum number of devices"),
     current_user: User = Depends(require_admin),
     db: Session = Depends(get_db)
 ):
     """
-    Get all devices (admin/super_admin only).
-    Returns device info with owner details.
+    Get devices with owner details (admin/super_admin only), ordered by id.
+    One query per page: owners are joined and the newest reading time comes from
+    a correlated subquery. Pass the returned next_after_id to get the next page.
+    A device is online when it is paired and its owner sent a reading within the
+    last DEVICE_ONLINE_SECONDS.
+
+    Returns {"devices": [...], "next_after_id": id or null}. Until pagination was
+    added this returned a plain list of every device; clients reading the list
+    must use "devices" and follow next_after_id.
     """
-    devices = db.query(Device).all()
-    
-    result = []
-    for device in devices:
-        device_data = {
-            "id": device.id,
-            "device_id": device.device_id,
-            "owner_id": device.user_id,
-            "status": "paired" if device.paired else "unpaired",
-            "paired_at": device.paired_at.isoformat() if device.paired_at else None,
-            "last_seen": device.created_at.isoformat() if device.created_at else None,
-            "owner_name": None,
-            "owner_email": None
-        }
-        
-        # Get owner info if device is paired
-        if device.user_id:
-            user = db.query(User).filter(User.id == device.user_id).first()
-            if user:
-                device_data["owner_name"] = user.full_name
-                device_data["owner_email"] = user.email
-        
-        result.append(device_data)
-    
-    return result
+    if device_status not in (None, *DEVICE_STATUSES):
+        raise HTTPException(status_code=400, detail=f"status must be one of {', '.join(DEVICE_STATUSES)}")
+
+    # Both bounds: readings stored ahead of time (before timestamps were normalised to UTC) are not online
+    now = datetime.now(timezone.utc)
+    online_since = now - timedelta(seconds=DEVICE_ONLINE_SECONDS)
+    last_reading_at = (
+        select(func.max(Metrics.timestamp))
+        .where(Metrics.user_id == Device.user_id)
+        .correlate(Device)
+        .scalar_subquery()
+    )
+
+    query = db.query(Device, User.full_name, User.email, last_reading_at.label("last_reading_at")).outerjoin(
+        User, User.id == Device.user_id
+    )
+    # paired/unpaired (and online: paired first) use ix_devices_paired_id for the id order
+    if device_status in ("paired", "online"):
+        query = query.filter(Device.paired == True)  # noqa: E712
+    elif device_status == "unpaired":
+        query = query.filter(Device.paired == False)  # noqa: E712
+    if device_status == "online":
+        query = query.filter(last_reading_at.between(online_since, now))
+    elif device_status == "offline":
+        query = query.filter(or_(
+            Device.paired == False, last_reading_at == None, ~last_reading_at.between(online_since, now)  # noqa: E711,E712
+        ))
+    if search:
+        pattern = f"%{search}%"
+        query = query.filter(or_(
+            Device.device_id.ilike(pattern), User.full_name.ilike(pattern), User.email.ilike(pattern)
+        ))
+    if after_id is not None:
+        query = query.filter(Device.id > after_id)
+
+    # One extra row tells whether there is a next page
+    rows = query.order_by(Device.id).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    devices = [{
+        "id": device.id,
+        "device_id": device.device_id,
+        "owner_id": device.user_id,
+        "status": "paired" if device.paired else "unpaired",
+        "online": bool(device.paired and last_reading and online_since <= last_reading <= now),
+        "paired_at": device.paired_at.isoformat() if device.paired_at else None,
+        "last_seen": device.created_at.isoformat() if device.created_at else None,
+        "last_reading_at": last_reading.isoformat() if last_reading else None,
+        "owner_name": full_name,
+        "owner_email": email
+    } for device, full_name, email, last_reading in rows]
+
+    return {
+        "devices": devices,
+        "next_after_id": devices[-1]["id"] if has_more else None
+    }
 
 
 @router.delete("/{device_id}/unpair")
@@ -256,6 +311,7 @@ def admin_unpair_device(
     device.paired_at = None
     
     db.commit()
+    device_registry.update(device)
     
     return {
         "message": "Device unpaired successfully",
@@ -283,6 +339,7 @@ def delete_device(
     # Delete the device
     db.delete(device)
     db.commit()
+    device_registry.remove(device_id)
     
     return {
         "message": "Device deleted successfully",
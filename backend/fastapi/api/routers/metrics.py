@@ -1,23 +1,46 @@
+import os
 from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from sqlalchemy import func, text
 from database import get_db, engine
-from models_db import User, Metrics
-from utils.auth_utils import get_current_user
-from datetime import datetime
+from models_db import User, Metrics, UserBaseline
+from utils.auth_utils import get_current_principal, get_current_user
+from utils.downsampling import lttb_indices
+from services.rollups import ROLLUP_RESOLUTIONS, rollup_history
+from services.ring_buffer import metrics_buffer
+from services.baselines import baseline_store
+from services.device_registry import DEVICE_ONLINE_SECONDS
+from services.export import ARROW_FORMATS, EXPORT_FORMATS, pyarrow_available, stream_export
+from services import data_access
+from datetime import datetime, timezone
 
 router = APIRouter(prefix="/metrics", tags=["Metrics"])
 
+# Upper bound on raw rows read for LTTB downsampling; wider windows use rollups
+LTTB_MAX_SOURCE_ROWS = int(os.getenv("LTTB_MAX_SOURCE_ROWS", "50000"))
+HISTORY_RESOLUTIONS = ["raw", "auto", "lttb", *ROLLUP_RESOLUTIONS]
+# Largest `limit` of the history endpoints (LTTB needs at least 3 points: both ends and one bucket)
+HISTORY_MAX_LIMIT = int(os.getenv("HISTORY_MAX_LIMIT", "10000"))
+# Readings returned by the latest endpoints
+LATEST_COUNT = 3
+FLEET_MAX_STUDENTS = int(os.getenv("FLEET_MAX_STUDENTS", "500"))
+
 # NOTE: Sensor data is now received via WebSocket (/ws/sensors)
 # The old HTTP POST /metrics/sensor-data endpoint has been removed
 
+# The latest endpoints are polled every second by the dashboards: they are async and
+# read through services.data_access (the async engine with DB_ASYNC=true)
 @router.get("/latest")
-def get_latest_metrics(current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+async def get_latest_metrics(current_user: User = Depends(get_current_principal)):
+    # Recent readings come from the in-memory ring buffer when it has them
+    buffered = metrics_buffer.latest(current_user.id, LATEST_COUNT)
+    if buffered is not None:
+        return buffered
+
     # Use the Metrics table with user_id filter instead of per-user tables
     try:
-        results = db.query(Metrics).filter(
-            Metrics.user_id == current_user.id
-        ).order_by(Metrics.id.desc()).limit(3).all()
+        results = await data_access.latest_metrics(current_user.id, LATEST_COUNT)
 
         if not results:
             # Return empty array instead of 404 when no data
@@ -46,56 +69,23 @@ def get_metrics_history(
     db: Session = Depends(get_db),
     start_time: str = Query(None, description="Start time in ISO format"),
     end_time: str = Query(None, description="End time in ISO format"),
-    limit: int = Query(1000, description="Maximum number of records to return")
+    limit: int = Query(1000, ge=3, le=HISTORY_MAX_LIMIT, description="Maximum number of records to return"),
+    resolution: str = Query("raw", description="raw, 1m, 15m, 1h, lttb or auto")
 ):
     """
     Get metrics history for the current user within a time range.
     Used by the frontend chart to display live and historical data.
+    `resolution` picks raw rows, a rollup (1m/15m/1h), LTTB downsampling of the
+    raw rows to `limit` points, or `auto` to choose based on the window.
     """
-    query = db.query(Metrics).filter(Metrics.user_id == current_user.id)
-    
-    # Apply time range filters if provided
-    if start_time:
-        try:
-            start_dt = datetime.fromisoformat(start_time.replace('Z', '+00:00'))
-            query = query.filter(Metrics.timestamp >= start_dt)
-        except ValueError:
-            raise HTTPException(status_code=400, detail="Invalid start_time format. Use ISO format.")
-    
-    if end_time:
-        try:
-            end_dt = datetime.fromisoformat(end_time.replace('Z', '+00:00'))
-            query = query.filter(Metrics.timestamp <= end_dt)
-        except ValueError:
-            raise HTTPException(status_code=400, detail="Invalid end_time format. Use ISO format.")
-    
-    # When no time filter is specified, fetch the LAST N records (most recent)
-    # Order descending, limit, then reverse to ascending for chart display
-    if not start_time and not end_time:
-        results = query.order_by(Metrics.timestamp.desc()).limit(limit).all()
-        results.reverse()  # Reverse to ascending order for chart
-    else:
-        # With time filters, just order ascending normally
-        results = query.order_by(Metrics.timestamp.asc()).limit(limit).all()
-
-    return [{
-        "id": m.id,
-        "heart_rate": m.heart_rate,
-        "motion_intensity": m.motion_intensity,
-        "prediction": m.prediction,
-        "anomaly_score": m.anomaly_score,
-        "confidence_normal": m.confidence_normal,
-        "confidence_anomaly": m.confidence_anomaly,
-        "timestamp": m.timestamp.isoformat()
-    } for m in results]
+    return _metrics_history(db, current_user.id, start_time, end_time, limit, resolution)
 
 
 # Admin-only endpoints for monitoring students
 @router.get("/student/{student_id}/latest")
-def get_student_latest_metrics(
+async def get_student_latest_metrics(
     student_id: int,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_principal)
 ):
     """
     Get latest metrics for a specific student. Admin/Super Admin only.
@@ -105,17 +95,20 @@ def get_student_latest_metrics(
         raise HTTPException(status_code=403, detail="Only admins can access student metrics")
     
     # Verify the student exists and is a student
-    student = db.query(User).filter(User.id == student_id).first()
+    student = await data_access.get_user(student_id)
     if not student:
         raise HTTPException(status_code=404, detail="Student not found")
     
     if student.role != "student":
         raise HTTPException(status_code=400, detail="User is not a student")
     
+    # Recent readings come from the in-memory ring buffer when it has them
+    buffered = metrics_buffer.latest(student_id, LATEST_COUNT)
+    if buffered is not None:
+        return buffered
+
     # Get latest metrics for the student
-    results = db.query(Metrics).filter(
-        Metrics.user_id == student_id
-    ).order_by(Metrics.id.desc()).limit(3).all()
+    results = await data_access.latest_metrics(student_id, LATEST_COUNT)
     
     if not results:
         return []
@@ -132,6 +125,73 @@ def get_student_latest_metrics(
     } for m in results]
 
 
+@router.get("/fleet")
+async def get_fleet_snapshot(
+    student_ids: str = Query(None, description="Comma-separated student ids; all students if omitted"),
+    after_id: int = Query(None, description="Return students with a greater id (next page of all students)"),
+    limit: int = Query(FLEET_MAX_STUDENTS, ge=1, le=FLEET_MAX_STUDENTS, description="Maximum number of students"),
+    current_user: User = Depends(get_current_principal)
+):
+    """
+    Snapshot of many students at once for the admin dashboard: newest reading,
+    device status and unread alert count per student, from a single query.
+    Admin/Super Admin only. Without student_ids, pages through all students
+    by id: pass the returned next_after_id to get the next page.
+    """
+    if current_user.role not in ["admin", "super_admin"]:
+        raise HTTPException(status_code=403, detail="Only admins can access student metrics")
+
+    ids = None
+    if student_ids:
+        try:
+            ids = sorted({int(i) for i in student_ids.split(",") if i.strip()})
+        except ValueError:
+            raise HTTPException(status_code=400, detail="student_ids must be a comma-separated list of ids")
+        if len(ids) > limit:
+            raise HTTPException(status_code=400, detail=f"At most {limit} student_ids per request")
+
+    rows = await data_access.fleet_snapshot(ids, after_id, limit)
+
+    # Readings "from the future" (stored before timestamps were normalised to UTC) are not online
+    now = datetime.now(timezone.utc)
+    students = []
+    for id, full_name, school_id, avatar_url, device_id, unread_alerts, m in rows:
+        if device_id is None:
+            device_status = "no_device"
+        elif m is not None and m.timestamp and 0 <= (now - m.timestamp).total_seconds() <= DEVICE_ONLINE_SECONDS:
+            device_status = "online"
+        else:
+            device_status = "offline"
+
+        students.append({
+            "id": id,
+            "full_name": full_name,
+            "student_id": school_id,
+            "avatar_url": avatar_url,
+            "device_id": device_id,
+            "device_status": device_status,
+            "unread_alerts": unread_alerts,
+            "latest": {
+                "id": m.id,
+                "heart_rate": m.heart_rate,
+                "motion_intensity": m.motion_intensity,
+                "prediction": m.prediction,
+                "anomaly_score": m.anomaly_score,
+                "confidence_normal": m.confidence_normal,
+                "confidence_anomaly": m.confidence_anomaly,
+                "timestamp": m.timestamp.isoformat() if m.timestamp else None
+            } if m is not None else None
+        })
+
+    return {
+        "students": students,
+        # Only when paging through all students and the page is full
+        "next_after_id": students[-1]["id"] if ids is None and len(students) == limit else None,
+        "online_seconds": DEVICE_ONLINE_SECONDS,
+        "generated_at": now.isoformat()
+    }
+
+
 @router.get("/student/{student_id}/history")
 def get_student_metrics_history(
     student_id: int,
@@ -139,7 +199,8 @@ def get_student_metrics_history(
     db: Session = Depends(get_db),
     start_time: str = Query(None, description="Start time in ISO format"),
     end_time: str = Query(None, description="End time in ISO format"),
-    limit: int = Query(1000, description="Maximum number of records to return")
+    limit: int = Query(1000, ge=3, le=HISTORY_MAX_LIMIT, description="Maximum number of records to return"),
+    resolution: str = Query("raw", description="raw, 1m, 15m, 1h, lttb or auto")
 ):
     """
     Get metrics history for a specific student. Admin/Super Admin only.
@@ -156,32 +217,205 @@ def get_student_metrics_history(
     if student.role != "student":
         raise HTTPException(status_code=400, detail="User is not a student")
     
-    # Build query for student metrics
-    query = db.query(Metrics).filter(Metrics.user_id == student_id)
-    
-    # Apply time range filters if provided
-    if start_time:
-        try:
-            start_dt = datetime.fromisoformat(start_time.replace('Z', '+00:00'))
-            query = query.filter(Metrics.timestamp >= start_dt)
-        except ValueError:
-            raise HTTPException(status_code=400, detail="Invalid start_time format. Use ISO format.")
-    
-    if end_time:
+    return _metrics_history(db, student_id, start_time, end_time, limit, resolution)
+
+
+@router.get("/baseline")
+def get_baseline(current_user: User = Depends(get_current_user)):
+    """
+    The current user's heart rate and motion baseline. `ready` tells whether
+    readings are already scored against it.
+    """
+    return baseline_store.get(current_user.id) or {"user_id": current_user.id, "sample_count": 0, "ready": False}
+
+
+@router.get("/student/{student_id}/baseline")
+def get_student_baseline(
+    student_id: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Get the baseline of a specific student. Admin/Super Admin only.
+    """
+    _require_student(db, current_user, student_id)
+    return baseline_store.get(student_id) or {"user_id": student_id, "sample_count": 0, "ready": False}
+
+
+@router.delete("/student/{student_id}/baseline")
+def reset_student_baseline(
+    student_id: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Discard a student's baseline (e.g. after a change in medication or training).
+    It is rebuilt from the next readings. Admin/Super Admin only.
+    """
+    _require_student(db, current_user, student_id)
+    baseline_store.reset(student_id)
+    db.query(UserBaseline).filter(UserBaseline.user_id == student_id).delete()
+    db.commit()
+    return {"message": "Baseline reset successfully"}
+
+
+def _require_student(db: Session, current_user: User, student_id: int):
+    if current_user.role not in ["admin", "super_admin"]:
+        raise HTTPException(status_code=403, detail="Only admins can access student metrics")
+
+    student = db.query(User).filter(User.id == student_id).first()
+    if not student:
+        raise HTTPException(status_code=404, detail="Student not found")
+
+    if student.role != "student":
+        raise HTTPException(status_code=400, detail="User is not a student")
+
+
+@router.get("/export")
+def export_metrics(
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+    student_ids: str = Query(None, description="Comma-separated student ids (admins only)"),
+    start_time: str = Query(None, description="Start time in ISO format"),
+    end_time: str = Query(None, description="End time in ISO format"),
+    format: str = Query("ndjson", description="ndjson, csv, parquet or arrow")
+):
+    """
+    Stream raw metrics as a file download, ordered by student and time.
+    Students export their own data; admins pass one or more student ids.
+    The body is streamed in chunks from a server-side cursor, so months of
+    1 Hz data can be exported without loading them into memory.
+    """
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Invalid format. Use one of: {', '.join(EXPORT_FORMATS)}")
+    if format in ARROW_FORMATS and not pyarrow_available():
+        raise HTTPException(status_code=400, detail=f"{format} export requires the pyarrow package")
+
+    start_dt = _parse_time(start_time, "start_time") if start_time else None
+    end_dt = _parse_time(end_time, "end_time") if end_time else None
+
+    if current_user.role in ["admin", "super_admin"]:
         try:
-            end_dt = datetime.fromisoformat(end_time.replace('Z', '+00:00'))
-            query = query.filter(Metrics.timestamp <= end_dt)
+            user_ids = {int(i) for i in student_ids.split(",") if i.strip()} if student_ids else set()
         except ValueError:
-            raise HTTPException(status_code=400, detail="Invalid end_time format. Use ISO format.")
-    
+            raise HTTPException(status_code=400, detail="student_ids must be a comma-separated list of ids")
+        if not user_ids:
+            raise HTTPException(status_code=400, detail="student_ids is required for admins")
+
+        found = db.query(User.id).filter(User.id.in_(user_ids), User.role == "student").count()
+        if found != len(user_ids):
+            raise HTTPException(status_code=404, detail="Student not found")
+    else:
+        if student_ids and {i.strip() for i in student_ids.split(",") if i.strip()} != {str(current_user.id)}:
+            raise HTTPException(status_code=403, detail="Students can only export their own metrics")
+        user_ids = {current_user.id}
+
+    media_type, extension = EXPORT_FORMATS[format]
+    filename = f"metrics_{datetime.now(timezone.utc):%Y%m%d_%H%M%S}.{extension}"
+    return StreamingResponse(
+        stream_export(sorted(user_ids), start_dt, end_dt, format),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+def _parse_time(value: str, name: str) -> datetime:
+    """An ISO time from a query parameter; times without an offset are taken as UTC."""
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid {name} format. Use ISO format.")
+    # TZDateTime only binds aware values; failing later would cut off a streamed export
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def _choose_resolution(start_dt, end_dt, limit: int) -> str:
+    """Finest resolution whose point count for the window fits in `limit` (raw data is ~1 Hz)."""
+    if start_dt is None:
+        return "raw"
+
+    span = _window_seconds(start_dt, end_dt)
+    if span <= limit:
+        return "raw"
+    if span <= LTTB_MAX_SOURCE_ROWS:
+        return "lttb"
+    return _rollup_resolution(span, limit)
+
+
+def _window_seconds(start_dt, end_dt) -> float:
+    """Length of the window in seconds; an open end is now."""
+    end_dt = end_dt or datetime.now(timezone.utc)
+    if start_dt.tzinfo is None:
+        start_dt = start_dt.replace(tzinfo=timezone.utc)
+    if end_dt.tzinfo is None:
+        end_dt = end_dt.replace(tzinfo=timezone.utc)
+    return (end_dt - start_dt).total_seconds()
+
+
+def _rollup_resolution(span: float, limit: int) -> str:
+    """Finest rollup with at most `limit` buckets in `span` seconds."""
+    for label, seconds in ROLLUP_RESOLUTIONS.items():
+        if span / seconds <= limit:
+            return label
+    return "1h"
+
+
+def _metrics_history(db: Session, user_id: int, start_time, end_time, limit: int, resolution: str):
+    """Shared body of the history endpoints."""
+    if resolution not in HISTORY_RESOLUTIONS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid resolution. Use one of: {', '.join(HISTORY_RESOLUTIONS)}"
+        )
+
+    start_dt = _parse_time(start_time, "start_time") if start_time else None
+    end_dt = _parse_time(end_time, "end_time") if end_time else None
+
+    if resolution == "auto":
+        resolution = _choose_resolution(start_dt, end_dt, limit)
+
+    query = db.query(Metrics).filter(Metrics.user_id == user_id)
+
+    # Apply time range filters if provided
+    if start_dt:
+        query = query.filter(Metrics.timestamp >= start_dt)
+    if end_dt:
+        query = query.filter(Metrics.timestamp <= end_dt)
+
+    # LTTB over a window with more than LTTB_MAX_SOURCE_ROWS readings would only see its
+    # beginning: use the rollup that auto picks for such windows (counting stops at the cap)
+    if resolution == "lttb" and start_dt and query.limit(LTTB_MAX_SOURCE_ROWS + 1).count() > LTTB_MAX_SOURCE_ROWS:
+        resolution = _rollup_resolution(_window_seconds(start_dt, end_dt), limit)
+
+    # Pre-aggregated buckets maintained by the ingestion path
+    if resolution in ROLLUP_RESOLUTIONS:
+        return rollup_history(db, user_id, ROLLUP_RESOLUTIONS[resolution], start_dt, end_dt, limit)
+
+    # Short recent windows are answered from the in-memory ring buffer
+    if resolution == "raw":
+        buffered = metrics_buffer.history(user_id, start_dt, end_dt, limit)
+        if buffered is not None:
+            return buffered
+
+    # LTTB reads the whole window (up to a cap) and keeps `limit` representative points
+    fetch_limit = max(limit, LTTB_MAX_SOURCE_ROWS) if resolution == "lttb" else limit
+
     # When no time filter is specified, fetch the LAST N records (most recent)
-    # Order descending, limit, then reverse to ascending for chart display
-    if not start_time and not end_time:
-        results = query.order_by(Metrics.timestamp.desc()).limit(limit).all()
+    # Order descending, limit, then reverse to ascending for chart display.
+    # LTTB without a start downsamples the newest readings (before end_time, if given)
+    if not start_dt and (not end_dt or resolution == "lttb"):
+        results = query.order_by(Metrics.timestamp.desc()).limit(fetch_limit).all()
         results.reverse()  # Reverse to ascending order for chart
     else:
         # With time filters, just order ascending normally
-        results = query.order_by(Metrics.timestamp.asc()).limit(limit).all()
+        results = query.order_by(Metrics.timestamp.asc()).limit(fetch_limit).all()
+
+    if resolution == "lttb" and len(results) > limit:
+        kept = lttb_indices(
+            [m.timestamp.timestamp() for m in results],
+            [m.heart_rate for m in results],
+            limit
+        )
+        results = [results[i] for i in kept]
 
     return [{
         "id": m.id,
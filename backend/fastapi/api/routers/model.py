@@ -0,0 +1,143 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from pydantic import BaseModel
+from models_db import User
+from utils.auth_utils import require_admin
+from ai_model.model import (
+    INFERENCE_MODE, active_model, activate, current_version, list_versions, set_current, set_shadow, version_meta
+)
+from services.shadow import shadow_scorer
+from services.training import training_jobs
+
+router = APIRouter(prefix="/model", tags=["Model"])
+
+
+class TrainRequest(BaseModel):
+    max_samples: int | None = None
+    seed: int | None = None
+    # False: only register the new version (e.g. to shadow it before promoting)
+    promote: bool = True
+
+
+class ShadowRequest(BaseModel):
+    version: str
+
+
+@router.get("")
+def get_model(current_user: User = Depends(require_admin)):
+    """
+    The model version serving predictions in the worker that answers, the version
+    CURRENT points at and the shadow version, if any (admin/super_admin only).
+    """
+    loaded = active_model()
+    return {
+        "active_version": loaded.version if loaded else None,
+        "current_version": current_version(),
+        "shadow_version": shadow_scorer.version,
+        "inference_mode": INFERENCE_MODE,
+    }
+
+
+@router.get("/versions")
+def list_model_versions(current_user: User = Depends(require_admin)):
+    """
+    Registered model versions, newest first, with their training metadata: training
+    data window, sample counts, score distribution, validation and training time
+    (admin/super_admin only).
+    """
+    return list_versions()
+
+
+@router.get("/versions/{version}")
+def get_model_version(version: str, current_user: User = Depends(require_admin)):
+    """Training metadata of one model version (admin/super_admin only)."""
+    meta = version_meta(version)
+    if meta is None:
+        raise HTTPException(status_code=404, detail="Model version not found")
+    return meta
+
+
+@router.post("/versions/{version}/promote")
+def promote_model_version(version: str, current_user: User = Depends(require_admin)):
+    """
+    Make a version the one serving predictions and point CURRENT at it (admin/super_admin only).
+    Any registered version can be promoted, including an older one to roll back.
+    The other worker processes follow within MODEL_SYNC_SECONDS.
+    """
+    if version_meta(version) is None:
+        raise HTTPException(status_code=404, detail="Model version not found")
+    try:
+        activate(version)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to load model version: {e}")
+    set_current(version)
+
+    # Comparing production against itself tells nothing
+    if shadow_scorer.version == version:
+        shadow_scorer.stop()
+        set_shadow(None)
+
+    return {"active_version": version, "current_version": current_version()}
+
+
+@router.get("/shadow")
+def get_shadow(current_user: User = Depends(require_admin)):
+    """
+    The shadow version and how it compares to production on live traffic so far:
+    disagreement rate, anomaly rates, mean score difference (admin/super_admin only).
+    Every worker shadow-scores its own traffic; the counters are this worker's.
+    """
+    return shadow_scorer.stats()
+
+
+@router.put("/shadow")
+def start_shadow(request: ShadowRequest, current_user: User = Depends(require_admin)):
+    """
+    Shadow-score live traffic with a version, starting its comparison afresh (admin/super_admin only).
+    The other worker processes follow within MODEL_SYNC_SECONDS.
+    """
+    if version_meta(request.version) is None:
+        raise HTTPException(status_code=404, detail="Model version not found")
+    try:
+        stats = shadow_scorer.start(request.version)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to load model version: {e}")
+    set_shadow(request.version)
+    return stats
+
+
+@router.delete("/shadow")
+def stop_shadow(current_user: User = Depends(require_admin)):
+    """Stop shadow scoring, in every worker (admin/super_admin only)."""
+    shadow_scorer.stop()
+    set_shadow(None)
+    return {"message": "Shadow scoring stopped"}
+
+
+@router.post("/train", status_code=status.HTTP_202_ACCEPTED)
+def start_training(request: TrainRequest, current_user: User = Depends(require_admin)):
+    """
+    Start training a new model version in the background (admin/super_admin only).
+    The version is validated and swapped in once training succeeds (unless promote
+    is false); poll the job for progress.
+    """
+    if request.max_samples is not None and request.max_samples < 10:
+        raise HTTPException(status_code=400, detail="max_samples must be at least 10")
+    try:
+        return training_jobs.start(max_samples=request.max_samples, seed=request.seed, promote=request.promote)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+@router.get("/jobs")
+def list_training_jobs(current_user: User = Depends(require_admin)):
+    """Recent training jobs, newest first (admin/super_admin only)."""
+    return training_jobs.list()
+
+
+@router.get("/jobs/{job_id}")
+def get_training_job(job_id: str, current_user: User = Depends(require_admin)):
+    """Status and progress of a training job (admin/super_admin only)."""
+    job = training_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Training job not found")
+    return job
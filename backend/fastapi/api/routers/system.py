@@ -0,0 +1,56 @@
+from fastapi import APIRouter, Depends, HTTPException
+from database import pool_stats
+from models_db import User
+from utils.auth_utils import principal_cache, require_admin
+from services.executors import executor_stats
+from services.ingestion import ingestion_pipeline
+from services.pubsub import pubsub
+from services.ring_buffer import metrics_buffer
+from services.alert_engine import alert_engine
+from services.baselines import baseline_store
+from services.shadow import shadow_scorer
+from services.model_sync import model_sync
+from services.hashing import password_hasher
+
+router = APIRouter(prefix="/system", tags=["System"])
+
+
+@router.get("/stats")
+async def get_system_stats(current_user: User = Depends(require_admin)):
+    """
+    Runtime statistics for sizing the worker pools (admin/super_admin only).
+    Queue depths are current values; wait and run times are averages since startup.
+    Async so it reads the loop-owned pub/sub state on the event loop.
+    """
+    return {
+        "executors": executor_stats(),
+        "db_pool": pool_stats(),
+        "ingestion": ingestion_pipeline.stats(),
+        "pubsub": pubsub.stats(),
+        "ring_buffer": metrics_buffer.stats(),
+        "alert_engine": alert_engine.stats(),
+        "baselines": baseline_store.stats(),
+        "shadow": shadow_scorer.stats(),
+        "model_sync": model_sync.stats(),
+        "auth_cache": principal_cache.stats(),
+        "password_hashing": password_hasher.stats(),
+    }
+
+
+@router.get("/alert-rules")
+def get_alert_rules(current_user: User = Depends(require_admin)):
+    """The alert rule configuration in effect (admin/super_admin only)."""
+    return {**alert_engine.rules.summary(), "config": alert_engine.rules.config}
+
+
+@router.post("/alert-rules/reload")
+def reload_alert_rules(current_user: User = Depends(require_admin)):
+    """
+    Re-read and compile ALERT_RULES_PATH without a restart (admin/super_admin only).
+    An invalid file is rejected and the current rules stay in effect.
+    Applies to the worker that serves the request; reload each worker (or restart) when running several.
+    """
+    try:
+        return alert_engine.load_rules()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
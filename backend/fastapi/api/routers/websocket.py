@@ -1,12 +1,16 @@
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect
-from sqlalchemy.orm import Session
-from database import SessionLocal
-from models_db import Device, Metrics
+from fastapi import APIRouter, HTTPException, Query, WebSocket, WebSocketDisconnect
 from datetime import datetime, timezone, timedelta
-from routers.alerts import generate_alert_if_needed
-from ai_model.model import predict
+from database import SessionLocal
+from models_db import User
+from utils.auth_utils import get_user_from_token
+from services.ingestion import ingestion_pipeline
+from services.device_registry import device_registry
+from services.executors import db_executor
+from services.pubsub import pubsub
+import asyncio
 import json
 import logging
+import os
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -14,15 +18,22 @@ logger = logging.getLogger(__name__)
 # Philippine timezone (UTC+8)
 PH_TZ = timezone(timedelta(hours=8))
 
+# Idle dashboard sockets get a ping this often so proxies keep them open
+DASHBOARD_PING_SECONDS = float(os.getenv("DASHBOARD_PING_SECONDS", "25"))
+
 
 @router.websocket("/ws/sensors")
 async def websocket_sensor_endpoint(websocket: WebSocket):
     """
     WebSocket endpoint for real-time sensor data from ESP32 devices.
+    Frames are handed to the ingestion pipeline, which stores them in micro-batches.
     """
     await websocket.accept()
     logger.info("WebSocket connection accepted")
 
+    # Registry entry of the device streaming on this socket, bound after the first frame
+    device = None
+
     try:
         while True:
             # Receive data from ESP32
@@ -32,86 +43,149 @@ async def websocket_sensor_endpoint(websocket: WebSocket):
             try:
                 payload = json.loads(data)
                 device_id = payload.get("device_id")
-                heart_rate = payload.get("heart_rate", 0)
-                motion_intensity = payload.get("motion_intensity", 0)
-
-                # Get database session
-                db = SessionLocal()
-
-                try:
-                    # Verify device exists and is paired
-                    device = db.query(Device).filter(Device.device_id == device_id).first()
-                    if not device or not device.paired or not device.user_id:
-                        logger.warning(f"Device {device_id} not paired, skipping")
-                        await websocket.send_text(json.dumps({
-                            "status": "error",
-                            "message": "Device not paired"
-                        }))
-                        continue
-
-                    # Run AI prediction on incoming sensor data (same as HTTP endpoint)
-                    result = predict(heart_rate, motion_intensity)
-
-                    # Save to database
-                    new_metric = Metrics(
-                        user_id=device.user_id,
-                        heart_rate=heart_rate,
-                        motion_intensity=motion_intensity,
-                        timestamp=datetime.now(PH_TZ),
-                        prediction=result["prediction"],
-                        anomaly_score=result["anomaly_score"],
-                        confidence_normal=result["confidence_normal"],
-                        confidence_anomaly=result["confidence_anomaly"]
-                    )
-                    db.add(new_metric)
-                    db.commit()
-                    db.refresh(new_metric)
-
-                    logger.info(f"✓ Saved metric {new_metric.id} for user {device.user_id}")
-
-                    # Generate AI-driven alerts if abnormal readings detected
-                    generate_alert_if_needed(
-                        db=db,
-                        user_id=device.user_id,
-                        heart_rate=heart_rate,
-                        motion_intensity=motion_intensity,
-                        prediction=result["prediction"],
-                        anomaly_score=result["anomaly_score"],
-                        confidence_anomaly=result["confidence_anomaly"],
-                        timestamp=new_metric.timestamp
-                    )
-
-                    # Send response back to device
-                    response = {
-                        "status": "success",
-                        "metric_id": new_metric.id,
-                        "prediction": result["prediction"],
-                        "stress_level": int(result["confidence_anomaly"]),  # Stress level is confidence_anomaly as integer
-                        "anomaly_score": result["anomaly_score"],
-                        "confidence_anomaly": result["confidence_anomaly"]
-                    }
-
-                    await websocket.send_text(json.dumps(response))
-                    logger.info(f"✓ Sent response: Stress={int(result['confidence_anomaly'])}%")
-
-                except Exception as e:
-                    logger.error(f"Error processing WebSocket message: {str(e)}")
-                    db.rollback()
-                    await websocket.send_text(json.dumps({
-                        "status": "error",
-                        "message": str(e)
-                    }))
-                finally:
-                    db.close()
+                heart_rate = float(payload.get("heart_rate", 0))
+                motion_intensity = float(payload.get("motion_intensity", 0))
 
-            except json.JSONDecodeError:
+            except (json.JSONDecodeError, TypeError, ValueError, AttributeError):
                 logger.error(f"Invalid JSON in WebSocket message: {data}")
                 await websocket.send_text(json.dumps({
                     "status": "error",
                     "message": "Invalid JSON format"
                 }))
+                continue
+
+            try:
+                # Verify device exists and is paired (from the registry, DB only on miss/expiry)
+                if device is None or device.device_id != device_id or device.is_stale():
+                    device = device_registry.get(device_id)
+                    if device is None:
+                        device = await db_executor.run(device_registry.refresh, device_id)
+
+                user_id = device.user_id
+                if not user_id:
+                    logger.warning(f"Device {device_id} not paired, skipping")
+                    await websocket.send_text(json.dumps({
+                        "status": "error",
+                        "message": "Device not paired"
+                    }))
+                    continue
+
+                # Wait until the frame's batch is committed
+                response = await ingestion_pipeline.submit(
+                    device_id,
+                    user_id,
+                    heart_rate,
+                    motion_intensity,
+                    timestamp=datetime.now(PH_TZ)
+                )
+            except Exception as e:
+                logger.error(f"Error processing WebSocket message: {str(e)}")
+                response = {
+                    "status": "error",
+                    "message": str(e)
+                }
+
+            # Send response back to device
+            await websocket.send_text(json.dumps(response))
+            if response["status"] == "success":
+                logger.info(f"✓ Sent response: Stress={response['stress_level']}%")
 
     except WebSocketDisconnect:
         logger.info("WebSocket disconnected")
     except Exception as e:
         logger.error(f"WebSocket error: {str(e)}")
+
+
+def _dashboard_topics(token: str, student_ids: str | None):
+    """
+    Authenticate a dashboard socket and return the user ids it may follow.
+    Students follow themselves; admins follow the students they list. Runs on the DB executor.
+    """
+    db = SessionLocal()
+    try:
+        user = get_user_from_token(token, db)
+        if user.role not in ["admin", "super_admin"]:
+            return [user.id]
+
+        try:
+            requested = {int(i) for i in student_ids.split(",") if i.strip()} if student_ids else set()
+        except ValueError:
+            raise HTTPException(status_code=400, detail="student_ids must be a comma-separated list of ids")
+        if not requested:
+            raise HTTPException(status_code=400, detail="student_ids is required for admins")
+
+        found = [row.id for row in db.query(User.id).filter(User.id.in_(requested), User.role == "student")]
+        if len(found) != len(requested):
+            raise HTTPException(status_code=404, detail="Student not found")
+        return sorted(found)
+    finally:
+        db.close()
+
+
+async def _wait_for_disconnect(websocket: WebSocket):
+    """Read (and ignore) client messages until the socket closes."""
+    try:
+        while True:
+            await websocket.receive_text()
+    except (WebSocketDisconnect, RuntimeError):
+        return
+
+
+@router.websocket("/ws/dashboard")
+async def websocket_dashboard_endpoint(
+    websocket: WebSocket,
+    token: str = Query(None),
+    student_ids: str = Query(None, description="Comma-separated student ids (admins only)")
+):
+    """
+    Live dashboard stream: new metrics and alerts of the followed users, pushed as
+    soon as their batch is committed. Replaces polling /metrics/latest,
+    /metrics/history and /metrics/alerts every second.
+
+    Messages: {"type": "metric" | "alert", "user_id", "data"} with data shaped like
+    the HTTP endpoints return it, "ping" when idle, and "resync" when this client
+    fell behind and lost events (refetch over HTTP).
+    """
+    await websocket.accept()
+
+    try:
+        topics = await db_executor.run(_dashboard_topics, token, student_ids)
+    except HTTPException as e:
+        await websocket.send_text(json.dumps({"type": "error", "status_code": e.status_code, "message": e.detail}))
+        await websocket.close(code=1008)
+        return
+
+    subscription = pubsub.subscribe(topics)
+    disconnected = asyncio.create_task(_wait_for_disconnect(websocket))
+    dropped = 0
+
+    try:
+        await websocket.send_text(json.dumps({"type": "subscribed", "user_ids": topics}))
+
+        while True:
+            next_event = asyncio.ensure_future(subscription.get())
+            done, _ = await asyncio.wait(
+                {next_event, disconnected},
+                timeout=DASHBOARD_PING_SECONDS,
+                return_when=asyncio.FIRST_COMPLETED
+            )
+
+            if next_event not in done:
+                next_event.cancel()
+                if disconnected in done:
+                    break
+                await websocket.send_text(json.dumps({"type": "ping"}))
+                continue
+
+            if subscription.dropped != dropped:
+                dropped = subscription.dropped
+                await websocket.send_text(json.dumps({"type": "resync"}))
+            await websocket.send_text(json.dumps(next_event.result()))
+
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        logger.error(f"Dashboard WebSocket error: {str(e)}")
+    finally:
+        pubsub.unsubscribe(subscription)
+        disconnected.cancel()
@@ -0,0 +1,95 @@
+"""
+Script to build the metrics rollups (1m/15m/1h buckets) from existing raw metrics.
+
+The ingestion path only rolls up rows it writes itself, so metrics stored before
+rollups existed need this once. By default the script rebuilds every bucket
+before the end of the first hour that already has live rollups (that hour only
+holds the rows written after the upgrade), leaving newer buckets alone. Run it
+once that hour is over.
+
+--all drops and rebuilds every rollup; stop the ingestion workers first.
+
+Usage: python scripts/backfill_rollups.py [--chunk-size 50000] [--all]
+"""
+import argparse
+import os
+import sys
+from datetime import timedelta
+
+# Add parent directory to path to import database modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import func
+from database import SessionLocal
+from models_db import Metrics, MetricsRollup
+from services.rollups import ROLLUP_RESOLUTIONS, aggregate_rows, bucket_start, upsert_rollups
+
+
+def rollup_cutoff(db):
+    """End of the first hour with live rollups, or None when no rollups exist yet."""
+    hour = ROLLUP_RESOLUTIONS["1h"]
+    first = db.query(func.min(MetricsRollup.bucket_start)).filter(MetricsRollup.resolution == hour).scalar()
+    if first is None:
+        return None
+    return bucket_start(first, hour) + timedelta(seconds=hour)
+
+
+def backfill_rollups(chunk_size: int, rebuild_all: bool):
+    """Rebuild rollups from raw metrics in chunks. Returns the number of raw rows read."""
+    db = SessionLocal()
+
+    try:
+        cutoff = None if rebuild_all else rollup_cutoff(db)
+
+        # Drop the buckets that are about to be rebuilt
+        stale = db.query(MetricsRollup)
+        if cutoff is not None:
+            stale = stale.filter(MetricsRollup.bucket_start < cutoff)
+            print(f"  - Rebuilding buckets before {cutoff.isoformat()}")
+        deleted = stale.delete(synchronize_session=False)
+        print(f"  - Removed {deleted} existing rollup row(s)")
+
+        query = db.query(
+            Metrics.id, Metrics.user_id, Metrics.timestamp, Metrics.heart_rate, Metrics.motion_intensity,
+            Metrics.confidence_anomaly, Metrics.prediction
+        ).filter(Metrics.timestamp.isnot(None))
+        if cutoff is not None:
+            query = query.filter(Metrics.timestamp < cutoff)
+
+        # Walk the table in id order so memory stays bounded by the chunk size.
+        # Everything commits at the end, so an interrupted run leaves the old rollups in place.
+        after = 0
+        processed = 0
+        while True:
+            rows = query.filter(Metrics.id > after).order_by(Metrics.id).limit(chunk_size).all()
+            if not rows:
+                break
+
+            upsert_rollups(db, aggregate_rows([row._asdict() for row in rows]))
+            after = rows[-1].id
+            processed += len(rows)
+            print(f"  - Rolled up {processed} row(s)")
+
+        db.commit()
+        return processed
+
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build metrics rollups from raw metrics")
+    parser.add_argument("--chunk-size", type=int, default=50000, help="Raw rows aggregated per chunk")
+    parser.add_argument("--all", action="store_true", help="Drop and rebuild every rollup")
+    args = parser.parse_args()
+
+    print("\n📊 Backfilling metrics rollups\n")
+    try:
+        processed = backfill_rollups(args.chunk_size, args.all)
+        print(f"\n✓ Rolled up {processed} raw row(s)")
+    except Exception as e:
+        print(f"\n❌ Error: {str(e)}")
+        sys.exit(1)
@@ -0,0 +1,66 @@
+"""
+Script to create indexes declared in models_db.py that an existing database is missing.
+create_all() only creates indexes together with new tables, so databases created
+before an index was added need this once.
+On PostgreSQL, indexes on regular tables are built CONCURRENTLY (no write lock).
+Usage: python scripts/create_indexes.py
+"""
+import os
+import sys
+
+# Add parent directory to path to import database modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import inspect, text
+from sqlalchemy.schema import CreateIndex
+from database import engine
+from models_db import Base
+from utils.timeseries import is_metrics_partitioned
+
+
+def create_missing_indexes():
+    """Create every declared index that does not exist yet. Returns the names created."""
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    created = []
+
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in sorted(table.indexes, key=lambda i: i.name):
+            if index.name in existing:
+                continue
+
+            print(f"  - Creating {index.name} on {table.name}...")
+            if engine.dialect.name == "postgresql":
+                # CONCURRENTLY cannot run inside a transaction, nor on a partitioned parent
+                with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+                    ddl = str(CreateIndex(index, if_not_exists=True).compile(dialect=engine.dialect))
+                    if not (table.name == "metrics" and is_metrics_partitioned(conn)):
+                        ddl = ddl.replace(" INDEX ", " INDEX CONCURRENTLY ", 1)
+                    conn.execute(text(ddl))
+            else:
+                index.create(bind=engine, checkfirst=True)
+            created.append(index.name)
+
+    if engine.dialect.name == "sqlite":
+        # Refresh planner statistics so SQLite picks the new indexes
+        with engine.begin() as conn:
+            conn.execute(text("ANALYZE"))
+
+    return created
+
+
+if __name__ == "__main__":
+    print("\n🗂️  Creating missing indexes\n")
+    try:
+        created = create_missing_indexes()
+        if created:
+            print(f"\n✓ Created {len(created)} index(es)")
+        else:
+            print("✓ All declared indexes already exist")
+    except Exception as e:
+        print(f"\n❌ Error: {str(e)}")
+        sys.exit(1)
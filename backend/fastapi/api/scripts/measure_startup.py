@@ -0,0 +1,141 @@
+"""
+Script to measure how long the API takes to import and boot, and where the time goes.
+
+Every measurement runs in a fresh interpreter, like a new worker after a deploy:
+- import: `import main`, plus the modules main pulls in that cost the most (python -X importtime)
+- boot: import, then the app's startup (lifespan) until it is ready to serve,
+  then the first and a warm prediction
+- model load: load_version() of the current model, with and without memory-mapping
+
+The boot step runs the real startup, so it uses the configured database like the server does.
+
+Usage: python scripts/measure_startup.py [--runs 3] [--top 10]
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# Add parent directory to path to import the app modules
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(API_DIR)
+
+
+def _child_import():
+    started = time.perf_counter()
+    import main  # noqa: F401
+    return {"import_seconds": time.perf_counter() - started}
+
+
+def _child_boot():
+    started = time.perf_counter()
+    import main
+    from ai_model.model import predict_batch
+    imported = time.perf_counter()
+
+    async def boot():
+        async with main.app.router.lifespan_context(main.app):
+            ready = time.perf_counter()
+            predict_batch([75.0], [10.0])
+            first = time.perf_counter()
+            predict_batch([76.0], [12.0])
+            return ready, first, time.perf_counter() - first
+
+    ready, first, warm = asyncio.run(boot())
+    return {
+        "import_seconds": imported - started,
+        "startup_seconds": ready - imported,
+        "boot_seconds": ready - started,
+        "first_prediction_ms": (first - ready) * 1000,
+        "warm_prediction_ms": warm * 1000
+    }
+
+
+def _child_load():
+    from ai_model.model import current_version, load_version
+
+    started = time.perf_counter()
+    loaded = load_version(current_version())
+    cold = time.perf_counter() - started
+    started = time.perf_counter()
+    load_version(current_version())
+    return {"version": loaded.version, "cold_seconds": cold, "warm_seconds": time.perf_counter() - started}
+
+
+CHILDREN = {"import": _child_import, "boot": _child_boot, "load": _child_load}
+
+
+def run_child(step: str, env=None) -> dict:
+    """Run one measurement in a fresh interpreter and return its result."""
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", step],
+        cwd=API_DIR, env={**os.environ, **(env or {})}, capture_output=True, text=True, check=True
+    ).stdout
+    # Startup may print; the result is the last line
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def import_profile(top: int):
+    """Modules imported directly by main, by cumulative import time (microseconds)."""
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=API_DIR, capture_output=True, text=True, check=True
+    ).stderr
+
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        # main's own imports are indented one level deeper than main itself
+        if name.startswith("   ") and not name.startswith("    ") and cumulative.strip().isdigit():
+            modules.append((int(cumulative), name.strip()))
+    return sorted(modules, reverse=True)[:top]
+
+
+def summarize(results, key: str) -> str:
+    values = [result[key] for result in results]
+    return f"median {statistics.median(values):.3f}, min {min(values):.3f}, max {max(values):.3f}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure API import and boot time")
+    parser.add_argument("--runs", type=int, default=3, help="Fresh interpreters per measurement")
+    parser.add_argument("--top", type=int, default=10, help="Slowest imports to list")
+    parser.add_argument("--child", choices=sorted(CHILDREN), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(CHILDREN[args.child]()))
+        sys.exit(0)
+
+    print("\n⏱️  Measuring API startup\n")
+    try:
+        imports = [run_child("import") for _ in range(args.runs)]
+        print(f"  - import main (s): {summarize(imports, 'import_seconds')}")
+        for cumulative, name in import_profile(args.top):
+            print(f"      {cumulative / 1000:8.1f} ms  {name}")
+
+        boots = [run_child("boot") for _ in range(args.runs)]
+        print(f"  - startup until ready (s): {summarize(boots, 'startup_seconds')}")
+        print(f"  - import + startup (s): {summarize(boots, 'boot_seconds')}")
+        print(f"  - first prediction (ms): {summarize(boots, 'first_prediction_ms')}")
+        print(f"  - warm prediction (ms): {summarize(boots, 'warm_prediction_ms')}")
+
+        for mmap_mode in ("", "r"):
+            loads = [run_child("load", {"MODEL_MMAP_MODE": mmap_mode}) for _ in range(args.runs)]
+            label = f"mmap_mode={mmap_mode}" if mmap_mode else "no mmap"
+            print(f"  - model {loads[0]['version']} load, {label} (s): cold {summarize(loads, 'cold_seconds')}; "
+                  f"already imported {summarize(loads, 'warm_seconds')}")
+
+        print("\n✓ Done")
+    except subprocess.CalledProcessError as e:
+        print(f"\n❌ Error: measurement failed\n{e.stderr}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"\n❌ Error: {str(e)}")
+        sys.exit(1)
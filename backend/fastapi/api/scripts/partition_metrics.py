@@ -0,0 +1,170 @@
+"""
+Script to convert the metrics table into a time-series layout.
+
+PostgreSQL: the existing table is renamed to metrics_legacy and replaced by a
+table range-partitioned by month on `timestamp`, with a (user_id, timestamp)
+index on every partition. Rows are then copied over in id-ordered chunks, each
+committed on its own, so the app can keep writing to the new table while the
+copy runs and an interrupted run can be resumed by running the script again.
+
+SQLite has no table partitioning. There the equivalent layout is the
+(user_id, timestamp) index, which keeps each user's readings contiguous in
+time order; the script creates it if missing and refreshes planner statistics.
+
+Usage: python scripts/partition_metrics.py [--chunk-size 50000] [--drop-legacy]
+"""
+import argparse
+import os
+import sys
+from datetime import datetime
+
+# Add parent directory to path to import database modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import inspect, text
+from database import engine
+from models_db import Metrics
+from utils.timeseries import (
+    METRICS_PARTITION_MONTHS_AHEAD, add_months, create_month_partition,
+    is_metrics_partitioned, month_start
+)
+
+COLUMNS = [column.name for column in Metrics.__table__.columns]
+
+
+def _quoted(names):
+    return ", ".join(f'"{name}"' for name in names)
+
+
+def convert_to_partitioned(conn):
+    """Swap in an empty partitioned `metrics` table. The old table becomes metrics_legacy."""
+    sequence = conn.execute(text("SELECT pg_get_serial_sequence('metrics', 'id')")).scalar()
+
+    # Free the names the new table will use
+    conn.execute(text("ALTER TABLE metrics RENAME TO metrics_legacy"))
+    for name in ("metrics_pkey", "ix_metrics_id", "ix_metrics_user_id_timestamp"):
+        conn.execute(text(f"ALTER INDEX IF EXISTS {name} RENAME TO {name.replace('metrics', 'metrics_legacy', 1)}"))
+
+    # Same columns and id sequence; the partition key must be part of the primary key
+    conn.execute(text(
+        "CREATE TABLE metrics (LIKE metrics_legacy INCLUDING DEFAULTS) PARTITION BY RANGE (\"timestamp\")"
+    ))
+    conn.execute(text("ALTER TABLE metrics ALTER COLUMN \"timestamp\" SET NOT NULL"))
+    conn.execute(text("ALTER TABLE metrics ADD CONSTRAINT metrics_pkey PRIMARY KEY (id, \"timestamp\")"))
+    conn.execute(text(
+        "ALTER TABLE metrics ADD CONSTRAINT metrics_user_id_fkey FOREIGN KEY (user_id) REFERENCES users (id)"
+    ))
+    conn.execute(text("CREATE INDEX ix_metrics_user_id_timestamp ON metrics (user_id, \"timestamp\")"))
+    conn.execute(text("CREATE TABLE metrics_default PARTITION OF metrics DEFAULT"))
+
+    if sequence:
+        # Keep the sequence alive when metrics_legacy is dropped
+        conn.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY metrics.id"))
+
+
+def create_partitions_for_legacy(conn, months_ahead: int):
+    """Create monthly partitions from the oldest legacy row up to `months_ahead` months from now."""
+    oldest = conn.execute(text("SELECT MIN(\"timestamp\") FROM metrics_legacy")).scalar()
+    month = month_start(oldest or datetime.now())
+    last = add_months(month_start(datetime.now()), months_ahead)
+
+    count = 0
+    while month <= last:
+        create_month_partition(conn, month)
+        month = add_months(month, 1)
+        count += 1
+    return count
+
+
+def copy_legacy_rows(chunk_size: int):
+    """Copy metrics_legacy into the partitioned table in id order. Safe to resume."""
+    with engine.begin() as conn:
+        legacy_max = conn.execute(text("SELECT COALESCE(MAX(id), 0) FROM metrics_legacy")).scalar()
+        # Rows written by the app after the swap have ids above legacy_max
+        after = conn.execute(
+            text("SELECT COALESCE(MAX(id), 0) FROM metrics WHERE id <= :legacy_max"),
+            {"legacy_max": legacy_max}
+        ).scalar()
+
+    select_columns = ", ".join(
+        "COALESCE(\"timestamp\", NOW())" if name == "timestamp" else f'"{name}"' for name in COLUMNS
+    )
+    copied = 0
+
+    while after < legacy_max:
+        with engine.begin() as conn:
+            last_id, count = conn.execute(text(
+                f"WITH chunk AS ("
+                f" INSERT INTO metrics ({_quoted(COLUMNS)})"
+                f" SELECT {select_columns} FROM metrics_legacy"
+                f" WHERE id > :after ORDER BY id LIMIT :chunk_size"
+                f" RETURNING id)"
+                f" SELECT MAX(id), COUNT(*) FROM chunk"
+            ), {"after": after, "chunk_size": chunk_size}).one()
+
+        if last_id is None:
+            break
+        copied += count
+        after = last_id
+        print(f"  - Copied up to id {after} / {legacy_max}")
+
+    return copied
+
+
+def partition_postgres(chunk_size: int, drop_legacy: bool, months_ahead: int):
+    tables = set(inspect(engine).get_table_names())
+
+    with engine.begin() as conn:
+        if not is_metrics_partitioned(conn):
+            if "metrics_legacy" in tables:
+                raise RuntimeError("metrics_legacy already exists but metrics is not partitioned; resolve manually")
+            print("  - Creating partitioned metrics table...")
+            convert_to_partitioned(conn)
+        elif "metrics_legacy" not in inspect(conn).get_table_names():
+            print("✓ metrics is already partitioned and no legacy table is left")
+            return
+
+        count = create_partitions_for_legacy(conn, months_ahead)
+        print(f"  - {count} monthly partition(s) in place")
+
+    copied = copy_legacy_rows(chunk_size)
+    print(f"✓ Copied {copied} row(s) from metrics_legacy")
+
+    with engine.begin() as conn:
+        conn.execute(text("ANALYZE metrics"))
+        if drop_legacy:
+            conn.execute(text("DROP TABLE metrics_legacy"))
+            print("✓ Dropped metrics_legacy")
+        else:
+            print("  - metrics_legacy kept; rerun with --drop-legacy once you have verified the copy")
+
+
+def index_sqlite():
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_metrics_user_id_timestamp ON metrics (user_id, \"timestamp\")"
+        ))
+        conn.execute(text("ANALYZE metrics"))
+    print("✓ SQLite has no table partitioning; the (user_id, timestamp) index is in place")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert the metrics table into a time-series layout")
+    parser.add_argument("--chunk-size", type=int, default=50000, help="Rows copied per transaction")
+    parser.add_argument("--drop-legacy", action="store_true", help="Drop metrics_legacy after copying")
+    parser.add_argument("--months-ahead", type=int, default=METRICS_PARTITION_MONTHS_AHEAD,
+                        help="Monthly partitions to create ahead of the current month")
+    args = parser.parse_args()
+
+    print("\n🗂️  Metrics time-series migration\n")
+    try:
+        if engine.dialect.name == "postgresql":
+            partition_postgres(args.chunk_size, args.drop_legacy, args.months_ahead)
+        elif engine.dialect.name == "sqlite":
+            index_sqlite()
+        else:
+            print(f"❌ Unsupported database: {engine.dialect.name}")
+            sys.exit(1)
+    except Exception as e:
+        print(f"\n❌ Error: {str(e)}")
+        sys.exit(1)
@@ -0,0 +1,151 @@
+"""
+Alert generation with in-memory deduplication.
+
+Which readings raise alerts is decided by the compiled rules of
+services/alert_rules.py: the built-in defaults, or the JSON file at
+ALERT_RULES_PATH (re-read by load_rules(), see POST /system/alert-rules/reload).
+The engine keeps each user's sliding windows for the windowed rules.
+
+Each (user, alert_type) pair may raise at most one alert per
+ALERT_COOLDOWN_MINUTES. Instead of querying the alerts table for a recent
+duplicate on every frame, the engine remembers when each pair last alerted.
+The state is rehydrated from the database at startup, so a restart does not
+re-raise alerts that are still cooling down.
+
+Only genuinely new alerts are written, added to the caller's transaction in
+one batch. The cooldown state is per process; with several workers each one
+keeps its own.
+"""
+import logging
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import func
+
+from database import SessionLocal
+from models_db import Alert
+from services.alert_rules import AlertRules, DEFAULT_ALERT_RULES
+
+logger = logging.getLogger(__name__)
+
+ALERT_COOLDOWN_MINUTES = float(os.getenv("ALERT_COOLDOWN_MINUTES", "5"))
+ALERT_RULES_PATH = os.getenv("ALERT_RULES_PATH", "")
+# Readings older than this come from a device that went offline; they raise no alerts
+ALERT_MAX_READING_AGE_SECONDS = 5
+
+
+class AlertEngine:
+    """Cooldown state per (user_id, alert_type) and batched alert creation."""
+
+    def __init__(self, cooldown_minutes: float = ALERT_COOLDOWN_MINUTES):
+        self.cooldown = timedelta(minutes=cooldown_minutes)
+        self._last_alert = {}
+        self._lock = threading.Lock()
+        self.rules = AlertRules(DEFAULT_ALERT_RULES)
+        # user_id -> {(field, seconds): SlidingWindow}
+        self._windows = {}
+
+    def load_rules(self, path: str = ALERT_RULES_PATH) -> dict:
+        """
+        Compile the rules at `path` (the defaults without one) and swap them in.
+        Raises ValueError and keeps the current rules if the file is invalid.
+        Window state is reset, since the windows the rules need may have changed.
+        """
+        rules = AlertRules.from_file(path) if path else AlertRules(DEFAULT_ALERT_RULES)
+        with self._lock:
+            self.rules = rules
+            self._windows = {}
+        logger.info(f"Alert rules loaded from {rules.source}")
+        return rules.summary()
+
+    def rehydrate(self):
+        """Load the alerts still cooling down. Called once at startup."""
+        since = datetime.now(timezone.utc) - self.cooldown
+        db = SessionLocal()
+        try:
+            rows = db.query(Alert.user_id, Alert.alert_type, func.max(Alert.created_at)).filter(
+                Alert.created_at >= since
+            ).group_by(Alert.user_id, Alert.alert_type).all()
+        finally:
+            db.close()
+
+        with self._lock:
+            for user_id, alert_type, created_at in rows:
+                if created_at.tzinfo is None:
+                    created_at = created_at.replace(tzinfo=timezone.utc)
+                self._last_alert[(user_id, alert_type)] = created_at
+        logger.info(f"Alert engine rehydrated {len(rows)} cooldowns")
+
+    def evaluate(self, db, readings):
+        """
+        Add the new alerts for a batch of readings to `db` (flushed, not committed).
+        `readings` are dicts with user_id, heart_rate, motion_intensity, prediction,
+        anomaly_score, confidence_anomaly and optionally timestamp.
+        Returns the created alerts and an undo token for restore() if the
+        transaction is rolled back.
+        """
+        now = datetime.now(timezone.utc)
+        created = []
+        undo = {}
+
+        with self._lock:
+            for reading in readings:
+                timestamp = reading.get("timestamp")
+                # Check if data is stale - don't generate alerts for offline devices
+                if timestamp and (now - timestamp).total_seconds() > ALERT_MAX_READING_AGE_SECONDS:
+                    continue
+
+                user_id = reading["user_id"]
+                ruleset = self.rules.for_user(user_id)
+                windows = self._windows.setdefault(user_id, {}) if ruleset.windows else None
+                t = timestamp.timestamp() if timestamp else now.timestamp()
+                candidates = ruleset.evaluate(reading, t, windows)
+                for alert_data in candidates:
+                    key = (user_id, alert_data["alert_type"])
+                    last = self._last_alert.get(key)
+                    if last is not None and now - last < self.cooldown:
+                        continue
+
+                    undo.setdefault(key, last)
+                    self._last_alert[key] = now
+                    created.append(Alert(
+                        user_id=user_id,
+                        alert_type=alert_data["alert_type"],
+                        severity=alert_data["severity"],
+                        title=alert_data["title"],
+                        message=alert_data["message"],
+                        heart_rate=alert_data.get("heart_rate", reading["heart_rate"]),
+                        motion_intensity=alert_data.get("motion_intensity", reading["motion_intensity"]),
+                        stress_level=alert_data.get("stress_level", reading["confidence_anomaly"]),
+                        anomaly_score=alert_data.get("anomaly_score", reading["anomaly_score"]),
+                        created_at=now
+                    ))
+
+        if created:
+            db.add_all(created)
+            db.flush()
+        return created, undo
+
+    def restore(self, undo):
+        """Roll the cooldown state back after the alerts of evaluate() were not committed."""
+        with self._lock:
+            for key, last in undo.items():
+                if last is None:
+                    self._last_alert.pop(key, None)
+                else:
+                    self._last_alert[key] = last
+
+    def stats(self) -> dict:
+        now = datetime.now(timezone.utc)
+        with self._lock:
+            cooling = sum(1 for last in self._last_alert.values() if now - last < self.cooldown)
+        return {
+            "tracked": len(self._last_alert),
+            "cooling_down": cooling,
+            "windowed_users": len(self._windows),
+            "rules": self.rules.summary(),
+        }
+
+
+alert_engine = AlertEngine()
@@ -0,0 +1,310 @@
+"""
+Declarative alert rules, compiled once into evaluators.
+
+The rules are plain data: DEFAULT_ALERT_RULES below (the original hard-coded
+thresholds), or the JSON file at ALERT_RULES_PATH. A rule compares one field of
+the current reading, or an aggregate of that field over a per-user sliding
+window, against severity thresholds:
+
+    {
+        "alert_type": "SUSTAINED_HIGH_HEART_RATE",
+        "title": "Sustained High Heart Rate",
+        "message": "...",
+        "field": "heart_rate",      # heart_rate, motion_intensity, anomaly_score,
+                                    # confidence_anomaly, anomaly (1 if ANOMALY else 0)
+        "aggregate": "mean",        # last (default), mean, min, max, sum, count
+        "window_seconds": 30,       # required unless aggregate is last
+        "min_samples": 25,          # readings the window must hold (default 1)
+        "op": ">",                  # >, >=, <, <=
+        "levels": {"CRITICAL": 130, "HIGH": 110},
+        "when": [{"field": "anomaly", "op": "==", "value": 1}],  # optional, on the current reading
+        "cohort": "athletes"        # optional
+    }
+
+"cohorts" maps a name to a list of user ids. A rule with a cohort applies to
+those users only and replaces the default rule with the same alert_type for
+them. Window aggregates are kept incrementally (running sum and count,
+monotonic deques for min/max), so every reading costs O(1) amortised per window.
+"""
+import json
+import operator
+from collections import deque
+
+ALERT_FIELDS = ("heart_rate", "motion_intensity", "anomaly_score", "confidence_anomaly", "anomaly")
+AGGREGATES = ("last", "mean", "min", "max", "sum", "count")
+SEVERITIES = ("CRITICAL", "HIGH", "MEDIUM", "LOW")
+
+_OPS = {">": operator.gt, ">=": operator.ge, "<": operator.lt, "<=": operator.le,
+        "==": operator.eq, "!=": operator.ne}
+_THRESHOLD_OPS = (">", ">=", "<", "<=")
+
+# Alert column that records the value a rule fired on
+_ALERT_COLUMNS = {
+    "heart_rate": "heart_rate",
+    "motion_intensity": "motion_intensity",
+    "confidence_anomaly": "stress_level",
+    "anomaly_score": "anomaly_score",
+}
+
+DEFAULT_ALERT_RULES = {
+    "cohorts": {},
+    "rules": [
+        # AI Anomaly Detection Alert (covers stress and fatigue detection)
+        {
+            "alert_type": "AI_ANOMALY",
+            "title": "Abnormal Pattern Detected",
+            "message": "AI detected abnormal health pattern. Early signs of stress or fatigue may be present.",
+            "when": [{"field": "anomaly", "op": "==", "value": 1}],
+            "field": "confidence_anomaly",
+            "op": ">=",
+            "levels": {"CRITICAL": 80, "HIGH": 60}
+        },
+        {
+            "alert_type": "HIGH_HEART_RATE",
+            "title": "Elevated Heart Rate",
+            "message": "Your heart rate is elevated. Monitor your condition and rest if necessary.",
+            "field": "heart_rate",
+            "op": ">",
+            "levels": {"CRITICAL": 120, "HIGH": 100}
+        },
+        {
+            "alert_type": "HIGH_ACTIVITY",
+            "title": "High Activity Detected",
+            "message": "Your activity level is very high. Take breaks to avoid overexertion.",
+            "field": "motion_intensity",
+            "op": ">",
+            "levels": {"HIGH": 80}
+        }
+    ]
+}
+
+
+def reading_value(reading: dict, field: str) -> float:
+    if field == "anomaly":
+        return 1.0 if reading["prediction"] == "ANOMALY" else 0.0
+    return reading[field]
+
+
+class SlidingWindow:
+    """Readings of one field over the last `seconds`, with O(1) aggregates."""
+
+    __slots__ = ("seconds", "samples", "total", "_min", "_max", "_last_t")
+
+    def __init__(self, seconds: float, track_min: bool, track_max: bool):
+        self.seconds = seconds
+        self.samples = deque()
+        self.total = 0.0
+        self._min = deque() if track_min else None
+        self._max = deque() if track_max else None
+        self._last_t = float("-inf")
+
+    def push(self, t: float, value: float):
+        # Keep time monotonic so the deques stay ordered
+        t = max(t, self._last_t)
+        self._last_t = t
+
+        self.samples.append((t, value))
+        self.total += value
+        if self._min is not None:
+            while self._min and self._min[-1][1] >= value:
+                self._min.pop()
+            self._min.append((t, value))
+        if self._max is not None:
+            while self._max and self._max[-1][1] <= value:
+                self._max.pop()
+            self._max.append((t, value))
+
+        cutoff = t - self.seconds
+        while self.samples[0][0] <= cutoff:
+            self.total -= self.samples.popleft()[1]
+        if self._min is not None:
+            while self._min[0][0] <= cutoff:
+                self._min.popleft()
+        if self._max is not None:
+            while self._max[0][0] <= cutoff:
+                self._max.popleft()
+
+    def value(self, aggregate: str) -> float:
+        if aggregate == "mean":
+            return self.total / len(self.samples)
+        if aggregate == "sum":
+            return self.total
+        if aggregate == "count":
+            return float(len(self.samples))
+        if aggregate == "min":
+            return self._min[0][1]
+        return self._max[0][1]
+
+
+class CompiledRule:
+    __slots__ = ("alert_type", "title", "message", "field", "aggregate", "window",
+                 "min_samples", "compare", "levels", "when", "column")
+
+    def __init__(self, rule: dict):
+        self.alert_type = rule["alert_type"]
+        self.title = rule.get("title", self.alert_type.replace("_", " ").title())
+        self.message = rule.get("message", "")
+        self.field = rule["field"]
+        self.aggregate = rule.get("aggregate", "last")
+        seconds = rule.get("window_seconds")
+        self.window = (self.field, float(seconds)) if self.aggregate != "last" else None
+        self.min_samples = int(rule.get("min_samples", 1))
+        self.compare = _OPS[rule["op"]]
+        # Most severe level first: highest threshold for > / >=, lowest for < / <=
+        self.levels = tuple(sorted(
+            ((float(threshold), severity) for severity, threshold in rule["levels"].items()),
+            reverse=rule["op"] in (">", ">=")
+        ))
+        self.when = tuple((c["field"], _OPS[c["op"]], c["value"]) for c in rule.get("when", ()))
+        self.column = _ALERT_COLUMNS.get(self.field)
+
+    def evaluate(self, reading: dict, windows: dict):
+        """The alert data for this reading, or None."""
+        for field, compare, expected in self.when:
+            if not compare(reading_value(reading, field), expected):
+                return None
+
+        if self.window is None:
+            value = reading_value(reading, self.field)
+        else:
+            window = windows[self.window]
+            if len(window.samples) < self.min_samples:
+                return None
+            value = window.value(self.aggregate)
+
+        for threshold, severity in self.levels:
+            if self.compare(value, threshold):
+                alert_data = {
+                    "alert_type": self.alert_type,
+                    "severity": severity,
+                    "title": self.title,
+                    "message": self.message,
+                }
+                if self.column:
+                    alert_data[self.column] = value
+                return alert_data
+        return None
+
+
+class RuleSet:
+    """The rules that apply to one group of users and the windows they need."""
+
+    def __init__(self, rules):
+        self.rules = tuple(rules)
+        # (field, seconds) -> (track_min, track_max)
+        self.windows = {}
+        for rule in self.rules:
+            if rule.window is not None:
+                track_min, track_max = self.windows.get(rule.window, (False, False))
+                self.windows[rule.window] = (track_min or rule.aggregate == "min",
+                                             track_max or rule.aggregate == "max")
+
+    def evaluate(self, reading: dict, t: float, windows: dict):
+        """
+        Push the reading into the user's windows (created on first use) and
+        return the alert data of every rule that fires.
+        """
+        for key, (track_min, track_max) in self.windows.items():
+            window = windows.get(key)
+            if window is None:
+                window = windows[key] = SlidingWindow(key[1], track_min, track_max)
+            window.push(t, reading_value(reading, key[0]))
+
+        candidates = []
+        for rule in self.rules:
+            alert_data = rule.evaluate(reading, windows)
+            if alert_data is not None:
+                candidates.append(alert_data)
+        return candidates
+
+
+def _validate_rule(rule, cohorts):
+    if not isinstance(rule, dict):
+        raise ValueError("Each rule must be an object")
+    name = rule.get("alert_type")
+    if not name or not isinstance(name, str):
+        raise ValueError("Each rule needs an alert_type")
+    if rule.get("field") not in ALERT_FIELDS:
+        raise ValueError(f"{name}: field must be one of {', '.join(ALERT_FIELDS)}")
+    aggregate = rule.get("aggregate", "last")
+    if aggregate not in AGGREGATES:
+        raise ValueError(f"{name}: aggregate must be one of {', '.join(AGGREGATES)}")
+    if aggregate != "last":
+        seconds = rule.get("window_seconds")
+        if not isinstance(seconds, (int, float)) or seconds <= 0:
+            raise ValueError(f"{name}: aggregate '{aggregate}' needs window_seconds > 0")
+    min_samples = rule.get("min_samples", 1)
+    if not isinstance(min_samples, int) or min_samples < 1:
+        raise ValueError(f"{name}: min_samples must be a positive integer")
+    if rule.get("op") not in _THRESHOLD_OPS:
+        raise ValueError(f"{name}: op must be one of {', '.join(_THRESHOLD_OPS)}")
+    levels = rule.get("levels")
+    if not isinstance(levels, dict) or not levels:
+        raise ValueError(f"{name}: levels must map severities to thresholds")
+    for severity, threshold in levels.items():
+        if severity not in SEVERITIES:
+            raise ValueError(f"{name}: unknown severity '{severity}'")
+        if not isinstance(threshold, (int, float)):
+            raise ValueError(f"{name}: threshold for {severity} must be a number")
+    when = rule.get("when", [])
+    if not isinstance(when, list):
+        raise ValueError(f"{name}: 'when' must be a list of conditions")
+    for condition in when:
+        if not isinstance(condition, dict) or condition.get("field") not in ALERT_FIELDS or condition.get("op") not in _OPS or "value" not in condition:
+            raise ValueError(f"{name}: 'when' conditions need a field, an op and a value")
+    cohort = rule.get("cohort")
+    if cohort is not None and cohort not in cohorts:
+        raise ValueError(f"{name}: unknown cohort '{cohort}'")
+
+
+class AlertRules:
+    """A compiled rule configuration."""
+
+    def __init__(self, config: dict, source: str = "defaults"):
+        if not isinstance(config, dict) or not isinstance(config.get("rules"), list):
+            raise ValueError("Alert rules config needs a 'rules' list")
+        cohorts = config.get("cohorts") or {}
+        if not isinstance(cohorts, dict) or not all(
+            isinstance(ids, list) and all(isinstance(i, int) for i in ids) for ids in cohorts.values()
+        ):
+            raise ValueError("'cohorts' must map names to lists of user ids")
+
+        default_rules = {}
+        cohort_rules = {name: {} for name in cohorts}
+        for rule in config["rules"]:
+            _validate_rule(rule, cohorts)
+            target = cohort_rules[rule["cohort"]] if rule.get("cohort") else default_rules
+            if rule["alert_type"] in target:
+                raise ValueError(f"Duplicate rule {rule['alert_type']} for the same users")
+            target[rule["alert_type"]] = CompiledRule(rule)
+
+        self.config = config
+        self.source = source
+        self.default = RuleSet(default_rules.values())
+        # Cohort rules override the default rule of the same alert_type
+        self._by_user = {}
+        for name, user_ids in cohorts.items():
+            ruleset = RuleSet({**default_rules, **cohort_rules[name]}.values())
+            for user_id in user_ids:
+                if user_id in self._by_user:
+                    raise ValueError(f"User {user_id} is in more than one cohort")
+                self._by_user[user_id] = ruleset
+
+    @classmethod
+    def from_file(cls, path: str) -> "AlertRules":
+        try:
+            with open(path) as f:
+                config = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            raise ValueError(f"Cannot read alert rules from {path}: {e}")
+        return cls(config, source=path)
+
+    def for_user(self, user_id: int) -> RuleSet:
+        return self._by_user.get(user_id, self.default)
+
+    def summary(self) -> dict:
+        return {
+            "source": self.source,
+            "rules": len(self.config["rules"]),
+            "cohorts": {name: len(ids) for name, ids in (self.config.get("cohorts") or {}).items()},
+        }
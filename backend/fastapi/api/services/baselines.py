@@ -0,0 +1,400 @@
+"""
+Per-user baselines of heart rate and motion intensity.
+
+Every scored reading is folded into its user's baseline in O(1) time and
+constant memory: Welford's algorithm for the running mean and variance, and
+P² estimators (Jain & Chlamtac) for the 5th, 50th and 95th percentiles. Once a
+user has BASELINE_MIN_SAMPLES readings, the model scores their readings
+relative to their own median and spread instead of the population's (see
+ai_model.model.predict_batch). A student whose resting heart rate is unusually
+low or high is then no longer flagged on every reading.
+
+Baselines are loaded at startup and written back every BASELINE_FLUSH_SECONDS
+and on shutdown. With several uvicorn workers each one updates its own copy
+and the last write wins, which is fine for statistics this slow to move.
+"""
+import asyncio
+import json
+import logging
+import math
+import os
+import threading
+from bisect import insort
+from datetime import datetime, timezone
+
+import numpy as np
+
+from database import SessionLocal
+from models_db import User, UserBaseline
+from services.executors import db_executor
+
+logger = logging.getLogger(__name__)
+
+BASELINE_MIN_SAMPLES = int(os.getenv("BASELINE_MIN_SAMPLES", "600"))
+BASELINE_FLUSH_SECONDS = float(os.getenv("BASELINE_FLUSH_SECONDS", "60"))
+# Score readings against the user's baseline once it is ready (false = only collect)
+BASELINE_NORMALIZATION = os.getenv("BASELINE_NORMALIZATION", "true").lower() == "true"
+
+BASELINE_FIELDS = ("heart_rate", "motion_intensity")
+BASELINE_QUANTILES = (0.05, 0.5, 0.95)
+# Floor for the spread used to normalize, so a very steady signal is not blown up
+_MIN_SCALE = {"heart_rate": 3.0, "motion_intensity": 5.0}
+# Readings outside these ranges (no finger on the sensor, bad frames) are not learned
+_VALID_RANGE = {"heart_rate": (20, 255), "motion_intensity": (0, 100)}
+
+
+class RunningStats:
+    """Welford's online mean and variance."""
+
+    __slots__ = ("count", "mean", "m2")
+
+    def __init__(self, count: int = 0, mean: float = 0.0, m2: float = 0.0):
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+
+    def add(self, x: float):
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (x - self.mean)
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else 0.0
+
+
+class P2Quantile:
+    """P² estimate of one quantile: five markers, adjusted on every observation."""
+
+    __slots__ = ("p", "heights", "positions", "desired", "increments")
+
+    def __init__(self, p: float):
+        self.p = p
+        self.heights = []
+        self.positions = [0, 1, 2, 3, 4]
+        self.desired = [0.0, 2 * p, 4 * p, 2 + 2 * p, 4.0]
+        self.increments = [0.0, p / 2, p, (1 + p) / 2, 1.0]
+
+    def add(self, x: float):
+        q = self.heights
+        if len(q) < 5:
+            insort(q, x)
+            return
+
+        n = self.positions
+        if x < q[0]:
+            q[0] = x
+            k = 0
+        elif x >= q[4]:
+            q[4] = x
+            k = 3
+        else:
+            k = 0
+            while x >= q[k + 1]:
+                k += 1
+
+        for i in range(k + 1, 5):
+            n[i] += 1
+        for i in range(5):
+            self.desired[i] += self.increments[i]
+
+        # Move the middle markers towards their desired positions
+        for i in (1, 2, 3):
+            d = self.desired[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+                d = 1 if d > 0 else -1
+                height = self._parabolic(i, d)
+                if not q[i - 1] < height < q[i + 1]:
+                    height = q[i] + d * (q[i + d] - q[i]) / (n[i + d] - n[i])
+                q[i] = height
+                n[i] += d
+
+    def _parabolic(self, i: int, d: int) -> float:
+        q, n = self.heights, self.positions
+        return q[i] + d / (n[i + 1] - n[i - 1]) * (
+            (n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i])
+            + (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1])
+        )
+
+    def value(self) -> float | None:
+        q = self.heights
+        if not q:
+            return None
+        if len(q) < 5:
+            return q[int(round((len(q) - 1) * self.p))]
+        return q[2]
+
+    def to_state(self) -> dict:
+        return {"heights": self.heights, "positions": self.positions, "desired": self.desired}
+
+    @classmethod
+    def from_state(cls, p: float, state: dict) -> "P2Quantile":
+        estimator = cls(p)
+        estimator.heights = list(state["heights"])
+        estimator.positions = list(state["positions"])
+        estimator.desired = list(state["desired"])
+        return estimator
+
+
+class FieldBaseline:
+    """Running statistics of one field of one user."""
+
+    __slots__ = ("stats", "quantiles")
+
+    def __init__(self):
+        self.stats = RunningStats()
+        self.quantiles = [P2Quantile(p) for p in BASELINE_QUANTILES]
+
+    def add(self, x: float):
+        self.stats.add(x)
+        for estimator in self.quantiles:
+            estimator.add(x)
+
+    def median(self) -> float | None:
+        return self.quantiles[BASELINE_QUANTILES.index(0.5)].value()
+
+    def summary(self) -> dict:
+        summary = {"mean": round(self.stats.mean, 2), "std": round(self.stats.std, 2)}
+        for p, estimator in zip(BASELINE_QUANTILES, self.quantiles):
+            value = estimator.value()
+            summary[f"p{int(p * 100):02d}"] = round(value, 2) if value is not None else None
+        return summary
+
+    def to_state(self) -> dict:
+        return {
+            "count": self.stats.count,
+            "mean": self.stats.mean,
+            "m2": self.stats.m2,
+            "quantiles": {str(p): e.to_state() for p, e in zip(BASELINE_QUANTILES, self.quantiles)},
+        }
+
+    @classmethod
+    def from_state(cls, state: dict) -> "FieldBaseline":
+        baseline = cls()
+        baseline.stats = RunningStats(state["count"], state["mean"], state["m2"])
+        quantiles = state.get("quantiles", {})
+        baseline.quantiles = [
+            P2Quantile.from_state(p, quantiles[str(p)]) if str(p) in quantiles else P2Quantile(p)
+            for p in BASELINE_QUANTILES
+        ]
+        return baseline
+
+
+class Baseline:
+    """Baseline of one user: one FieldBaseline per field."""
+
+    __slots__ = ("fields", "updated_at")
+
+    def __init__(self):
+        self.fields = {field: FieldBaseline() for field in BASELINE_FIELDS}
+        self.updated_at = None
+
+    @property
+    def sample_count(self) -> int:
+        return self.fields["heart_rate"].stats.count
+
+    @property
+    def ready(self) -> bool:
+        return self.sample_count >= BASELINE_MIN_SAMPLES
+
+    def center_and_scale(self, field: str):
+        """Median and (floored) standard deviation the model normalizes with."""
+        baseline = self.fields[field]
+        return baseline.median(), max(baseline.stats.std, _MIN_SCALE[field])
+
+    def to_dict(self, user_id: int) -> dict:
+        return {
+            "user_id": user_id,
+            "sample_count": self.sample_count,
+            "ready": self.ready,
+            "min_samples": BASELINE_MIN_SAMPLES,
+            **{field: self.fields[field].summary() for field in BASELINE_FIELDS},
+            "updated_at": self.updated_at.isoformat() if self.updated_at else None,
+        }
+
+    def to_state(self) -> str:
+        return json.dumps({field: self.fields[field].to_state() for field in BASELINE_FIELDS})
+
+    @classmethod
+    def from_state(cls, state: str) -> "Baseline":
+        baseline = cls()
+        data = json.loads(state)
+        for field in BASELINE_FIELDS:
+            if field in data:
+                baseline.fields[field] = FieldBaseline.from_state(data[field])
+        return baseline
+
+
+class BaselineStore:
+    """Baselines keyed by user id, persisted to the user_baselines table."""
+
+    def __init__(self, flush_seconds: float = BASELINE_FLUSH_SECONDS):
+        self.flush_seconds = flush_seconds
+        self._baselines = {}
+        self._dirty = set()
+        self._lock = threading.Lock()
+        self._task = None
+        self._flushes = 0
+
+    def load_all(self):
+        """Load every stored baseline. Called once at startup."""
+        db = SessionLocal()
+        try:
+            rows = db.query(UserBaseline.user_id, UserBaseline.state, UserBaseline.updated_at).all()
+        finally:
+            db.close()
+
+        with self._lock:
+            for user_id, state, updated_at in rows:
+                try:
+                    baseline = Baseline.from_state(state)
+                except (ValueError, KeyError, TypeError):
+                    logger.warning(f"Ignoring unreadable baseline of user {user_id}")
+                    continue
+                baseline.updated_at = updated_at
+                self._baselines[user_id] = baseline
+        logger.info(f"Loaded {len(rows)} user baselines")
+
+    def update(self, user_ids, heart_rates, motion_intensities):
+        """Fold a batch of readings into the baselines of their users. Invalid readings are skipped."""
+        hr_low, hr_high = _VALID_RANGE["heart_rate"]
+        motion_low, motion_high = _VALID_RANGE["motion_intensity"]
+        now = datetime.now(timezone.utc)
+
+        with self._lock:
+            for user_id, heart_rate, motion_intensity in zip(user_ids, heart_rates, motion_intensities):
+                if not (hr_low <= heart_rate <= hr_high and motion_low <= motion_intensity <= motion_high):
+                    continue
+                baseline = self._baselines.get(user_id)
+                if baseline is None:
+                    baseline = self._baselines[user_id] = Baseline()
+                baseline.fields["heart_rate"].add(heart_rate)
+                baseline.fields["motion_intensity"].add(motion_intensity)
+                baseline.updated_at = now
+                self._dirty.add(user_id)
+
+    def normalization(self, user_ids):
+        """
+        Per-reading (center, scale) arrays for each field, NaN for users whose
+        baseline is not ready yet; None when no reading has a usable baseline.
+        This is the `baseline` argument of predict_batch.
+        """
+        if not BASELINE_NORMALIZATION:
+            return None
+
+        centers = {field: np.full(len(user_ids), np.nan) for field in BASELINE_FIELDS}
+        scales = {field: np.ones(len(user_ids)) for field in BASELINE_FIELDS}
+        found = False
+        with self._lock:
+            for i, user_id in enumerate(user_ids):
+                baseline = self._baselines.get(user_id)
+                if baseline is None or not baseline.ready:
+                    continue
+                found = True
+                for field in BASELINE_FIELDS:
+                    centers[field][i], scales[field][i] = baseline.center_and_scale(field)
+
+        if not found:
+            return None
+        return {field: (centers[field], scales[field]) for field in BASELINE_FIELDS}
+
+    def get(self, user_id: int) -> dict | None:
+        with self._lock:
+            baseline = self._baselines.get(user_id)
+            return baseline.to_dict(user_id) if baseline is not None else None
+
+    def reset(self, user_id: int):
+        """Forget a user's baseline; it is rebuilt from the next readings. The caller deletes the row."""
+        with self._lock:
+            self._baselines.pop(user_id, None)
+            self._dirty.discard(user_id)
+
+    def flush(self):
+        """Write the baselines changed since the last flush. Runs on the DB executor."""
+        with self._lock:
+            dirty = {user_id: self._baselines[user_id] for user_id in self._dirty if user_id in self._baselines}
+            rows = {user_id: (b.sample_count, b.fields["heart_rate"].summary(),
+                              b.fields["motion_intensity"].summary(), b.to_state(), b.updated_at)
+                    for user_id, b in dirty.items()}
+            self._dirty.clear()
+        if not rows:
+            return 0
+
+        db = SessionLocal()
+        try:
+            # Users deleted since their last reading have no row to write (and must not get one)
+            users = {user_id for (user_id,) in db.query(User.id).filter(User.id.in_(rows))}
+            deleted = rows.keys() - users
+            if deleted:
+                with self._lock:
+                    for user_id in deleted:
+                        self._baselines.pop(user_id, None)
+                        self._dirty.discard(user_id)
+                rows = {user_id: row for user_id, row in rows.items() if user_id in users}
+
+            existing = {b.user_id: b for b in db.query(UserBaseline).filter(UserBaseline.user_id.in_(rows))}
+            for user_id, (sample_count, heart_rate, motion, state, updated_at) in rows.items():
+                record = existing.get(user_id)
+                if record is None:
+                    record = UserBaseline(user_id=user_id)
+                    db.add(record)
+                record.sample_count = sample_count
+                record.heart_rate_mean = heart_rate["mean"]
+                record.heart_rate_std = heart_rate["std"]
+                record.heart_rate_p50 = heart_rate["p50"]
+                record.motion_intensity_mean = motion["mean"]
+                record.motion_intensity_std = motion["std"]
+                record.motion_intensity_p50 = motion["p50"]
+                record.state = state
+                record.updated_at = updated_at
+            db.commit()
+        except Exception:
+            db.rollback()
+            # Try again on the next flush
+            with self._lock:
+                self._dirty.update(rows)
+            raise
+        finally:
+            db.close()
+
+        self._flushes += 1
+        return len(rows)
+
+    async def start(self):
+        """Start writing baselines back every flush_seconds."""
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the periodic flush and write what is left."""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await db_executor.run(self.flush)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_seconds)
+            try:
+                await db_executor.run(self.flush)
+            except Exception as e:
+                logger.error(f"Error saving user baselines: {str(e)}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            baselines = list(self._baselines.values())
+            dirty = len(self._dirty)
+        return {
+            "users": len(baselines),
+            "ready": sum(1 for b in baselines if b.ready),
+            "pending_writes": dirty,
+            "flushes": self._flushes,
+            "normalization": BASELINE_NORMALIZATION,
+        }
+
+
+baseline_store = BaselineStore()
@@ -0,0 +1,133 @@
+"""
+Data access for the hot request paths: dashboard polling (latest readings,
+alerts) and the user lookup behind authentication.
+
+The handlers on these paths are async and await the functions here instead of
+occupying a thread of FastAPI's threadpool per request. Each statement is
+written once, as a SQLAlchemy select/update, and runs on one of two backends:
+- DB_ASYNC=true: the async engine (asyncpg / aiosqlite, database.py); no thread
+  is held while waiting for the database
+- otherwise: the synchronous engine on the bounded DB executor
+
+Objects returned are detached from their (closed) session, with their columns
+loaded; relationships are not available.
+"""
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import aliased
+
+from database import AsyncSessionLocal, SessionLocal
+from models_db import Alert, Device, Metrics, User
+from services.executors import db_executor
+
+
+def _sync_fetch(stmt, scalars: bool):
+    with SessionLocal() as session:
+        result = session.execute(stmt)
+        return result.scalars().all() if scalars else result.all()
+
+
+def _sync_write(stmt) -> int:
+    with SessionLocal() as session:
+        rowcount = session.execute(stmt).rowcount
+        session.commit()
+        return rowcount
+
+
+async def _fetch(stmt, scalars: bool = True) -> list:
+    if AsyncSessionLocal is None:
+        return await db_executor.run(_sync_fetch, stmt, scalars)
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(stmt)
+        return result.scalars().all() if scalars else result.all()
+
+
+async def _write(stmt) -> int:
+    """Execute an UPDATE/DELETE in its own transaction. Returns the number of rows matched."""
+    if AsyncSessionLocal is None:
+        return await db_executor.run(_sync_write, stmt)
+    async with AsyncSessionLocal() as session:
+        rowcount = (await session.execute(stmt)).rowcount
+        await session.commit()
+        return rowcount
+
+
+async def get_user(user_id: int) -> User | None:
+    users = await _fetch(select(User).where(User.id == user_id))
+    return users[0] if users else None
+
+
+async def latest_metrics(user_id: int, count: int) -> list:
+    """A user's `count` most recent readings, newest first (by id, which follows insertion order)."""
+    return await _fetch(
+        select(Metrics).where(Metrics.user_id == user_id).order_by(Metrics.id.desc()).limit(count)
+    )
+
+
+async def recent_alerts(user_id: int, limit: int = 50) -> list:
+    """A user's most recent alerts, newest first."""
+    return await _fetch(
+        select(Alert).where(Alert.user_id == user_id).order_by(Alert.created_at.desc()).limit(limit)
+    )
+
+
+async def alert_exists(alert_id: int, user_id: int) -> bool:
+    return bool(await _fetch(select(Alert.id).where(Alert.id == alert_id, Alert.user_id == user_id)))
+
+
+async def mark_alerts_read(user_id: int, read_at, alert_id: int | None = None) -> int:
+    """Mark a user's unread alerts (or just one of them) as read. Returns how many changed."""
+    stmt = update(Alert).where(Alert.user_id == user_id, Alert.is_read == False)  # noqa: E712
+    if alert_id is not None:
+        stmt = stmt.where(Alert.id == alert_id)
+    return await _write(stmt.values(is_read=True, read_at=read_at).execution_options(synchronize_session=False))
+
+
+async def fleet_snapshot(student_ids: list[int] | None, after_id: int | None, limit: int) -> list:
+    """
+    Per student, in one statement: the paired device, the unread alert count and
+    the newest reading. Rows of (id, full_name, student_id, avatar_url, device_id,
+    unread_alerts, Metrics or None), ordered by id; the given students, or all
+    students after `after_id`.
+
+    Each correlated subquery is an index lookup per student (devices.user_id,
+    alerts (user_id, is_read), metrics (user_id, timestamp)), so the cost grows
+    with the number of students, not with their history.
+    """
+    device_id = (
+        select(Device.device_id)
+        .where(Device.user_id == User.id, Device.paired == True)  # noqa: E712
+        .order_by(Device.paired_at.desc())
+        .limit(1)
+        .scalar_subquery()
+    )
+    unread_alerts = (
+        select(func.count(Alert.id))
+        .where(Alert.user_id == User.id, Alert.is_read == False)  # noqa: E712
+        .scalar_subquery()
+    )
+    # Own alias: `metrics` itself is joined in the outer query
+    newest = aliased(Metrics)
+    latest_id = (
+        select(newest.id)
+        .where(newest.user_id == User.id)
+        .order_by(newest.timestamp.desc())
+        .limit(1)
+        .correlate(User)
+        .scalar_subquery()
+    )
+
+    stmt = (
+        select(
+            User.id, User.full_name, User.student_id, User.avatar_url,
+            device_id.label("device_id"), unread_alerts.label("unread_alerts"), Metrics
+        )
+        .outerjoin(Metrics, Metrics.id == latest_id)
+        .where(User.role == "student")
+        .order_by(User.id)
+        .limit(limit)
+    )
+    if student_ids is not None:
+        stmt = stmt.where(User.id.in_(student_ids))
+    if after_id is not None:
+        stmt = stmt.where(User.id > after_id)
+    return await _fetch(stmt, scalars=False)
@@ -0,0 +1,144 @@
+"""
+In-process cache of device pairing state for the /ws/sensors hot path.
+
+The registry is loaded at startup and kept current by the device handlers
+(register, pair, unpair, delete). Sockets bind to their entry after the first
+frame, so a paired device no longer costs a database lookup per frame.
+
+Entries are re-read from the database once they are older than
+DEVICE_REGISTRY_TTL_SECONDS. That bounds how long another uvicorn worker can
+keep serving a pairing that was changed elsewhere.
+
+Device ids that are not in the database (any client can send frames to the
+sensor socket) are remembered as unpaired in a separate LRU of at most
+DEVICE_REGISTRY_MAX_UNKNOWN ids, so they cannot grow the registry.
+"""
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from database import SessionLocal
+from models_db import Device
+
+logger = logging.getLogger(__name__)
+
+DEVICE_REGISTRY_TTL_SECONDS = float(os.getenv("DEVICE_REGISTRY_TTL_SECONDS", "30"))
+DEVICE_REGISTRY_MAX_UNKNOWN = int(os.getenv("DEVICE_REGISTRY_MAX_UNKNOWN", "1024"))
+# A paired device counts as online while its owner's newest reading is at most this
+# old (devices stream at 1 Hz; the dashboards mark data older than 5 s as stale)
+DEVICE_ONLINE_SECONDS = float(os.getenv("DEVICE_ONLINE_SECONDS", "5"))
+
+
+class DeviceEntry:
+    """Pairing state of one device. `state` is replaced as a whole so readers never see half an update."""
+
+    __slots__ = ("device_id", "state", "loaded_at")
+
+    def __init__(self, device_id: str, paired: bool, user_id: int | None):
+        self.device_id = device_id
+        self.state = (paired, user_id)
+        self.loaded_at = time.monotonic()
+
+    def set(self, paired: bool, user_id: int | None):
+        self.state = (paired, user_id)
+        self.loaded_at = time.monotonic()
+
+    @property
+    def user_id(self) -> int | None:
+        """User the device streams for, or None if it is not paired."""
+        paired, user_id = self.state
+        return user_id if paired else None
+
+    def is_stale(self) -> bool:
+        return time.monotonic() - self.loaded_at > DEVICE_REGISTRY_TTL_SECONDS
+
+
+class DeviceRegistry:
+    """Device pairing state keyed by device_id."""
+
+    def __init__(self, max_unknown: int = DEVICE_REGISTRY_MAX_UNKNOWN):
+        self.max_unknown = max_unknown
+        self._entries = {}
+        self._unknown = OrderedDict()  # device_id -> unpaired entry, for ids not in the database
+        self._lock = threading.Lock()
+
+    def load_all(self):
+        """Load every device from the database. Called once at startup."""
+        db = SessionLocal()
+        try:
+            rows = db.query(Device.device_id, Device.paired, Device.user_id).all()
+        finally:
+            db.close()
+
+        with self._lock:
+            for device_id, paired, user_id in rows:
+                self._set(device_id, paired, user_id)
+        logger.info(f"Device registry loaded {len(rows)} devices")
+
+    def get(self, device_id: str) -> DeviceEntry | None:
+        """Cached entry, or None when the device is unknown or its entry has expired."""
+        entry = self._entries.get(device_id)
+        if entry is None:
+            entry = self._unknown.get(device_id)
+            if entry is not None:
+                with self._lock:
+                    if device_id in self._unknown:
+                        self._unknown.move_to_end(device_id)
+        if entry is None or entry.is_stale():
+            return None
+        return entry
+
+    def refresh(self, device_id: str) -> DeviceEntry:
+        """Re-read one device from the database. Unknown devices are cached as unpaired in the bounded LRU."""
+        db = SessionLocal()
+        try:
+            row = db.query(Device.paired, Device.user_id).filter(Device.device_id == device_id).first()
+        finally:
+            db.close()
+
+        with self._lock:
+            if row:
+                return self._set(device_id, *row)
+            return self._set_unknown(device_id)
+
+    def update(self, device: Device):
+        """Record the current state of a device after a handler committed a change."""
+        with self._lock:
+            self._set(device.device_id, device.paired, device.user_id)
+
+    def remove(self, device_id: str):
+        """Forget a deleted device. Sockets still bound to it see it as unpaired."""
+        with self._lock:
+            entry = self._entries.pop(device_id, None)
+            if entry is not None:
+                entry.set(False, None)
+
+    def _set(self, device_id, paired, user_id) -> DeviceEntry:
+        # A device registered after it was seen as unknown keeps its entry, so bound sockets see the change
+        entry = self._entries.get(device_id) or self._unknown.pop(device_id, None)
+        if entry is None:
+            entry = DeviceEntry(device_id, paired, user_id)
+        else:
+            entry.set(paired, user_id)
+        self._entries[device_id] = entry
+        return entry
+
+    def _set_unknown(self, device_id) -> DeviceEntry:
+        entry = self._entries.pop(device_id, None) or self._unknown.pop(device_id, None)
+        if entry is None:
+            entry = DeviceEntry(device_id, False, None)
+        else:
+            entry.set(False, None)
+        if self.max_unknown > 0:
+            self._unknown[device_id] = entry
+            while len(self._unknown) > self.max_unknown:
+                self._unknown.popitem(last=False)
+        return entry
+
+    def __len__(self):
+        return len(self._entries)
+
+
+device_registry = DeviceRegistry()
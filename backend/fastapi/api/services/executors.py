@@ -0,0 +1,141 @@
+"""
+Bounded executors that keep blocking work (SQLAlchemy sessions, model inference)
+off the event loop.
+
+Each executor wraps a thread pool with a cap on in-flight tasks (callers await a
+free slot instead of piling work onto the pool), optional per-key FIFO ordering,
+and counters for queue depth, wait time and run time so the pools can be sized.
+"""
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+DB_POOL_WORKERS = int(os.getenv("DB_POOL_WORKERS", "4"))
+DB_POOL_MAX_PENDING = int(os.getenv("DB_POOL_MAX_PENDING", "64"))
+INFERENCE_POOL_WORKERS = int(os.getenv("INFERENCE_POOL_WORKERS", "2"))
+INFERENCE_POOL_MAX_PENDING = int(os.getenv("INFERENCE_POOL_MAX_PENDING", "32"))
+
+
+class BoundedExecutor:
+    """Thread pool with a bounded backlog, per-key ordering and timing stats."""
+
+    def __init__(self, name: str, max_workers: int, max_pending: int):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"{name}-pool")
+        self._slots = asyncio.Semaphore(max_pending)
+        self._key_locks = {}  # key -> [asyncio.Lock, number of tasks holding or waiting]
+        self._stats_lock = threading.Lock()
+
+        self._waiting = 0     # awaiting a free slot (backpressure)
+        self._queued = 0      # submitted to the pool, not started yet
+        self._active = 0
+        self._completed = 0
+        self._failed = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+        self._total_run = 0.0
+        self._max_run = 0.0
+
+    async def run(self, fn, *args, key=None):
+        """
+        Run fn(*args) in the pool and return its result.
+        Tasks sharing the same key run one at a time, in submission order.
+        """
+        if key is None:
+            return await self._submit(fn, args)
+
+        entry = self._key_locks.setdefault(key, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                return await self._submit(fn, args)
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._key_locks[key]
+
+    async def _submit(self, fn, args):
+        enqueued_at = time.perf_counter()
+
+        self._waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self._waiting -= 1
+
+        try:
+            with self._stats_lock:
+                self._queued += 1
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._pool, self._timed_call, fn, args, enqueued_at)
+        finally:
+            self._slots.release()
+
+    def _timed_call(self, fn, args, enqueued_at):
+        started_at = time.perf_counter()
+        wait = started_at - enqueued_at
+        with self._stats_lock:
+            self._queued -= 1
+            self._active += 1
+            self._total_wait += wait
+            self._max_wait = max(self._max_wait, wait)
+
+        failed = False
+        try:
+            return fn(*args)
+        except Exception:
+            failed = True
+            raise
+        finally:
+            elapsed = time.perf_counter() - started_at
+            with self._stats_lock:
+                self._active -= 1
+                if failed:
+                    self._failed += 1
+                else:
+                    self._completed += 1
+                self._total_run += elapsed
+                self._max_run = max(self._max_run, elapsed)
+
+    def stats(self) -> dict:
+        """Snapshot of queue depth and timings (milliseconds)."""
+        with self._stats_lock:
+            finished = self._completed + self._failed
+            return {
+                "max_workers": self.max_workers,
+                "max_pending": self.max_pending,
+                "queue_depth": self._waiting + self._queued,
+                "waiting_for_slot": self._waiting,
+                "queued": self._queued,
+                "active": self._active,
+                "completed": self._completed,
+                "failed": self._failed,
+                "avg_wait_ms": round(self._total_wait / finished * 1000, 3) if finished else 0.0,
+                "max_wait_ms": round(self._max_wait * 1000, 3),
+                "avg_run_ms": round(self._total_run / finished * 1000, 3) if finished else 0.0,
+                "max_run_ms": round(self._max_run * 1000, 3),
+            }
+
+    def shutdown(self):
+        self._pool.shutdown(wait=True)
+
+
+db_executor = BoundedExecutor("db", DB_POOL_WORKERS, DB_POOL_MAX_PENDING)
+inference_executor = BoundedExecutor("inference", INFERENCE_POOL_WORKERS, INFERENCE_POOL_MAX_PENDING)
+
+
+def executor_stats() -> dict:
+    return {
+        "db": db_executor.stats(),
+        "inference": inference_executor.stats(),
+    }
+
+
+def shutdown_executors():
+    """Wait for running tasks and stop the worker threads."""
+    db_executor.shutdown()
+    inference_executor.shutdown()
@@ -0,0 +1,170 @@
+"""
+Streaming export of raw metrics as NDJSON, CSV, Parquet or Arrow IPC.
+
+Rows are read through a server-side cursor (`yield_per`) in chunks of
+EXPORT_CHUNK_ROWS. Each chunk is encoded and handed to the response before the
+next one is fetched, so memory stays flat however long the exported range is.
+
+Parquet and Arrow need the optional pyarrow package.
+"""
+import csv
+import io
+import json
+import os
+
+from sqlalchemy import select
+
+from database import SessionLocal
+from models_db import Metrics
+
+EXPORT_CHUNK_ROWS = int(os.getenv("EXPORT_CHUNK_ROWS", "5000"))
+
+EXPORT_COLUMNS = (
+    "user_id", "id", "timestamp", "heart_rate", "motion_intensity",
+    "prediction", "anomaly_score", "confidence_normal", "confidence_anomaly"
+)
+
+# format -> (media type, file extension)
+EXPORT_FORMATS = {
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "csv": ("text/csv", "csv"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrows"),
+}
+ARROW_FORMATS = ("parquet", "arrow")
+
+
+def pyarrow_available() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _row_chunks(user_ids, start_dt=None, end_dt=None, chunk_rows: int = EXPORT_CHUNK_ROWS):
+    """
+    Metric rows of the given users as lists of tuples, ordered by user and time.
+    Opens its own session: the response body is produced after the request
+    handler (and its session) has finished.
+    """
+    db = SessionLocal()
+    try:
+        stmt = select(*(getattr(Metrics, column) for column in EXPORT_COLUMNS)).where(
+            Metrics.user_id.in_(user_ids)
+        )
+        if start_dt:
+            stmt = stmt.where(Metrics.timestamp >= start_dt)
+        if end_dt:
+            stmt = stmt.where(Metrics.timestamp <= end_dt)
+        # yield_per streams from a server-side cursor instead of buffering the whole result
+        stmt = stmt.order_by(Metrics.user_id, Metrics.timestamp).execution_options(yield_per=chunk_rows)
+
+        for partition in db.execute(stmt).partitions():
+            yield partition
+    finally:
+        db.close()
+
+
+def _isoformat(value):
+    return value.isoformat() if value is not None else None
+
+
+def _ndjson(chunks):
+    timestamp = EXPORT_COLUMNS.index("timestamp")
+    for rows in chunks:
+        lines = []
+        for row in rows:
+            record = dict(zip(EXPORT_COLUMNS, row))
+            record["timestamp"] = _isoformat(row[timestamp])
+            lines.append(json.dumps(record))
+        yield "\n".join(lines) + "\n"
+
+
+def _csv(chunks):
+    timestamp = EXPORT_COLUMNS.index("timestamp")
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+
+    for rows in chunks:
+        for row in rows:
+            row = list(row)
+            row[timestamp] = _isoformat(row[timestamp])
+            writer.writerow(row)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that collects bytes until they are taken. tell() keeps counting."""
+
+    def __init__(self):
+        self._parts = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def take(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts = []
+        return data
+
+
+def _arrow(chunks, file_format: str):
+    """Parquet (one row group per chunk) or Arrow IPC stream (one record batch per chunk)."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ("user_id", pa.int64()),
+        ("id", pa.int64()),
+        ("timestamp", pa.timestamp("us", tz="UTC")),
+        ("heart_rate", pa.float64()),
+        ("motion_intensity", pa.float64()),
+        ("prediction", pa.string()),
+        ("anomaly_score", pa.float64()),
+        ("confidence_normal", pa.float64()),
+        ("confidence_anomaly", pa.float64()),
+    ])
+
+    sink = _ChunkSink()
+    if file_format == "parquet":
+        writer = pq.ParquetWriter(sink, schema)
+    else:
+        writer = pa.ipc.new_stream(sink, schema)
+
+    try:
+        for rows in chunks:
+            columns = list(zip(*rows))
+            writer.write_table(pa.Table.from_arrays(
+                [pa.array(values, type=field.type) for values, field in zip(columns, schema)],
+                schema=schema
+            ))
+            yield sink.take()
+    finally:
+        writer.close()
+    yield sink.take()
+
+
+def stream_export(user_ids, start_dt=None, end_dt=None, file_format: str = "ndjson"):
+    """Response body for an export: an iterator of str/bytes chunks."""
+    chunks = _row_chunks(user_ids, start_dt, end_dt)
+    if file_format == "csv":
+        return _csv(chunks)
+    if file_format in ARROW_FORMATS:
+        return _arrow(chunks, file_format)
+    return _ndjson(chunks)
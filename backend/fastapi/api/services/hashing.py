@@ -0,0 +1,162 @@
+"""
+Password hashing off the request path.
+
+bcrypt is slow on purpose (~250 ms per hash at cost 12), so hashing inline
+ties up a request thread for the whole time and a login burst starves every
+other endpoint. Here hashes and verifications run in a pool of worker processes
+(PASSWORD_HASH_WORKERS, spawned, so they use every core and share nothing with
+the server), and admission control bounds the backlog: with
+PASSWORD_HASH_MAX_PENDING operations queued or running, new ones fail at once
+with HashingBusy (the API answers 503 with Retry-After) instead of waiting
+behind the burst. If a worker dies, the pool is replaced on the next call and
+the operations it was running fail the same way.
+
+New hashes use BCRYPT_ROUNDS. Verifying a password stored with another cost
+also returns its rehash, which login stores (rehash on login), so changing
+BCRYPT_ROUNDS migrates users as they sign in.
+
+This module only imports passlib, so the worker processes start quickly.
+"""
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from passlib.context import CryptContext
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "32"))
+
+# min = max = default: hashes made with any other cost need an update
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS
+)
+
+
+def hash_password(password: str) -> str:
+    """Hash a plain password securely using bcrypt."""
+    if len(password.encode("utf-8")) > 72:
+        password = password[:72]
+    return pwd_context.hash(password)
+
+
+def verify_password(plain_password: str, hashed_password: str) -> bool:
+    """Verify plain password against its hashed version."""
+    return pwd_context.verify(plain_password, hashed_password)
+
+
+def _timed_hash(password: str):
+    started = time.perf_counter()
+    return hash_password(password), time.perf_counter() - started
+
+
+def _timed_verify(password: str, hashed_password: str):
+    started = time.perf_counter()
+    return pwd_context.verify_and_update(password, hashed_password), time.perf_counter() - started
+
+
+class HashingBusy(Exception):
+    """Raised when the hashing backlog is full, or the pool lost a worker."""
+
+
+class PasswordHasher:
+    """
+    Process pool for bcrypt with a bounded backlog and latency counters.
+    Called from the event loop only, which owns the counters.
+    """
+
+    def __init__(self, workers: int = PASSWORD_HASH_WORKERS, max_pending: int = PASSWORD_HASH_MAX_PENDING):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._pool = None
+        self._pending = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._broken = 0
+        self._total_hash = 0.0
+        self._max_hash = 0.0
+        self._total_latency = 0.0
+        self._max_latency = 0.0
+
+    def start(self):
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+
+    async def hash(self, password: str) -> str:
+        """Hash a password in the pool. Raises HashingBusy when the backlog is full."""
+        return await self._run(_timed_hash, password)
+
+    async def verify(self, password: str, hashed_password: str) -> tuple[bool, str | None]:
+        """
+        Check a password in the pool: (valid, new hash). The new hash is set when the
+        stored one uses other parameters than BCRYPT_ROUNDS. Raises HashingBusy.
+        """
+        return await self._run(_timed_verify, password, hashed_password)
+
+    async def _run(self, fn, *args):
+        if self._pending >= self.max_pending:
+            self._rejected += 1
+            raise HashingBusy("Too many password operations in progress")
+
+        self.start()
+        pool = self._pool
+        self._pending += 1
+        started = time.perf_counter()
+        try:
+            result, seconds = await asyncio.get_running_loop().run_in_executor(pool, fn, *args)
+        except BrokenProcessPool:
+            # A worker died (OOM kill, crash): the pool accepts no more work. Replace it
+            # on the next call; this request fails as if the backlog were full
+            self._failed += 1
+            if self._pool is pool:
+                self._broken += 1
+                self._pool = None
+                pool.shutdown(wait=False, cancel_futures=True)
+            raise HashingBusy("Password hashing worker restarted")
+        except Exception:
+            self._failed += 1
+            raise
+        finally:
+            self._pending -= 1
+
+        latency = time.perf_counter() - started
+        self._completed += 1
+        self._total_hash += seconds
+        self._max_hash = max(self._max_hash, seconds)
+        self._total_latency += latency
+        self._max_latency = max(self._max_latency, latency)
+        return result
+
+    def stats(self) -> dict:
+        """Backlog and timings (milliseconds); latency includes the wait for a worker."""
+        completed = self._completed
+        return {
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "bcrypt_rounds": BCRYPT_ROUNDS,
+            "pending": self._pending,
+            "completed": completed,
+            "failed": self._failed,
+            "rejected": self._rejected,
+            "pool_restarts": self._broken,
+            "avg_hash_ms": round(self._total_hash / completed * 1000, 3) if completed else 0.0,
+            "max_hash_ms": round(self._max_hash * 1000, 3),
+            "avg_latency_ms": round(self._total_latency / completed * 1000, 3) if completed else 0.0,
+            "max_latency_ms": round(self._max_latency * 1000, 3),
+        }
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+password_hasher = PasswordHasher()
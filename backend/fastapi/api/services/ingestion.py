@@ -0,0 +1,343 @@
+"""
+Micro-batched ingestion pipeline for sensor frames received over /ws/sensors.
+
+Every socket enqueues its frames and awaits the result. A single writer task
+drains the queue in micro-batches (bounded by size and by time), scores each
+batch on the inference executor and persists it on the DB executor with one
+multi-row insert and one commit. The same transaction folds the batch into the
+metrics rollups (see services/rollups.py).
+
+Batches are split into shards by device_id. Writes for a shard run in order,
+so frames from one device are always committed in the order they arrived,
+while different shards can commit in parallel.
+
+Once a batch is committed its metrics and alerts are published to the live
+dashboard hub (services/pubsub.py), topic = user id, and the readings are
+appended to the per-user ring buffers that serve recent reads (services/ring_buffer.py).
+Only committed readings are folded into the per-user baselines (services/baselines.py).
+"""
+import asyncio
+import logging
+import os
+import zlib
+from dataclasses import dataclass
+from datetime import datetime, timezone
+
+from sqlalchemy import insert
+
+from database import SessionLocal
+from models_db import Metrics
+from routers.alerts import alert_to_dict
+from ai_model.model import predict_batch
+from services.executors import db_executor, inference_executor, DB_POOL_WORKERS
+from services.rollups import aggregate_rows, upsert_rollups
+from services.pubsub import pubsub
+from services.alert_engine import alert_engine
+from services.ring_buffer import metrics_buffer
+from services.baselines import baseline_store
+from services.shadow import shadow_scorer
+
+logger = logging.getLogger(__name__)
+
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "200"))
+INGEST_FLUSH_INTERVAL_MS = int(os.getenv("INGEST_FLUSH_INTERVAL_MS", "50"))
+INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "5000"))
+INGEST_WRITER_SHARDS = int(os.getenv("INGEST_WRITER_SHARDS", str(DB_POOL_WORKERS)))
+INGEST_MAX_INFLIGHT_BATCHES = int(os.getenv("INGEST_MAX_INFLIGHT_BATCHES", "16"))
+
+# Sentinel placed on the queue to stop the writer after the pending frames
+_STOP = object()
+
+
+@dataclass
+class SensorFrame:
+    device_id: str
+    user_id: int
+    heart_rate: float
+    motion_intensity: float
+    timestamp: datetime
+    future: asyncio.Future
+
+
+def score_frames(frames):
+    """
+    Run the anomaly model over a whole batch in one call. Runs on the inference executor.
+    Readings are scored against their user's baseline; they are folded into it
+    once their batch is committed (see persist_batch).
+    A shadow model version, if one is set, scores the batch later on its own thread.
+    """
+    user_ids = [frame.user_id for frame in frames]
+    heart_rates = [frame.heart_rate for frame in frames]
+    motion_intensities = [frame.motion_intensity for frame in frames]
+
+    normalization = baseline_store.normalization(user_ids)
+    scored = predict_batch(heart_rates, motion_intensities, normalization)
+    shadow_scorer.submit(heart_rates, motion_intensities, normalization, scored)
+
+    return [{
+        "prediction": prediction,
+        "anomaly_score": anomaly_score,
+        "confidence_normal": confidence_normal,
+        "confidence_anomaly": confidence_anomaly
+    } for prediction, anomaly_score, confidence_normal, confidence_anomaly in zip(
+        scored["prediction"].tolist(),
+        scored["anomaly_score"].tolist(),
+        scored["confidence_normal"].tolist(),
+        scored["confidence_anomaly"].tolist()
+    )]
+
+
+def metric_event(metric_id, row) -> dict:
+    """A stored metric in the shape the history endpoints return it."""
+    return {
+        "id": metric_id,
+        "heart_rate": row["heart_rate"],
+        "motion_intensity": row["motion_intensity"],
+        "prediction": row["prediction"],
+        "anomaly_score": row["anomaly_score"],
+        "confidence_normal": row["confidence_normal"],
+        "confidence_anomaly": row["confidence_anomaly"],
+        "timestamp": row["timestamp"].astimezone(timezone.utc).isoformat()
+    }
+
+
+def persist_batch(frames, results):
+    """
+    Store a scored batch of frames in a single transaction. Runs on the DB executor.
+    Frames come from paired devices only (checked against the device registry).
+    Returns one response dict per frame, in the same order as the input, and
+    the (user_id, event) pairs to publish once the transaction is committed.
+    """
+    db = SessionLocal()
+    alert_undo = None
+
+    try:
+        rows = [{
+            "user_id": frame.user_id,
+            "heart_rate": frame.heart_rate,
+            "motion_intensity": frame.motion_intensity,
+            "timestamp": frame.timestamp,
+            "prediction": result["prediction"],
+            "anomaly_score": result["anomaly_score"],
+            "confidence_normal": result["confidence_normal"],
+            "confidence_anomaly": result["confidence_anomaly"]
+        } for frame, result in zip(frames, results)]
+
+        # One multi-row INSERT ... RETURNING id for the whole batch
+        metric_ids = db.scalars(
+            insert(Metrics).returning(Metrics.id, sort_by_parameter_order=True),
+            rows
+        ).all()
+
+        # Keep the 1m/15m/1h rollups in step with the raw rows
+        upsert_rollups(db, aggregate_rows(rows))
+
+        # Alerts for the whole batch; the engine filters duplicates in memory
+        alerts, alert_undo = alert_engine.evaluate(db, rows)
+
+        responses = []
+        events = []
+        for frame, result, row, metric_id in zip(frames, results, rows, metric_ids):
+            events.append((frame.user_id, {
+                "type": "metric",
+                "user_id": frame.user_id,
+                "data": metric_event(metric_id, row)
+            }))
+
+            responses.append({
+                "status": "success",
+                "metric_id": metric_id,
+                "prediction": result["prediction"],
+                "stress_level": int(result["confidence_anomaly"]),  # Stress level is confidence_anomaly as integer
+                "anomaly_score": result["anomaly_score"],
+                "confidence_anomaly": result["confidence_anomaly"]
+            })
+
+        # Serialized now, while the flushed alerts still hold their values
+        events.extend((alert.user_id, {
+            "type": "alert",
+            "user_id": alert.user_id,
+            "data": alert_to_dict(alert)
+        }) for alert in alerts)
+
+        db.commit()
+        logger.info(f"✓ Saved {len(rows)} metrics in one batch")
+
+    except Exception:
+        db.rollback()
+        if alert_undo:
+            alert_engine.restore(alert_undo)
+        raise
+    finally:
+        db.close()
+
+    # Only stored readings are learned, so a rolled back batch leaves the baselines as they were
+    baseline_store.update(
+        [row["user_id"] for row in rows],
+        [row["heart_rate"] for row in rows],
+        [row["motion_intensity"] for row in rows]
+    )
+    return responses, events
+
+
+def _shard_for(device_id, shards: int) -> int:
+    return zlib.crc32(str(device_id).encode("utf-8")) % shards
+
+
+class IngestionPipeline:
+    """Queue of sensor frames drained by one writer task in micro-batches."""
+
+    def __init__(self, batch_size: int = INGEST_BATCH_SIZE,
+                 flush_interval_ms: int = INGEST_FLUSH_INTERVAL_MS,
+                 max_queue: int = INGEST_QUEUE_SIZE,
+                 shards: int = INGEST_WRITER_SHARDS,
+                 max_inflight: int = INGEST_MAX_INFLIGHT_BATCHES):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_queue = max_queue
+        self.shards = max(1, shards)
+        self.max_inflight = max_inflight
+        self._queue = None
+        self._writer = None
+        self._inflight = None
+        self._tasks = set()
+
+        self._batches = 0
+        self._frames = 0
+
+    async def start(self):
+        """Create the queue and start the writer task on the running loop."""
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._inflight = asyncio.Semaphore(self.max_inflight)
+        self._writer = asyncio.create_task(self._run())
+        logger.info(
+            f"Ingestion pipeline started (batch_size={self.batch_size}, "
+            f"flush_interval={self.flush_interval * 1000:.0f}ms, shards={self.shards})"
+        )
+
+    async def stop(self):
+        """Flush the frames already queued, then stop the writer task."""
+        if self._writer is None:
+            return
+        await self._queue.put(_STOP)
+        await self._writer
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._writer = None
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "max_queue": self.max_queue,
+            "inflight_batches": len(self._tasks),
+            "batches": self._batches,
+            "frames": self._frames,
+            "avg_batch_size": round(self._frames / self._batches, 2) if self._batches else 0.0,
+        }
+
+    async def submit(self, device_id: str, user_id: int, heart_rate: float, motion_intensity: float,
+                     timestamp: datetime) -> dict:
+        """
+        Enqueue one frame and wait until its batch is committed.
+        Blocks when the queue is full, which pushes back on the socket.
+        """
+        if self._writer is None:
+            raise RuntimeError("Ingestion pipeline is not running")
+
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put(SensorFrame(device_id, user_id, heart_rate, motion_intensity, timestamp, future))
+        return await future
+
+    async def _run(self):
+        stopping = False
+        while not stopping:
+            batch, stopping = await self._collect_batch()
+            if batch:
+                await self._flush(batch)
+
+    async def _collect_batch(self):
+        """Wait for a first frame, then gather more until the batch is full or the interval ends."""
+        loop = asyncio.get_running_loop()
+
+        frame = await self._queue.get()
+        if frame is _STOP:
+            return [], True
+
+        batch = [frame]
+        deadline = loop.time() + self.flush_interval
+
+        while len(batch) < self.batch_size:
+            if self._queue.empty():
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    frame = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+            else:
+                frame = self._queue.get_nowait()
+
+            if frame is _STOP:
+                return batch, True
+            batch.append(frame)
+
+        return batch, False
+
+    async def _flush(self, batch):
+        self._batches += 1
+        self._frames += len(batch)
+
+        try:
+            results = await inference_executor.run(score_frames, batch)
+        except Exception as e:
+            logger.error(f"Error scoring sensor batch: {str(e)}")
+            self._fail(batch, e)
+            return
+
+        partitions = {}
+        for frame, result in zip(batch, results):
+            frames, shard_results = partitions.setdefault(_shard_for(frame.device_id, self.shards), ([], []))
+            frames.append(frame)
+            shard_results.append(result)
+
+        for shard, (frames, shard_results) in partitions.items():
+            # Backpressure: stop draining the queue while too many batches are in flight
+            await self._inflight.acquire()
+            task = asyncio.create_task(self._write_shard(shard, frames, shard_results))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _write_shard(self, shard, frames, results):
+        try:
+            # Same key -> same FIFO lane, which keeps per-device commit order
+            responses, events = await db_executor.run(persist_batch, frames, results, key=("ingest", shard))
+        except Exception as e:
+            logger.error(f"Error persisting sensor batch: {str(e)}")
+            self._fail(frames, e)
+            return
+        finally:
+            self._inflight.release()
+
+        for frame, result, response in zip(frames, results, responses):
+            metrics_buffer.append(
+                frame.user_id, response["metric_id"], frame.timestamp, frame.heart_rate,
+                frame.motion_intensity, result["prediction"], result["anomaly_score"],
+                result["confidence_normal"], result["confidence_anomaly"]
+            )
+
+        for user_id, event in events:
+            pubsub.publish(user_id, event)
+
+        for frame, response in zip(frames, responses):
+            if not frame.future.done():
+                frame.future.set_result(response)
+
+    @staticmethod
+    def _fail(frames, error):
+        for frame in frames:
+            if not frame.future.done():
+                frame.future.set_exception(error)
+
+
+ingestion_pipeline = IngestionPipeline()
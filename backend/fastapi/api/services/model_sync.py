@@ -0,0 +1,116 @@
+"""
+Keeps every worker process on the same model versions.
+
+With `uvicorn --workers N` each process holds its own copy of the model (a
+loaded 200-tree forest is ~7 MB, small next to the interpreter and libraries
+every worker carries anyway). What has to be shared is which version serves.
+The pointers in the artifacts directory are that shared state: CURRENT names
+the production version, SHADOW the shadow version. A promotion, a finished
+training job or a shadow change in any worker rewrites a pointer. Every worker
+reads both pointers every MODEL_SYNC_SECONDS and loads a version that changed,
+so all workers switch within one interval of each other.
+
+The check reads two small files on the inference executor; predictions never
+wait for it. A version that fails to load is logged and reported in stats(),
+and is not retried until the pointer changes again.
+"""
+import asyncio
+import logging
+import os
+
+from ai_model.model import LEGACY_VERSION, active_model, activate, current_version, shadow_version
+from services.executors import inference_executor
+from services.shadow import shadow_scorer
+
+logger = logging.getLogger(__name__)
+
+MODEL_SYNC_SECONDS = float(os.getenv("MODEL_SYNC_SECONDS", "2"))
+
+_UNSET = object()
+
+
+class ModelSync:
+    """Follows the CURRENT and SHADOW pointers in this worker."""
+
+    def __init__(self, interval: float = MODEL_SYNC_SECONDS):
+        self.interval = interval
+        self._task = None
+        self._current = _UNSET
+        self._shadow = None
+        self._checks = 0
+        self._swaps = 0
+        self._errors = 0
+        self._last_error = None
+
+    def check(self):
+        """Load whatever the pointers name, if they changed since the last check."""
+        self._checks += 1
+
+        current = current_version()
+        if current != self._current:
+            self._current = current
+            loaded = active_model()
+            serving = loaded.version if loaded is not None else None
+            # No pointer and no model loaded: nothing is trained yet
+            if serving != (current or LEGACY_VERSION) and (current is not None or serving is not None):
+                try:
+                    activate(current)
+                    self._swaps += 1
+                    logger.info(f"Worker {os.getpid()} switched to model version {current or LEGACY_VERSION}")
+                except Exception as e:
+                    self._error(f"Loading model version {current or LEGACY_VERSION} failed: {e}")
+
+        shadow = shadow_version()
+        if shadow != self._shadow:
+            self._shadow = shadow
+            if shadow_scorer.version != shadow:
+                try:
+                    if shadow is None:
+                        shadow_scorer.stop()
+                    else:
+                        shadow_scorer.start(shadow)
+                except Exception as e:
+                    self._error(f"Loading shadow model version {shadow} failed: {e}")
+
+    def _error(self, message: str):
+        self._errors += 1
+        self._last_error = message
+        logger.error(message)
+
+    async def start(self):
+        """Check the pointers now (picks up a shadow set before this worker started), then periodically."""
+        await inference_executor.run(self.check)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await inference_executor.run(self.check)
+            except Exception as e:
+                self._error(f"Model pointer check failed: {e}")
+
+    def stats(self) -> dict:
+        loaded = active_model()
+        return {
+            "pid": os.getpid(),
+            "interval_seconds": self.interval,
+            "active_version": loaded.version if loaded else None,
+            "shadow_version": shadow_scorer.version,
+            "checks": self._checks,
+            "swaps": self._swaps,
+            "errors": self._errors,
+            "last_error": self._last_error,
+        }
+
+
+model_sync = ModelSync()
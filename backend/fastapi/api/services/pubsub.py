@@ -0,0 +1,90 @@
+"""
+In-process publish/subscribe hub for live dashboard updates.
+
+Topics are user ids. The ingestion pipeline publishes every committed metric
+and alert to its user's topic; dashboard sockets (/ws/dashboard) subscribe to
+their own user, or admins to the students they are watching.
+
+Everything runs on the event loop, so no locking is needed. Each subscriber
+has a bounded queue: a slow browser tab loses its oldest events instead of
+holding up ingestion, and is told to resync over HTTP.
+
+The hub is per process. With several uvicorn workers, a dashboard socket only
+receives events ingested by its own worker; the frontend (hooks/use-live-stream.ts)
+refetches over HTTP whenever its stream has been quiet for a few seconds, so such
+dashboards fall back to slow polling instead of freezing.
+"""
+import asyncio
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+PUBSUB_SUBSCRIBER_QUEUE_SIZE = int(os.getenv("PUBSUB_SUBSCRIBER_QUEUE_SIZE", "256"))
+
+
+class Subscription:
+    """Events for a set of topics, delivered in publish order."""
+
+    def __init__(self, topics, max_queue: int):
+        self.topics = frozenset(topics)
+        self.queue = asyncio.Queue(maxsize=max_queue)
+        self.dropped = 0
+
+    def put(self, event):
+        if self.queue.full():
+            # Drop the oldest event; the socket sends a resync notice instead
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(event)
+
+    async def get(self):
+        return await self.queue.get()
+
+
+class PubSub:
+    """Fan-out of events from user topics to their subscribers."""
+
+    def __init__(self, max_queue: int = PUBSUB_SUBSCRIBER_QUEUE_SIZE):
+        self.max_queue = max_queue
+        self._subscribers = {}
+        self._published = 0
+        self._delivered = 0
+
+    def subscribe(self, topics) -> Subscription:
+        subscription = Subscription(topics, self.max_queue)
+        for topic in subscription.topics:
+            self._subscribers.setdefault(topic, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        for topic in subscription.topics:
+            subscribers = self._subscribers.get(topic)
+            if subscribers is None:
+                continue
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._subscribers[topic]
+
+    def has_subscribers(self, topic) -> bool:
+        return topic in self._subscribers
+
+    def publish(self, topic, event):
+        """Hand an event to every subscriber of the topic. Never blocks."""
+        self._published += 1
+        for subscription in self._subscribers.get(topic, ()):
+            subscription.put(event)
+            self._delivered += 1
+
+    def stats(self) -> dict:
+        subscriptions = {s for subscribers in self._subscribers.values() for s in subscribers}
+        return {
+            "topics": len(self._subscribers),
+            "subscriptions": len(subscriptions),
+            "published": self._published,
+            "delivered": self._delivered,
+            "dropped": sum(s.dropped for s in subscriptions),
+        }
+
+
+pubsub = PubSub()
@@ -0,0 +1,251 @@
+"""
+Per-user ring buffers of recent readings for the latest/short-window history reads.
+
+The ingestion pipeline appends every committed reading to its user's buffer.
+Each buffer keeps the newest readings in fixed-size numpy arrays (enough for
+RING_BUFFER_SECONDS of data) and knows from which instant on it is complete:
+its first reading, or the oldest reading it still holds once it has wrapped.
+Reads that fall entirely inside that window are answered from memory; anything
+older goes to the database as before.
+
+Buffers live in the process that ingests the readings. A buffer only answers
+while its user's readings keep arriving in this process: once the last append
+is older than RING_BUFFER_STALE_SECONDS (the device stopped, or reconnected to
+another uvicorn worker) reads go to the database, the next append starts the
+buffer over, and idle buffers are evicted.
+"""
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+from services.device_registry import DEVICE_ONLINE_SECONDS
+
+RING_BUFFER_SECONDS = int(os.getenv("RING_BUFFER_SECONDS", "600"))
+# Capacity = seconds x max readings per second (devices send 1 Hz; headroom for bursts)
+RING_BUFFER_MAX_RATE_HZ = float(os.getenv("RING_BUFFER_MAX_RATE_HZ", "2"))
+# A buffer without appends for this long may be missing readings stored by another worker
+RING_BUFFER_STALE_SECONDS = float(os.getenv("RING_BUFFER_STALE_SECONDS", str(DEVICE_ONLINE_SECONDS)))
+# How often appends sweep out idle buffers
+RING_BUFFER_SWEEP_SECONDS = 60
+
+_INITIAL_CAPACITY = 64
+_FIELDS = ("timestamp", "heart_rate", "motion_intensity", "anomaly_score", "confidence_normal", "confidence_anomaly")
+
+
+class UserRingBuffer:
+    """The newest readings of one user, oldest first from `start`."""
+
+    def __init__(self, max_capacity: int, complete_since: float):
+        self.max_capacity = max_capacity
+        self.capacity = min(_INITIAL_CAPACITY, max_capacity)
+        self.ids = np.zeros(self.capacity, dtype=np.int64)
+        self.anomaly = np.zeros(self.capacity, dtype=bool)
+        self.values = np.zeros((len(_FIELDS), self.capacity), dtype=np.float64)
+        self.start = 0
+        self.size = 0
+        # Every reading of this user with timestamp >= complete_since is in the buffer
+        self.complete_since = complete_since
+        # time.monotonic() of the last append
+        self.appended_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _grow(self):
+        capacity = min(self.capacity * 2, self.max_capacity)
+        order = self._order()
+        self.ids = np.concatenate([self.ids[order], np.zeros(capacity - self.size, dtype=np.int64)])
+        self.anomaly = np.concatenate([self.anomaly[order], np.zeros(capacity - self.size, dtype=bool)])
+        values = np.zeros((len(_FIELDS), capacity), dtype=np.float64)
+        values[:, :self.size] = self.values[:, order]
+        self.values = values
+        self.capacity = capacity
+        self.start = 0
+
+    def _order(self) -> np.ndarray:
+        """Physical slots in time order."""
+        return (self.start + np.arange(self.size)) % self.capacity
+
+    def is_stale(self, stale_seconds: float) -> bool:
+        return time.monotonic() - self.appended_at > stale_seconds
+
+    def append(self, metric_id: int, timestamp: float, heart_rate: float, motion_intensity: float,
+               prediction: str, anomaly_score: float, confidence_normal: float, confidence_anomaly: float,
+               stale_seconds: float | None = None):
+        with self.lock:
+            if stale_seconds is not None and self.size and self.is_stale(stale_seconds):
+                # Readings of the gap may have been stored elsewhere: complete from this one on only
+                self.start = 0
+                self.size = 0
+                self.complete_since = timestamp
+            self.appended_at = time.monotonic()
+
+            if self.size == self.capacity and self.capacity < self.max_capacity:
+                self._grow()
+
+            if self.size == self.capacity:
+                # Overwrite the oldest reading; the buffer is now complete only after it
+                self.complete_since = max(self.complete_since, np.nextafter(self.values[0, self.start], np.inf))
+                slot = self.start
+                self.start = (self.start + 1) % self.capacity
+            else:
+                slot = (self.start + self.size) % self.capacity
+                self.size += 1
+
+            self.ids[slot] = metric_id
+            self.anomaly[slot] = prediction == "ANOMALY"
+            self.values[:, slot] = (timestamp, heart_rate, motion_intensity, anomaly_score,
+                                    confidence_normal, confidence_anomaly)
+
+    def latest(self, count: int):
+        """Newest `count` readings, newest first, or None if the buffer holds fewer."""
+        with self.lock:
+            if self.size < count:
+                return None
+            order = self._order()[::-1][:count]
+            return self._rows(order)
+
+    def window(self, start: float | None, end: float | None, limit: int, newest: bool):
+        """
+        Readings with start <= timestamp <= end, oldest first, capped at `limit`
+        (the oldest ones, or the newest ones when `newest`). None if the buffer
+        cannot answer: the range reaches before complete_since.
+        """
+        with self.lock:
+            if start is None:
+                # Only "the last N readings": answerable when N are in memory
+                if self.size < limit:
+                    return None
+            elif start < self.complete_since:
+                return None
+
+            order = self._order()
+            timestamps = self.values[0, order]
+            mask = np.ones(self.size, dtype=bool)
+            if start is not None:
+                mask &= timestamps >= start
+            if end is not None:
+                mask &= timestamps <= end
+            order = order[mask]
+            order = order[-limit:] if newest else order[:limit]
+            return self._rows(order)
+
+    def _rows(self, slots):
+        values = self.values[:, slots].tolist()
+        ids = self.ids[slots].tolist()
+        anomalies = self.anomaly[slots].tolist()
+        return [{
+            "id": ids[i],
+            "heart_rate": values[1][i],
+            "motion_intensity": values[2][i],
+            "prediction": "ANOMALY" if anomalies[i] else "NORMAL",
+            "anomaly_score": values[3][i],
+            "confidence_normal": values[4][i],
+            "confidence_anomaly": values[5][i],
+            "timestamp": datetime.fromtimestamp(values[0][i], timezone.utc).isoformat()
+        } for i in range(len(ids))]
+
+
+class MetricsBuffer:
+    """Ring buffers keyed by user id."""
+
+    def __init__(self, seconds: int = RING_BUFFER_SECONDS, max_rate_hz: float = RING_BUFFER_MAX_RATE_HZ,
+                 stale_seconds: float = RING_BUFFER_STALE_SECONDS):
+        self.enabled = seconds > 0
+        self.seconds = seconds
+        self.max_capacity = max(int(seconds * max_rate_hz), 1)
+        self.stale_seconds = stale_seconds
+        self._buffers = {}
+        self._lock = threading.Lock()
+        self._swept_at = time.monotonic()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def _buffer(self, user_id: int, first_timestamp: float) -> UserRingBuffer:
+        buffer = self._buffers.get(user_id)
+        if buffer is None:
+            with self._lock:
+                buffer = self._buffers.get(user_id)
+                if buffer is None:
+                    # Earlier readings were stored before this process, or by another worker
+                    buffer = self._buffers[user_id] = UserRingBuffer(self.max_capacity, first_timestamp)
+        return buffer
+
+    def append(self, user_id: int, metric_id: int, timestamp: datetime, heart_rate: float,
+               motion_intensity: float, prediction: str, anomaly_score: float,
+               confidence_normal: float, confidence_anomaly: float):
+        if not self.enabled:
+            return
+        t = timestamp.timestamp()
+        self._buffer(user_id, t).append(
+            metric_id, t, heart_rate, motion_intensity,
+            prediction, anomaly_score, confidence_normal, confidence_anomaly, self.stale_seconds
+        )
+        if time.monotonic() - self._swept_at > RING_BUFFER_SWEEP_SECONDS:
+            self._evict_idle()
+
+    def _live(self, user_id: int) -> UserRingBuffer | None:
+        """The user's buffer if it can answer reads (appended to recently)."""
+        buffer = self._buffers.get(user_id)
+        if buffer is None or buffer.is_stale(self.stale_seconds):
+            return None
+        return buffer
+
+    def _evict_idle(self):
+        with self._lock:
+            self._swept_at = time.monotonic()
+            idle = [user_id for user_id, buffer in self._buffers.items() if buffer.is_stale(self.stale_seconds)]
+            for user_id in idle:
+                del self._buffers[user_id]
+            self._evictions += len(idle)
+
+    def remove(self, user_id: int):
+        """Forget a user's buffer (user deleted)."""
+        with self._lock:
+            self._buffers.pop(user_id, None)
+
+    def latest(self, user_id: int, count: int):
+        """Newest readings, newest first, or None to fall back to the database."""
+        buffer = self._live(user_id)
+        return self._count(buffer.latest(count) if buffer is not None else None)
+
+    def history(self, user_id: int, start_dt: datetime | None, end_dt: datetime | None, limit: int):
+        """
+        Same rows the raw history query returns (oldest first), or None to fall
+        back to the database. Without a range, the newest `limit` readings.
+        """
+        buffer = self._live(user_id)
+        if buffer is None or any(dt is not None and dt.tzinfo is None for dt in (start_dt, end_dt)):
+            return self._count(None)
+
+        start = start_dt.timestamp() if start_dt else None
+        end = end_dt.timestamp() if end_dt else None
+        newest = start_dt is None and end_dt is None
+        if start is None and not newest:
+            # Only an end bound: everything before it, which the buffer never fully has
+            return self._count(None)
+        return self._count(buffer.window(start, end, limit, newest))
+
+    def _count(self, rows):
+        if rows is None:
+            self._misses += 1
+        else:
+            self._hits += 1
+        return rows
+
+    def stats(self) -> dict:
+        buffers = list(self._buffers.values())
+        return {
+            "enabled": self.enabled,
+            "users": len(buffers),
+            "readings": sum(b.size for b in buffers),
+            "memory_bytes": sum(b.ids.nbytes + b.anomaly.nbytes + b.values.nbytes for b in buffers),
+            "hits": self._hits,
+            "misses": self._misses,
+            "evictions": self._evictions,
+        }
+
+
+metrics_buffer = MetricsBuffer()
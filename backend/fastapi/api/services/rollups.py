@@ -0,0 +1,156 @@
+"""
+Continuous rollups of the metrics table in 1-minute, 15-minute and hourly buckets.
+
+The ingestion path folds every committed batch into the rollup rows of its
+buckets (min/max/sum of heart rate, motion and confidence_anomaly, plus the
+anomaly count) with one upsert, inside the same transaction as the raw rows.
+History requests for long windows then read these rows instead of raw 1 Hz data.
+
+Buckets follow the wall clock of the stored timestamps, so a rollup bucket
+covers exactly the raw rows a time filter on `Metrics.timestamp` would return.
+"""
+from sqlalchemy import func
+
+from models_db import MetricsRollup
+
+# Resolution label -> bucket width in seconds
+ROLLUP_RESOLUTIONS = {"1m": 60, "15m": 900, "1h": 3600}
+ROLLUP_LABELS = {seconds: label for label, seconds in ROLLUP_RESOLUTIONS.items()}
+
+_KEY_COLUMNS = ("user_id", "resolution", "bucket_start")
+_SERIES = ("heart_rate", "motion_intensity", "confidence_anomaly")
+
+
+def bucket_start(timestamp, resolution: int):
+    """Floor a timestamp to the start of its bucket. Bucket widths divide a day evenly."""
+    seconds = timestamp.hour * 3600 + timestamp.minute * 60 + timestamp.second
+    seconds -= seconds % resolution
+    return timestamp.replace(hour=seconds // 3600, minute=seconds % 3600 // 60, second=seconds % 60, microsecond=0)
+
+
+def aggregate_rows(rows):
+    """
+    Fold metric rows (dicts with user_id, timestamp, heart_rate, motion_intensity,
+    confidence_anomaly and prediction) into one partial rollup per bucket and resolution.
+    """
+    buckets = {}
+
+    for row in rows:
+        anomaly = 1 if row["prediction"] == "ANOMALY" else 0
+
+        for resolution in ROLLUP_RESOLUTIONS.values():
+            key = (row["user_id"], resolution, bucket_start(row["timestamp"], resolution))
+            bucket = buckets.get(key)
+
+            if bucket is None:
+                bucket = buckets[key] = dict(zip(_KEY_COLUMNS, key), sample_count=0, anomaly_count=0)
+                for name in _SERIES:
+                    bucket[f"{name}_min"] = row[name]
+                    bucket[f"{name}_max"] = row[name]
+                    bucket[f"{name}_sum"] = 0.0
+
+            bucket["sample_count"] += 1
+            bucket["anomaly_count"] += anomaly
+            for name in _SERIES:
+                value = row[name]
+                bucket[f"{name}_sum"] += value
+                if value < bucket[f"{name}_min"]:
+                    bucket[f"{name}_min"] = value
+                if value > bucket[f"{name}_max"]:
+                    bucket[f"{name}_max"] = value
+
+    # Sorted so concurrent writers always touch rows in the same order
+    return [buckets[key] for key in sorted(buckets)]
+
+
+def upsert_rollups(db, rollups):
+    """Merge partial rollups into the table: counts and sums add up, min/max combine."""
+    if not rollups:
+        return
+
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+        lower, upper = func.least, func.greatest
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+        lower, upper = func.min, func.max  # SQLite's scalar min()/max() with two arguments
+    else:
+        _merge_rollups(db, rollups)
+        return
+
+    stmt = insert(MetricsRollup)
+    excluded = stmt.excluded
+    updates = {
+        "sample_count": MetricsRollup.sample_count + excluded.sample_count,
+        "anomaly_count": MetricsRollup.anomaly_count + excluded.anomaly_count,
+    }
+    for name in _SERIES:
+        updates[f"{name}_min"] = lower(getattr(MetricsRollup, f"{name}_min"), getattr(excluded, f"{name}_min"))
+        updates[f"{name}_max"] = upper(getattr(MetricsRollup, f"{name}_max"), getattr(excluded, f"{name}_max"))
+        updates[f"{name}_sum"] = getattr(MetricsRollup, f"{name}_sum") + getattr(excluded, f"{name}_sum")
+
+    db.execute(stmt.on_conflict_do_update(index_elements=list(_KEY_COLUMNS), set_=updates), rollups)
+
+
+def _merge_rollups(db, rollups):
+    """Row-by-row fallback for databases without INSERT ... ON CONFLICT."""
+    for rollup in rollups:
+        existing = db.query(MetricsRollup).filter_by(**{key: rollup[key] for key in _KEY_COLUMNS}).first()
+        if existing is None:
+            db.add(MetricsRollup(**rollup))
+            continue
+
+        existing.sample_count += rollup["sample_count"]
+        existing.anomaly_count += rollup["anomaly_count"]
+        for name in _SERIES:
+            setattr(existing, f"{name}_min", min(getattr(existing, f"{name}_min"), rollup[f"{name}_min"]))
+            setattr(existing, f"{name}_max", max(getattr(existing, f"{name}_max"), rollup[f"{name}_max"]))
+            setattr(existing, f"{name}_sum", getattr(existing, f"{name}_sum") + rollup[f"{name}_sum"])
+
+
+def rollup_history(db, user_id: int, resolution: int, start_dt=None, end_dt=None, limit: int = 1000):
+    """
+    Rollup points for a user, oldest first, in the same shape as raw history rows
+    (averages in the usual fields) plus min/max, sample and anomaly counts.
+    """
+    query = db.query(MetricsRollup).filter(
+        MetricsRollup.user_id == user_id,
+        MetricsRollup.resolution == resolution
+    )
+    if start_dt:
+        # Include the bucket that contains start_dt
+        query = query.filter(MetricsRollup.bucket_start >= bucket_start(start_dt, resolution))
+    if end_dt:
+        query = query.filter(MetricsRollup.bucket_start <= end_dt)
+
+    if not start_dt and not end_dt:
+        rollups = query.order_by(MetricsRollup.bucket_start.desc()).limit(limit).all()
+        rollups.reverse()
+    else:
+        rollups = query.order_by(MetricsRollup.bucket_start.asc()).limit(limit).all()
+
+    return [rollup_to_point(r) for r in rollups]
+
+
+def rollup_to_point(r: MetricsRollup) -> dict:
+    confidence_anomaly = r.confidence_anomaly_sum / r.sample_count
+    return {
+        "id": None,
+        "heart_rate": round(r.heart_rate_sum / r.sample_count, 2),
+        "motion_intensity": round(r.motion_intensity_sum / r.sample_count, 2),
+        "prediction": "ANOMALY" if r.anomaly_count else "NORMAL",
+        "anomaly_score": None,
+        "confidence_normal": round(100 - confidence_anomaly, 2),
+        "confidence_anomaly": round(confidence_anomaly, 2),
+        "timestamp": r.bucket_start.isoformat(),
+        "resolution": ROLLUP_LABELS.get(r.resolution),
+        "sample_count": r.sample_count,
+        "anomaly_count": r.anomaly_count,
+        "heart_rate_min": r.heart_rate_min,
+        "heart_rate_max": r.heart_rate_max,
+        "motion_intensity_min": r.motion_intensity_min,
+        "motion_intensity_max": r.motion_intensity_max,
+        "confidence_anomaly_min": r.confidence_anomaly_min,
+        "confidence_anomaly_max": r.confidence_anomaly_max,
+    }
@@ -0,0 +1,129 @@
+"""
+Shadow scoring of a candidate model version on live traffic.
+
+While a shadow version is set, every scored ingestion batch is also handed to
+this module together with the production results. A single background thread
+scores it with the shadow model and counts how often the two disagree. The
+ingestion path only pays for a non-blocking put on a bounded queue: when the
+shadow falls behind, batches are dropped (and counted) rather than delaying
+production.
+
+The shadow sees exactly what production saw, including the per-user baseline
+normalization, so the disagreement rate compares the models and nothing else.
+Counters start over whenever the shadow version changes.
+"""
+import logging
+import os
+import queue
+import threading
+from datetime import datetime, timezone
+
+import numpy as np
+
+from ai_model.model import MAX_HEART_RATE, MIN_HEART_RATE, load_version, predict_batch
+
+logger = logging.getLogger(__name__)
+
+SHADOW_MAX_PENDING = int(os.getenv("SHADOW_MAX_PENDING", "64"))
+
+
+class ShadowScorer:
+    """Scores ingestion batches with a second model version, off the ingestion path."""
+
+    def __init__(self, max_pending: int = SHADOW_MAX_PENDING):
+        self.max_pending = max_pending
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._model = None
+        self._reset()
+
+    def _reset(self):
+        self._started_at = datetime.now(timezone.utc).isoformat()
+        self._batches = 0
+        self._dropped = 0
+        self._compared = 0
+        self._disagreements = 0
+        self._production_anomalies = 0
+        self._shadow_anomalies = 0
+        self._score_delta = 0.0
+
+    @property
+    def version(self) -> str | None:
+        model = self._model
+        return model.version if model is not None else None
+
+    def start(self, version: str) -> dict:
+        """Shadow-score with a version. Raises FileNotFoundError if it cannot be loaded."""
+        model = load_version(version)
+        with self._lock:
+            self._model = model
+            self._reset()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="shadow-scorer", daemon=True)
+                self._thread.start()
+        logger.info(f"Shadow scoring with model version {model.version}")
+        return self.stats()
+
+    def stop(self):
+        with self._lock:
+            self._model = None
+        # Batches already queued are skipped by the worker
+
+    def submit(self, heart_rates, motion_intensities, baseline, production):
+        """Queue a batch scored by production (predict_batch results). Never blocks."""
+        model = self._model
+        if model is None:
+            return
+        try:
+            self._queue.put_nowait((model, heart_rates, motion_intensities, baseline, production["prediction"], production["anomaly_score"]))
+        except queue.Full:
+            with self._lock:
+                self._dropped += 1
+
+    def _run(self):
+        while True:
+            model, heart_rates, motion_intensities, baseline, prediction, anomaly_score = self._queue.get()
+            if model is not self._model:
+                continue
+            try:
+                scored = predict_batch(heart_rates, motion_intensities, baseline, loaded=model)
+            except Exception as e:
+                logger.error(f"Shadow scoring failed: {e}")
+                continue
+
+            # Readings without a valid heart rate are NORMAL for every model; leave them out
+            heart_rates = np.asarray(heart_rates, dtype=float)
+            valid = (heart_rates >= MIN_HEART_RATE) & (heart_rates <= MAX_HEART_RATE)
+            production_anomaly = prediction[valid] == "ANOMALY"
+            shadow_anomaly = scored["prediction"][valid] == "ANOMALY"
+
+            with self._lock:
+                if model is not self._model:
+                    continue
+                self._batches += 1
+                self._compared += int(valid.sum())
+                self._disagreements += int((production_anomaly != shadow_anomaly).sum())
+                self._production_anomalies += int(production_anomaly.sum())
+                self._shadow_anomalies += int(shadow_anomaly.sum())
+                self._score_delta += float(np.abs(scored["anomaly_score"][valid] - anomaly_score[valid]).sum())
+
+    def stats(self) -> dict:
+        with self._lock:
+            compared = self._compared
+            return {
+                "version": self.version,
+                "since": self._started_at if self._model is not None else None,
+                "batches": self._batches,
+                "dropped_batches": self._dropped,
+                "pending_batches": self._queue.qsize(),
+                "compared": compared,
+                "disagreements": self._disagreements,
+                "disagreement_rate": round(self._disagreements / compared, 4) if compared else None,
+                "production_anomaly_rate": round(self._production_anomalies / compared, 4) if compared else None,
+                "shadow_anomaly_rate": round(self._shadow_anomalies / compared, 4) if compared else None,
+                "mean_abs_score_delta": round(self._score_delta / compared, 4) if compared else None,
+            }
+
+
+shadow_scorer = ShadowScorer()
@@ -0,0 +1,168 @@
+"""
+Background model training jobs.
+
+A job trains in a separate process (spawned, so it shares nothing with the
+server and can use every core for the forest), reporting its progress through
+a queue. train_model() writes the new version to its own directory and
+validates it there. Only once that succeeded does the server load the version
+and swap it in (ai_model.model.activate) and point CURRENT at it. Predictions
+keep using the previous model until that single reference swap. Jobs started
+with promote=False only register the version, to be shadow-scored
+(services/shadow.py) and promoted later.
+
+One job runs at a time. Job records are kept in memory (the last
+TRAINING_JOB_HISTORY) and are lost on restart; the trained versions are not.
+"""
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+from ai_model.model import activate, set_current, train_model
+
+logger = logging.getLogger(__name__)
+
+TRAINING_JOB_HISTORY = int(os.getenv("TRAINING_JOB_HISTORY", "20"))
+
+
+def _run_training(params: dict, messages):
+    """Entry point of the training process."""
+    def progress(stage, fraction):
+        messages.put(("progress", stage, fraction))
+
+    try:
+        messages.put(("done", train_model(progress=progress, **params)))
+    except Exception as e:
+        messages.put(("error", f"{type(e).__name__}: {e}"))
+
+
+class TrainingJobs:
+    """Starts training processes and tracks their status."""
+
+    def __init__(self, history: int = TRAINING_JOB_HISTORY):
+        self.history = history
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._process = None
+        self._context = multiprocessing.get_context("spawn")
+
+    def start(self, max_samples: int | None = None, seed: int | None = None, promote: bool = True) -> dict:
+        """
+        Start a training job. Raises RuntimeError if one is already running.
+        With promote=False the trained version is registered but not activated.
+        """
+        params = {}
+        if max_samples is not None:
+            params["max_samples"] = max_samples
+        if seed is not None:
+            params["seed"] = seed
+
+        with self._lock:
+            if any(job["status"] == "running" for job in self._jobs.values()):
+                raise RuntimeError("A training job is already running")
+
+            job_id = uuid.uuid4().hex[:12]
+            job = {
+                "id": job_id,
+                "status": "running",
+                "stage": "starting",
+                "progress": 0.0,
+                "params": params,
+                "promote": promote,
+                "started_at": datetime.now(timezone.utc).isoformat(),
+                "finished_at": None,
+                "version": None,
+                "result": None,
+                "error": None,
+            }
+            self._jobs[job_id] = job
+            while len(self._jobs) > self.history:
+                self._jobs.popitem(last=False)
+
+            messages = self._context.Queue()
+            # Not daemonic: the forest fit starts its own worker processes (stop() ends it on shutdown)
+            process = self._context.Process(target=_run_training, args=(params, messages))
+            process.start()
+            self._process = process
+
+        threading.Thread(target=self._monitor, args=(job_id, process, messages, promote), daemon=True).start()
+        logger.info(f"Training job {job_id} started (pid {process.pid})")
+        return dict(job)
+
+    def _monitor(self, job_id: str, process, messages, promote: bool):
+        while True:
+            try:
+                message = messages.get(timeout=0.5)
+            except queue.Empty:
+                if process.is_alive():
+                    continue
+                # The process may have exited right after its last message
+                try:
+                    message = messages.get(timeout=1)
+                except queue.Empty:
+                    self._finish(job_id, error=f"Training process exited with code {process.exitcode}")
+                    return
+
+            kind = message[0]
+            if kind == "progress":
+                self._update(job_id, stage=message[1], progress=round(message[2], 3))
+            elif kind == "error":
+                process.join()
+                self._finish(job_id, error=message[1])
+                return
+            elif kind == "done":
+                process.join()
+                result = message[1]
+                self._update(job_id, version=result["version"], result=result)
+                if not promote:
+                    self._finish(job_id)
+                    logger.info(f"Training job {job_id} registered model version {result['version']}")
+                    return
+                self._update(job_id, stage="activating")
+                try:
+                    # Load first: CURRENT only ever names a version that loaded
+                    activate(result["version"])
+                    set_current(result["version"])
+                except Exception as e:
+                    self._finish(job_id, error=f"Activation failed: {e}")
+                    return
+                self._finish(job_id)
+                logger.info(f"Training job {job_id} activated model version {result['version']}")
+                return
+
+    def _update(self, job_id: str, **fields):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job.update(fields)
+
+    def _finish(self, job_id: str, error: str | None = None):
+        if error:
+            logger.error(f"Training job {job_id} failed: {error}")
+        fields = {"status": "failed", "error": error} if error else {"status": "succeeded", "stage": "done", "progress": 1.0}
+        self._update(job_id, finished_at=datetime.now(timezone.utc).isoformat(), **fields)
+
+    def get(self, job_id: str) -> dict | None:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def list(self) -> list:
+        """Jobs, newest first."""
+        with self._lock:
+            return [dict(job) for job in reversed(self._jobs.values())]
+
+    def stop(self):
+        """Terminate a running job (server shutdown)."""
+        with self._lock:
+            process = self._process
+        if process is not None and process.is_alive():
+            process.terminate()
+            process.join(timeout=5)
+
+
+training_jobs = TrainingJobs()
@@ -1,13 +1,18 @@
+from collections import OrderedDict
 from datetime import datetime, timedelta, timezone
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
-from passlib.context import CryptContext
-from sqlalchemy.orm import Session
+from sqlalchemy import inspect
+from sqlalchemy.orm import Session, make_transient_to_detached
 from database import get_db
+from services.hashing import hash_password, verify_password  # noqa: F401 (re-exported)
+from services import data_access
 from models_db import User
 from models import UserRole
 import os
+import threading
+import time
 from dotenv import load_dotenv
 from typing import List
 
@@ -17,21 +22,17 @@ SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-here-replace-in-production
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "600"))
 
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
-
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
-
-def hash_password(password: str) -> str:
-    """Hash a plain password securely using bcrypt."""
-    if len(password.encode("utf-8")) > 72:
-        password = password[:72]  
-    return pwd_context.hash(password)
+# Authenticated users are cached per token for a short time, so most requests need
+# neither a JWT decode nor a user query. Changes made through the API drop the user's
+# entries at once (principal_cache.invalidate_user); other worker processes and
+# out-of-band changes (scripts) are picked up within the TTL. 0 disables the cache.
+AUTH_CACHE_TTL_SECONDS = float(os.getenv("AUTH_CACHE_TTL_SECONDS", "30"))
+AUTH_CACHE_MAX_ENTRIES = int(os.getenv("AUTH_CACHE_MAX_ENTRIES", "10000"))
 
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Verify plain password against its hashed version."""
-    return pwd_context.verify(plain_password, hashed_password)
+# hash_password / verify_password (services/hashing.py) hash inline, for scripts;
+# request handlers use the process pool in services.hashing.password_hasher
 
 def create_access_token(data: dict, expires_delta: timedelta | None = None) -> str:
     """Create a JWT access token with expiration and a user identifier (sub)."""
@@ -48,24 +49,165 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None) -> s
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+_USER_COLUMNS = [attr.key for attr in inspect(User).column_attrs]
+
+
+class PrincipalCache:
+    """Size-bounded LRU of token -> user column values, expiring after a TTL (or with the token)."""
+
+    def __init__(self, ttl: float = AUTH_CACHE_TTL_SECONDS, max_entries: int = AUTH_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # token -> (expires_at (monotonic), user_id, columns)
+        self._tokens = {}              # user_id -> tokens cached for that user
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._invalidations = 0
+        self._evictions = 0
+
+    def get(self, token: str) -> dict | None:
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None or entry[0] <= time.monotonic():
+                if entry is not None:
+                    self._remove(token)
+                self._misses += 1
+                return None
+            self._entries.move_to_end(token)
+            self._hits += 1
+            return entry[2]
+
+    def put(self, token: str, user: User, token_expires: float | None = None):
+        if self.ttl <= 0 or self.max_entries <= 0:
+            return
+        expires_at = time.monotonic() + self.ttl
+        if token_expires is not None:
+            # Never outlive the token itself
+            expires_at = min(expires_at, time.monotonic() + token_expires - time.time())
+        columns = {key: getattr(user, key) for key in _USER_COLUMNS}
+
+        with self._lock:
+            self._remove(token)
+            self._entries[token] = (expires_at, user.id, columns)
+            self._tokens.setdefault(user.id, set()).add(token)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self._evictions += 1
+
+    def _remove(self, token: str):
+        entry = self._entries.pop(token, None)
+        if entry is not None:
+            tokens = self._tokens.get(entry[1])
+            tokens.discard(token)
+            if not tokens:
+                del self._tokens[entry[1]]
+
+    def invalidate_user(self, user_id: int):
+        """Drop every cached token of a user (profile updated, role changed, user deleted)."""
+        with self._lock:
+            for token in list(self._tokens.get(user_id, ())):
+                self._remove(token)
+            self._invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tokens.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "ttl_seconds": self.ttl,
+                "max_entries": self.max_entries,
+                "entries": len(self._entries),
+                "users": len(self._tokens),
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / lookups, 4) if lookups else None,
+                "invalidations": self._invalidations,
+                "evictions": self._evictions,
+            }
+
+
+principal_cache = PrincipalCache()
+
+
+def _attach_cached_user(columns: dict, db: Session) -> User:
+    """
+    A User built from cached column values, attached to the session without a query.
+    It behaves like a loaded user: changes are flushed on commit, relationships load lazily.
+    """
+    user = User(**columns)
+    make_transient_to_detached(user)
+    return db.merge(user, load=False)
+
+
 def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    credentials_exception = HTTPException(
+    return get_user_from_token(token, db)
+
+
+async def get_current_principal(token: str = Depends(oauth2_scheme)) -> User:
+    """
+    Async counterpart of get_current_user for read-only async handlers. The user
+    comes from principal_cache or services.data_access and is not attached to a
+    session: columns only, and changes to it are not saved.
+    """
+    if not token:
+        raise _credentials_exception()
+
+    columns = principal_cache.get(token)
+    if columns is not None:
+        return User(**columns)
+
+    user_id, expires = _decode_token(token)
+    user = await data_access.get_user(user_id)
+    if user is None:
+        raise _credentials_exception()
+    principal_cache.put(token, user, expires)
+    return user
+
+
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials or token expired",
         headers={"WWW-Authenticate": "Bearer"}
     )
+
+
+def _decode_token(token: str) -> tuple[int, float | None]:
+    """(user id, expiry timestamp) of a valid JWT; raises 401 otherwise."""
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         user_id = payload.get("sub")
         if user_id is None:
-            raise credentials_exception
+            raise _credentials_exception()
 
     except JWTError:
-        raise credentials_exception
+        raise _credentials_exception()
+
+    return int(user_id), payload.get("exp")
+
+
+def get_user_from_token(token: str, db: Session) -> User:
+    """
+    Resolve a JWT to its user. Shared by get_current_user and token-authenticated WebSockets.
+    Served from principal_cache when possible.
+    """
+    if not token:
+        raise _credentials_exception()
+
+    columns = principal_cache.get(token)
+    if columns is not None:
+        return _attach_cached_user(columns, db)
 
-    user = db.query(User).filter(User.id == int(user_id)).first()
+    user_id, expires = _decode_token(token)
+    user = db.query(User).filter(User.id == user_id).first()
     if user is None:
-        raise credentials_exception
+        raise _credentials_exception()
+    principal_cache.put(token, user, expires)
     return user
 
 
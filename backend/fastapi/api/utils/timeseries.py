@@ -0,0 +1,74 @@
+"""
+Monthly range partitioning helpers for the metrics table (PostgreSQL only).
+
+The table is converted once with scripts/partition_metrics.py. Afterwards the
+app calls ensure_metrics_partitions() at startup so the partitions for the
+coming months always exist before rows arrive for them. Rows that fall outside
+every monthly partition land in metrics_default.
+"""
+import logging
+import os
+from datetime import datetime
+
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+METRICS_PARTITION_MONTHS_AHEAD = int(os.getenv("METRICS_PARTITION_MONTHS_AHEAD", "2"))
+
+
+def month_start(value: datetime) -> datetime:
+    """First instant of the month containing `value` (naive, like the stored timestamps)."""
+    return datetime(value.year, value.month, 1)
+
+
+def add_months(month: datetime, months: int) -> datetime:
+    index = month.year * 12 + month.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: datetime) -> str:
+    return f"metrics_y{month.year:04d}m{month.month:02d}"
+
+
+def is_metrics_partitioned(conn) -> bool:
+    """True when `metrics` is a partitioned PostgreSQL table."""
+    if conn.dialect.name != "postgresql":
+        return False
+    return bool(conn.execute(text(
+        "SELECT EXISTS ("
+        " SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid"
+        " WHERE c.relname = 'metrics' AND pg_table_is_visible(c.oid))"
+    )).scalar())
+
+
+def create_month_partition(conn, month: datetime):
+    """Create the partition holding one calendar month, if it does not exist yet."""
+    start = month_start(month)
+    end = add_months(start, 1)
+    conn.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {partition_name(start)} PARTITION OF metrics "
+        f"FOR VALUES FROM ('{start:%Y-%m-%d %H:%M:%S}') TO ('{end:%Y-%m-%d %H:%M:%S}')"
+    ))
+
+
+def ensure_metrics_partitions(engine, months_ahead: int = METRICS_PARTITION_MONTHS_AHEAD) -> int:
+    """
+    Create monthly partitions from the current month up to `months_ahead` months ahead.
+    Does nothing unless the metrics table is partitioned. Returns the number of months checked.
+    """
+    with engine.begin() as conn:
+        if not is_metrics_partitioned(conn):
+            return 0
+
+        current = month_start(datetime.now())
+        for offset in range(months_ahead + 1):
+            month = add_months(current, offset)
+            try:
+                with conn.begin_nested():
+                    create_month_partition(conn, month)
+            except Exception as e:
+                # Usually means rows for this month already sit in metrics_default
+                logger.error(f"Could not create partition {partition_name(month)}: {e}")
+
+    return months_ahead + 1
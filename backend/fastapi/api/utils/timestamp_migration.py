@@ -0,0 +1,79 @@
+"""
+One-off conversion of SQLite timestamps stored in Philippine wall time to UTC.
+
+TZDateTime columns keep no offset. Before TZDateTime converted values to UTC,
+SQLite stored the sensor readings' +08:00 wall time as is, and it was read back
+as UTC: those metrics (and the rollup buckets derived from them) look 8 hours
+newer than they are. Alert and baseline times were always written in UTC.
+
+convert_legacy_timestamps() runs at startup, before ingestion, and shifts every
+existing metrics.timestamp and metrics_rollups.bucket_start back by the offset
+once. The database is marked as converted with PRAGMA user_version, so later
+starts (and other workers) skip it. PostgreSQL converted aware values to UTC
+on insert already and is left alone.
+"""
+import logging
+from datetime import timedelta
+
+from sqlalchemy import and_, bindparam, or_, select, text, update
+
+from models_db import Metrics, MetricsRollup
+
+logger = logging.getLogger(__name__)
+
+# Offset of the wall time legacy rows were stored in (routers/websocket.py PH_TZ)
+LEGACY_TIMESTAMP_OFFSET = timedelta(hours=8)
+# PRAGMA user_version once the stored timestamps are UTC
+UTC_TIMESTAMPS_VERSION = 1
+CONVERT_CHUNK_ROWS = 10000
+
+
+def _shift_column(conn, table, column) -> int:
+    """Move every value of `column` back by the legacy offset, in ascending order and chunks of ids."""
+    stmt = update(table).where(table.c.id == bindparam("row_id")).values({column.name: bindparam("shifted")})
+    converted = 0
+    last = None
+
+    while True:
+        query = select(table.c.id, column).where(column.is_not(None)).order_by(column, table.c.id)
+        if last is not None:
+            # Shifted values are older than every remaining one, so they are never read twice
+            last_value, last_id = last
+            query = query.where(or_(column > last_value, and_(column == last_value, table.c.id > last_id)))
+        rows = conn.execute(query.limit(CONVERT_CHUNK_ROWS)).all()
+        if not rows:
+            return converted
+
+        conn.execute(stmt, [{"row_id": row_id, "shifted": value - LEGACY_TIMESTAMP_OFFSET} for row_id, value in rows])
+        converted += len(rows)
+        last = (rows[-1][1], rows[-1][0])
+
+
+def convert_legacy_timestamps(engine) -> int:
+    """
+    Convert the timestamps of a SQLite database written before they were stored
+    as UTC. Does nothing on other databases or once done. Returns the rows converted.
+    """
+    if engine.dialect.name != "sqlite":
+        return 0
+
+    with engine.connect() as conn:
+        # Take the write lock before checking, so two workers starting together convert once
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+        try:
+            if conn.execute(text("PRAGMA user_version")).scalar() >= UTC_TIMESTAMPS_VERSION:
+                conn.rollback()
+                return 0
+
+            # Ascending order keeps the rollups' (user_id, resolution, bucket_start) keys unique throughout
+            converted = _shift_column(conn, Metrics.__table__, Metrics.__table__.c.timestamp)
+            converted += _shift_column(conn, MetricsRollup.__table__, MetricsRollup.__table__.c.bucket_start)
+            conn.exec_driver_sql(f"PRAGMA user_version = {UTC_TIMESTAMPS_VERSION}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+    if converted:
+        logger.info(f"Converted {converted} legacy timestamps to UTC")
+    return converted
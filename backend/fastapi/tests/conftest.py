@@ -0,0 +1,41 @@
+"""
+Shared fixtures. The settings below must be in place before the api modules are
+imported: every test session runs against its own throwaway SQLite database.
+"""
+import os
+import tempfile
+
+_DB_DIR = tempfile.mkdtemp(prefix="vitalink-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_DB_DIR, 'test.db')}"
+os.environ["DB_ASYNC"] = "false"
+
+from datetime import datetime, timezone
+
+import pytest
+
+import models_db  # noqa: F401  (registers the tables on Base.metadata)
+from database import Base, SessionLocal, engine
+from models_db import Device, User
+
+
+@pytest.fixture
+def db():
+    """A session on freshly created tables."""
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def student(db):
+    user = User(full_name="Student", username="student", student_id="S-1",
+                email="student@example.com", password="x", role="student")
+    db.add(user)
+    db.commit()
+    db.add(Device(device_id="VL-1", user_id=user.id, paired=True, created_at=datetime.now(timezone.utc)))
+    db.commit()
+    return user
@@ -0,0 +1,56 @@
+from datetime import datetime, timezone
+
+from models_db import Alert
+from services.alert_engine import AlertEngine
+
+
+def _reading(user_id, heart_rate=130.0, motion_intensity=10.0):
+    return {
+        "user_id": user_id,
+        "heart_rate": heart_rate,
+        "motion_intensity": motion_intensity,
+        "prediction": "NORMAL",
+        "anomaly_score": 0.1,
+        "confidence_anomaly": 10.0,
+        "timestamp": datetime.now(timezone.utc),
+    }
+
+
+def test_cooldown_suppresses_repeat_alerts(db, student):
+    engine = AlertEngine(cooldown_minutes=5)
+    first, _ = engine.evaluate(db, [_reading(student.id), _reading(student.id)])
+    second, _ = engine.evaluate(db, [_reading(student.id)])
+
+    assert [a.alert_type for a in first] == ["HIGH_HEART_RATE"]
+    assert second == []
+
+
+def test_restore_undoes_cooldowns_of_a_rolled_back_batch(db, student):
+    engine = AlertEngine(cooldown_minutes=5)
+    engine.evaluate(db, [_reading(student.id, motion_intensity=90.0)])
+    db.commit()
+    activity_alerted_at = engine._last_alert[(student.id, "HIGH_ACTIVITY")]
+    engine._last_alert.pop((student.id, "HIGH_HEART_RATE"))
+
+    alerts, undo = engine.evaluate(db, [_reading(student.id, motion_intensity=90.0)])
+    assert [a.alert_type for a in alerts] == ["HIGH_HEART_RATE"]
+    db.rollback()
+    engine.restore(undo)
+
+    # The rolled back alert can fire again; the committed cooldown is untouched
+    assert (student.id, "HIGH_HEART_RATE") not in engine._last_alert
+    assert engine._last_alert[(student.id, "HIGH_ACTIVITY")] == activity_alerted_at
+    retried, _ = engine.evaluate(db, [_reading(student.id)])
+    assert [a.alert_type for a in retried] == ["HIGH_HEART_RATE"]
+
+
+def test_rehydrate_loads_recent_alerts(db, student):
+    db.add(Alert(user_id=student.id, alert_type="HIGH_HEART_RATE", severity="HIGH", title="t",
+                 message="m", created_at=datetime.now(timezone.utc)))
+    db.commit()
+
+    engine = AlertEngine(cooldown_minutes=5)
+    engine.rehydrate()
+    alerts, _ = engine.evaluate(db, [_reading(student.id)])
+
+    assert alerts == []
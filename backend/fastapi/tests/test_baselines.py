@@ -0,0 +1,32 @@
+from models_db import UserBaseline
+from services.baselines import BaselineStore
+
+
+def test_flush_writes_changed_baselines(db, student):
+    store = BaselineStore()
+    store.update([student.id] * 3, [60.0, 70.0, 80.0], [5.0, 5.0, 5.0])
+
+    assert store.flush() == 1
+    assert store.flush() == 0
+    row = db.query(UserBaseline).filter_by(user_id=student.id).one()
+    assert row.sample_count == 3
+    assert row.heart_rate_mean == 70.0
+
+
+def test_flush_forgets_deleted_users(db, student):
+    store = BaselineStore()
+    store.update([student.id, 999], [70.0, 70.0], [5.0, 5.0])
+
+    assert store.flush() == 1
+    assert [row.user_id for row in db.query(UserBaseline)] == [student.id]
+    assert store.get(999) is None
+    assert store.stats()["pending_writes"] == 0
+
+
+def test_reset_drops_pending_writes(db, student):
+    store = BaselineStore()
+    store.update([student.id], [70.0], [5.0])
+    store.reset(student.id)
+
+    assert store.flush() == 0
+    assert db.query(UserBaseline).count() == 0
@@ -0,0 +1,34 @@
+from datetime import datetime, timezone
+
+from models_db import Device
+from services.device_registry import DeviceRegistry
+
+
+def test_unknown_devices_are_kept_in_a_bounded_lru(db):
+    registry = DeviceRegistry(max_unknown=3)
+    for device_id in ("X1", "X2", "X3"):
+        assert registry.refresh(device_id).user_id is None
+
+    registry.get("X1")  # recently used: survives the next insert
+    registry.refresh("X4")
+
+    assert list(registry._unknown) == ["X3", "X1", "X4"]
+    assert registry.get("X2") is None
+    assert len(registry) == 0
+
+
+def test_registered_device_keeps_the_entry_sockets_are_bound_to(db, student):
+    registry = DeviceRegistry(max_unknown=3)
+    bound = registry.refresh("VL-9")
+
+    device = Device(device_id="VL-9", user_id=student.id, paired=True, created_at=datetime.now(timezone.utc))
+    db.add(device)
+    db.commit()
+    registry.update(device)
+
+    assert bound.user_id == student.id
+    assert registry.get("VL-9") is bound
+    assert "VL-9" not in registry._unknown and len(registry) == 1
+
+    registry.remove("VL-9")
+    assert bound.user_id is None
@@ -0,0 +1,26 @@
+import numpy as np
+
+from utils.downsampling import lttb_indices
+
+
+def test_short_series_is_returned_whole():
+    assert lttb_indices([0, 1, 2], [5, 6, 7], 10).tolist() == [0, 1, 2]
+    assert lttb_indices(range(10), range(10), 2).tolist() == list(range(10))
+
+
+def test_keeps_threshold_points_with_both_ends():
+    x = np.arange(1000)
+    y = np.sin(x / 20)
+    kept = lttb_indices(x, y, 50)
+
+    assert len(kept) == 50
+    assert kept[0] == 0 and kept[-1] == 999
+    assert np.all(np.diff(kept) > 0)
+
+
+def test_keeps_isolated_spike():
+    x = np.arange(500)
+    y = np.full(500, 70.0)
+    y[321] = 180.0
+
+    assert 321 in lttb_indices(x, y, 20)
@@ -0,0 +1,123 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from models_db import Alert, Metrics, MetricsRollup
+from services import ingestion
+from services.alert_engine import AlertEngine
+from services.baselines import BaselineStore
+from services.executors import BoundedExecutor
+from services.ingestion import IngestionPipeline, SensorFrame, persist_batch
+from services.ring_buffer import MetricsBuffer
+
+NORMAL = {"prediction": "NORMAL", "anomaly_score": 0.1, "confidence_normal": 90.0, "confidence_anomaly": 10.0}
+
+
+@pytest.fixture(autouse=True)
+def fresh_state(monkeypatch):
+    """Process-wide state used by the pipeline, replaced for every test."""
+    monkeypatch.setattr(ingestion, "alert_engine", AlertEngine())
+    monkeypatch.setattr(ingestion, "baseline_store", BaselineStore())
+    monkeypatch.setattr(ingestion, "metrics_buffer", MetricsBuffer(seconds=60))
+
+
+def _frame(user_id, heart_rate, motion_intensity=10.0, device_id="VL-1", future=None):
+    return SensorFrame(device_id, user_id, heart_rate, motion_intensity, datetime.now(timezone.utc), future)
+
+
+def test_persist_batch_stores_rows_rollups_alerts_and_baselines(db, student):
+    frames = [_frame(student.id, 70.0), _frame(student.id, 130.0)]
+    responses, events = persist_batch(frames, [NORMAL, NORMAL])
+
+    assert [r["status"] for r in responses] == ["success", "success"]
+    ids = [r["metric_id"] for r in responses]
+    assert ids == sorted(ids)
+    assert [m.heart_rate for m in db.query(Metrics).order_by(Metrics.id)] == [70.0, 130.0]
+
+    rollups = db.query(MetricsRollup).all()
+    assert {r.resolution for r in rollups} == {60, 900, 3600}
+    assert all(r.sample_count == 2 and r.heart_rate_max == 130.0 for r in rollups)
+
+    assert [a.alert_type for a in db.query(Alert)] == ["HIGH_HEART_RATE"]
+    assert [e["type"] for _, e in events] == ["metric", "metric", "alert"]
+    assert ingestion.baseline_store.get(student.id)["sample_count"] == 2
+
+
+def test_failed_batch_rolls_back_everything(db, student, monkeypatch):
+    engine = ingestion.alert_engine
+    earlier = datetime.now(timezone.utc) - timedelta(hours=1)
+    engine._last_alert[(student.id, "HIGH_ACTIVITY")] = earlier
+
+    def fail(alert):
+        raise RuntimeError("serialization failed")
+
+    # Fails after the rows, rollups and alerts were flushed
+    monkeypatch.setattr(ingestion, "alert_to_dict", fail)
+    with pytest.raises(RuntimeError):
+        persist_batch([_frame(student.id, 130.0, motion_intensity=90.0)], [NORMAL])
+
+    db.expire_all()
+    assert db.query(Metrics).count() == 0
+    assert db.query(MetricsRollup).count() == 0
+    assert db.query(Alert).count() == 0
+    # Cooldowns are back to their state before the batch
+    assert (student.id, "HIGH_HEART_RATE") not in engine._last_alert
+    assert engine._last_alert[(student.id, "HIGH_ACTIVITY")] == earlier
+    assert ingestion.baseline_store.get(student.id) is None
+
+
+@pytest.fixture
+def pipeline_env(monkeypatch):
+    """Fresh executors and a stub model, so the pipeline tests exercise batching and storage only."""
+    monkeypatch.setattr(ingestion, "db_executor", BoundedExecutor("test-db", 2, 16))
+    monkeypatch.setattr(ingestion, "inference_executor", BoundedExecutor("test-inference", 1, 16))
+    monkeypatch.setattr(ingestion, "score_frames", lambda frames: [dict(NORMAL) for _ in frames])
+
+
+def _ingest(user_id, readings, **pipeline_options):
+    """Submit (device_id, heart_rate) readings concurrently; results are responses or exceptions."""
+    async def run():
+        pipeline = IngestionPipeline(**pipeline_options)
+        await pipeline.start()
+        try:
+            results = await asyncio.gather(*(
+                pipeline.submit(device_id, user_id, heart_rate, 10.0, datetime.now(timezone.utc))
+                for device_id, heart_rate in readings
+            ), return_exceptions=True)
+        finally:
+            await pipeline.stop()
+        return pipeline, results
+
+    return asyncio.run(run())
+
+
+def test_pipeline_groups_frames_into_batches(db, student, pipeline_env):
+    readings = [("VL-1", 60.0 + i) for i in range(10)]
+    pipeline, responses = _ingest(student.id, readings, batch_size=4, flush_interval_ms=200, shards=1)
+
+    assert pipeline.stats()["batches"] == 3
+    assert pipeline.stats()["frames"] == 10
+    assert all(r["status"] == "success" for r in responses)
+    # One device: committed in the order the frames arrived
+    stored = db.query(Metrics.id, Metrics.heart_rate).order_by(Metrics.id).all()
+    assert [hr for _, hr in stored] == [hr for _, hr in readings]
+    assert [r["metric_id"] for r in responses] == [metric_id for metric_id, _ in stored]
+    assert len(ingestion.metrics_buffer.latest(student.id, 10)) == 10
+
+
+def test_pipeline_fails_only_the_frames_of_a_failed_shard(db, student, pipeline_env, monkeypatch):
+    def persist_or_fail(frames, results):
+        if frames[0].device_id == "VL-4":
+            raise RuntimeError("shard failed")
+        return persist_batch(frames, results)
+
+    monkeypatch.setattr(ingestion, "persist_batch", persist_or_fail)
+    assert ingestion._shard_for("VL-1", 2) != ingestion._shard_for("VL-4", 2)
+
+    readings = [("VL-1", 70.0), ("VL-4", 71.0), ("VL-1", 72.0)]
+    _, results = _ingest(student.id, readings, batch_size=10, flush_interval_ms=200, shards=2)
+
+    assert isinstance(results[1], RuntimeError)
+    assert [r["status"] for r in (results[0], results[2])] == ["success", "success"]
+    assert [hr for (hr,) in db.query(Metrics.heart_rate).order_by(Metrics.id)] == [70.0, 72.0]
@@ -0,0 +1,51 @@
+import time
+
+from models_db import User
+from utils.auth_utils import PrincipalCache
+
+
+def _user(user_id, name="Student"):
+    return User(id=user_id, full_name=name, username=f"user{user_id}", email=f"user{user_id}@example.com",
+                password="x", role="student")
+
+
+def test_get_returns_cached_columns():
+    cache = PrincipalCache(ttl=60, max_entries=10)
+    cache.put("token-a", _user(1, "Ana"))
+
+    assert cache.get("token-a")["full_name"] == "Ana"
+    assert cache.get("token-b") is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_invalidate_user_drops_all_of_their_tokens():
+    cache = PrincipalCache(ttl=60, max_entries=10)
+    cache.put("token-a", _user(1))
+    cache.put("token-b", _user(1))
+    cache.put("token-c", _user(2))
+
+    cache.invalidate_user(1)
+
+    assert cache.get("token-a") is None and cache.get("token-b") is None
+    assert cache.get("token-c") is not None
+    assert cache.stats()["users"] == 1
+
+
+def test_entries_expire_with_the_token():
+    cache = PrincipalCache(ttl=60, max_entries=10)
+    cache.put("token-a", _user(1), token_expires=time.time() - 1)
+
+    assert cache.get("token-a") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = PrincipalCache(ttl=60, max_entries=2)
+    cache.put("token-a", _user(1))
+    cache.put("token-b", _user(2))
+    cache.get("token-a")
+    cache.put("token-c", _user(3))
+
+    assert cache.get("token-b") is None
+    assert cache.get("token-a") is not None and cache.get("token-c") is not None
+    assert cache.stats()["evictions"] == 1
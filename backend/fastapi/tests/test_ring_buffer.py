@@ -0,0 +1,83 @@
+import time
+from datetime import datetime, timedelta, timezone
+
+from services.ring_buffer import RING_BUFFER_SWEEP_SECONDS, MetricsBuffer, UserRingBuffer
+
+
+def _fill(buffer, count, start=1000.0):
+    for i in range(count):
+        buffer.append(i + 1, start + i, 60.0 + i, 10.0, "NORMAL", 0.1, 90.0, 10.0)
+
+
+def test_complete_since_starts_at_creation():
+    buffer = UserRingBuffer(max_capacity=8, complete_since=1000.0)
+    _fill(buffer, 5)
+
+    assert buffer.complete_since == 1000.0
+    assert [r["id"] for r in buffer.window(1000.0, None, 10, newest=False)] == [1, 2, 3, 4, 5]
+    assert buffer.window(999.0, None, 10, newest=False) is None
+
+
+def test_complete_since_moves_past_overwritten_readings():
+    buffer = UserRingBuffer(max_capacity=8, complete_since=1000.0)
+    _fill(buffer, 12)  # readings at 1000..1011; the first four are overwritten
+
+    assert buffer.size == 8
+    assert 1003.0 < buffer.complete_since <= 1004.0
+    assert buffer.window(1003.0, None, 10, newest=False) is None
+    assert [r["id"] for r in buffer.window(1004.0, None, 10, newest=False)] == list(range(5, 13))
+    assert [r["id"] for r in buffer.latest(3)] == [12, 11, 10]
+
+
+def _append(metrics, user_id, metric_id, timestamp):
+    metrics.append(user_id, metric_id, timestamp, 70.0, 10.0, "NORMAL", 0.1, 90.0, 10.0)
+
+
+def test_history_is_answered_from_the_first_buffered_reading_on():
+    metrics = MetricsBuffer(seconds=60)
+    first = datetime(2026, 3, 1, 10, 0, tzinfo=timezone.utc)
+    _append(metrics, 1, 1, first)
+    _append(metrics, 1, 2, first + timedelta(seconds=1))
+
+    assert [r["id"] for r in metrics.history(1, first, None, 10)] == [1, 2]
+    # Earlier readings were stored before this process, or by another worker
+    assert metrics.history(1, first - timedelta(seconds=1), None, 10) is None
+    # Only an end bound: older readings may be in the database only
+    assert metrics.history(1, None, first, 10) is None
+    assert metrics.history(2, None, None, 10) is None
+
+
+def test_stale_buffer_falls_back_and_starts_over(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(time, "monotonic", lambda: clock[0])
+    metrics = MetricsBuffer(seconds=60, stale_seconds=5)
+    first = datetime(2026, 3, 1, 10, 0, tzinfo=timezone.utc)
+    _append(metrics, 1, 1, first)
+    assert metrics.latest(1, 1) is not None
+
+    # The device moved to another worker: this one must not keep serving its old readings
+    clock[0] += 30
+    assert metrics.latest(1, 1) is None
+    assert metrics.history(1, first, None, 10) is None
+
+    _append(metrics, 1, 9, first + timedelta(seconds=30))
+    assert [r["id"] for r in metrics.latest(1, 1)] == [9]
+    assert metrics.latest(1, 2) is None
+    assert metrics.history(1, first, None, 10) is None
+
+
+def test_idle_and_removed_buffers_are_dropped(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(time, "monotonic", lambda: clock[0])
+    metrics = MetricsBuffer(seconds=60, stale_seconds=5)
+    now = datetime(2026, 3, 1, 10, 0, tzinfo=timezone.utc)
+    _append(metrics, 1, 1, now)
+    _append(metrics, 2, 2, now)
+    _append(metrics, 3, 3, now)
+
+    metrics.remove(3)
+    clock[0] += RING_BUFFER_SWEEP_SECONDS + 1
+    _append(metrics, 2, 4, now + timedelta(seconds=61))
+
+    assert metrics.stats()["users"] == 1
+    assert metrics.stats()["evictions"] == 1
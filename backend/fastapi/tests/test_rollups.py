@@ -0,0 +1,53 @@
+from datetime import datetime, timezone
+
+from models_db import MetricsRollup
+from services.rollups import aggregate_rows, bucket_start, rollup_history, upsert_rollups
+
+
+def _row(user_id, timestamp, heart_rate, prediction="NORMAL"):
+    return {
+        "user_id": user_id,
+        "timestamp": timestamp,
+        "heart_rate": heart_rate,
+        "motion_intensity": 10.0,
+        "confidence_anomaly": 20.0,
+        "prediction": prediction,
+    }
+
+
+def test_bucket_start_floors_to_the_resolution():
+    t = datetime(2026, 3, 1, 10, 47, 31, 500, tzinfo=timezone.utc)
+    assert bucket_start(t, 60) == datetime(2026, 3, 1, 10, 47, tzinfo=timezone.utc)
+    assert bucket_start(t, 900) == datetime(2026, 3, 1, 10, 45, tzinfo=timezone.utc)
+    assert bucket_start(t, 3600) == datetime(2026, 3, 1, 10, 0, tzinfo=timezone.utc)
+
+
+def test_aggregate_rows_folds_each_bucket():
+    t = datetime(2026, 3, 1, 10, 0, 5, tzinfo=timezone.utc)
+    rollups = aggregate_rows([_row(1, t, 60.0), _row(1, t.replace(second=50), 90.0, "ANOMALY")])
+    minute = next(r for r in rollups if r["resolution"] == 60)
+
+    assert len(rollups) == 3
+    assert minute["sample_count"] == 2
+    assert minute["anomaly_count"] == 1
+    assert (minute["heart_rate_min"], minute["heart_rate_max"], minute["heart_rate_sum"]) == (60.0, 90.0, 150.0)
+
+
+def test_upserts_merge_into_existing_buckets(db, student):
+    t = datetime(2026, 3, 1, 10, 0, 5, tzinfo=timezone.utc)
+    upsert_rollups(db, aggregate_rows([_row(student.id, t, 70.0)]))
+    db.commit()
+    upsert_rollups(db, aggregate_rows([_row(student.id, t.replace(second=30), 50.0, "ANOMALY"),
+                                      _row(student.id, t.replace(second=40), 100.0)]))
+    db.commit()
+
+    hourly = db.query(MetricsRollup).filter_by(user_id=student.id, resolution=3600).one()
+    assert db.query(MetricsRollup).count() == 3
+    assert hourly.sample_count == 3
+    assert hourly.anomaly_count == 1
+    assert (hourly.heart_rate_min, hourly.heart_rate_max, hourly.heart_rate_sum) == (50.0, 100.0, 220.0)
+
+    point, = rollup_history(db, student.id, 60, start_dt=t, end_dt=t.replace(minute=5))
+    assert point["heart_rate"] == round(220.0 / 3, 2)
+    assert point["prediction"] == "ANOMALY"
+    assert point["resolution"] == "1m"
@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+
+from ai_model.sampling import StratifiedSampler, stratum_keys
+
+
+def _readings(n, user_id, hour, motion, start=0):
+    return pd.DataFrame({
+        "heart_rate": np.arange(start, start + n, dtype=float),
+        "motion_intensity": np.full(n, motion, dtype=float),
+        "user_id": np.full(n, user_id),
+        "hour": np.full(n, hour),
+    })
+
+
+def _sample(chunks, max_samples, seed=42):
+    sampler = StratifiedSampler(max_samples, seed=seed)
+    for chunk in chunks:
+        sampler.add(chunk)
+    return sampler
+
+
+def test_strata_split_by_user_hour_and_activity():
+    keys = stratum_keys(pd.DataFrame({
+        "motion_intensity": [5, 25, 45, 5, 5],
+        "user_id": [1, 1, 1, 2, 1],
+        "hour": [8, 8, 8, 8, 9],
+    }))
+    assert len(set(keys.tolist())) == 5
+
+
+def test_everything_is_kept_below_the_bound():
+    sampler = _sample([_readings(30, 1, 8, 5), _readings(20, 2, 8, 5)], 100)
+    assert len(sampler.sample()) == 50
+    assert sampler.rows_seen == 50
+
+
+def test_small_strata_are_kept_whole_and_large_ones_share_the_rest():
+    # One busy device must not crowd out a quiet one
+    chunks = [_readings(5000, 1, 8, 5, start=0), _readings(10, 2, 8, 5, start=10000)]
+    sample = _sample(chunks, 200).sample()
+
+    counts = sample["user_id"].value_counts()
+    assert len(sample) <= 200
+    assert counts[2] == 10
+    assert counts[1] == 190
+
+
+def test_bound_holds_across_chunks():
+    chunks = [_readings(1000, user_id, 8, 5, start=i * 1000)
+              for i, user_id in enumerate([1, 2, 3, 1, 2, 3])]
+    sampler = _sample(chunks, 300)
+    sample = sampler.sample()
+
+    assert len(sample) <= 300
+    assert sampler.strata == 3
+    assert sample["heart_rate"].is_unique
+    assert not {"_priority", "_stratum"} & set(sample.columns)
+
+
+def test_sample_is_uniform_within_a_stratum():
+    # Rows of the first chunk must not be favoured over later ones
+    chunks = [_readings(1000, 1, 8, 5, start=i * 1000) for i in range(10)]
+    sample = _sample(chunks, 1000).sample()
+
+    per_chunk = (sample["heart_rate"] // 1000).value_counts()
+    assert len(sample) == 1000
+    assert per_chunk.min() > 60 and per_chunk.max() < 140
+
+
+def test_seed_makes_the_sample_reproducible():
+    chunks = [_readings(500, 1, 8, 5), _readings(500, 2, 9, 30, start=500)]
+    first = _sample(chunks, 100, seed=7).sample()
+    second = _sample(chunks, 100, seed=7).sample()
+    pd.testing.assert_frame_equal(first, second)
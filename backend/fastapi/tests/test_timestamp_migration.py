@@ -0,0 +1,52 @@
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import text
+
+from database import engine
+from models_db import Metrics, MetricsRollup
+from utils import timestamp_migration
+from utils.timestamp_migration import convert_legacy_timestamps
+
+
+def _insert_legacy_rows(user_id):
+    """Rows as SQLite stored them before TZDateTime converted to UTC: +08:00 wall time, no offset."""
+    with engine.begin() as conn:
+        conn.execute(text("PRAGMA user_version = 0"))
+        for i in range(9):
+            conn.execute(text(
+                "INSERT INTO metrics (user_id, heart_rate, motion_intensity, prediction, anomaly_score,"
+                " confidence_normal, confidence_anomaly, timestamp)"
+                " VALUES (:user_id, 70, 5, 'NORMAL', 0.1, 90, 10, :timestamp)"
+            ), {"user_id": user_id, "timestamp": f"2026-03-01 18:{i // 3 * 10:02d}:00.250000"})
+        for hour in range(12):
+            conn.execute(text(
+                "INSERT INTO metrics_rollups (user_id, resolution, bucket_start, sample_count, anomaly_count,"
+                " heart_rate_min, heart_rate_max, heart_rate_sum, motion_intensity_min, motion_intensity_max,"
+                " motion_intensity_sum, confidence_anomaly_min, confidence_anomaly_max, confidence_anomaly_sum)"
+                " VALUES (:user_id, 3600, :bucket_start, 1, 0, 70, 70, 70, 5, 5, 5, 10, 10, 10)"
+            ), {"user_id": user_id, "bucket_start": f"2026-03-01 {hour:02d}:00:00.000000"})
+
+
+def test_legacy_rows_are_shifted_to_utc_once(db, student, monkeypatch):
+    monkeypatch.setattr(timestamp_migration, "CONVERT_CHUNK_ROWS", 4)
+    _insert_legacy_rows(student.id)
+
+    assert convert_legacy_timestamps(engine) == 21
+    assert convert_legacy_timestamps(engine) == 0
+
+    timestamps = [m.timestamp for m in db.query(Metrics).order_by(Metrics.id)]
+    assert timestamps[0] == datetime(2026, 3, 1, 10, 0, 0, 250000, tzinfo=timezone.utc)
+    assert timestamps[-1] == datetime(2026, 3, 1, 10, 20, 0, 250000, tzinfo=timezone.utc)
+
+    buckets = sorted(r.bucket_start for r in db.query(MetricsRollup))
+    first = datetime(2026, 2, 28, 16, tzinfo=timezone.utc)
+    assert buckets == [first + timedelta(hours=h) for h in range(12)]
+
+
+def test_new_database_is_marked_without_changes(db):
+    with engine.begin() as conn:
+        conn.execute(text("PRAGMA user_version = 0"))
+
+    assert convert_legacy_timestamps(engine) == 0
+    with engine.connect() as conn:
+        assert conn.execute(text("PRAGMA user_version")).scalar() == timestamp_migration.UTC_TIMESTAMPS_VERSION
@@ -13,7 +13,11 @@ import { Search, ChevronsUpDown, Check, Loader2 } from "lucide-react"
 import { Input } from "@/components/ui/input"
 import { cn } from "@/lib/utils"
 import { useRoleProtection } from "@/hooks/use-role-protection"
-import { UserRole, authApi, tokenManager, UserProfile, metricsApi } from "@/lib/api"
+import { useLiveStream } from "@/hooks/use-live-stream"
+import { UserRole, authApi, tokenManager, UserProfile, metricsApi, type MetricData, type FleetStudent } from "@/lib/api"
+
+// Device status and unread alerts of every student, shown in the selector (one request for all)
+const FLEET_REFRESH_MS = 10000
 
 const AdminPage = () => {
 	// Protect this route - only allow ADMIN and SUPER_ADMIN
@@ -56,65 +60,109 @@ const AdminPage = () => {
 		fetchStudents()
 	}, [])
 
-	// Fetch metrics for selected student
-	useEffect(() => {
-		if (!selectedStudent) {
-			// Reset metrics when no student is selected
-			setHeartRate(0)
-			setActivityLevel(0)
-			setStressLevel(0)
-			setPrediction("NORMAL")
-			setAnomalyScore(0)
-			setIsStale(false)
-			return
-		}
+	// Fleet snapshot keyed by student id
+	const [fleet, setFleet] = useState<Record<number, FleetStudent>>({})
 
-		const fetchMetrics = async () => {
+	useEffect(() => {
+		const fetchFleet = async () => {
 			const token = tokenManager.getToken()
 			if (!token) return
 
 			try {
-				const studentId = parseInt(selectedStudent)
-				const metrics = await metricsApi.getStudentLatestMetrics(token, studentId)
-				if (metrics && metrics.length > 0) {
-					const latest = metrics[0]
+				const snapshot: Record<number, FleetStudent> = {}
+				let afterId: number | undefined = undefined
+				do {
+					const page = await metricsApi.getFleetSnapshot(token, undefined, afterId)
+					page.students.forEach((s) => { snapshot[s.id] = s })
+					afterId = page.next_after_id ?? undefined
+				} while (afterId !== undefined)
+				setFleet(snapshot)
+			} catch (error) {
+				console.error('Error fetching fleet snapshot:', error)
+			}
+		}
 
-					// Check if data is stale (older than 5 seconds)
-					const metricTimestamp = new Date(latest.timestamp).getTime()
-					const now = Date.now()
-					const ageInSeconds = (now - metricTimestamp) / 1000
-					const dataIsStale = ageInSeconds > 5
+		fetchFleet()
+		const interval = setInterval(fetchFleet, FLEET_REFRESH_MS)
 
-					setHeartRate(Math.round(latest.heart_rate))
-					setActivityLevel(Math.round(latest.motion_intensity))
-					// Use AI-detected anomaly confidence as stress level (0-100 range)
-					setStressLevel(Math.round(latest.confidence_anomaly))
-					setPrediction(latest.prediction)
-					setAnomalyScore(latest.anomaly_score)
-					setIsStale(dataIsStale)
-				} else {
-					// No data available for this student
-					setHeartRate(0)
-					setActivityLevel(0)
-					setStressLevel(0)
-					setPrediction("NORMAL")
-					setAnomalyScore(0)
-					setIsStale(true)
-				}
-			} catch (error) {
-				console.error('Error fetching student metrics:', error)
-				setIsStale(true)
+		return () => clearInterval(interval)
+	}, [])
+
+	// Time of the selected student's newest reading; undefined until the first fetch finishes
+	const [lastMetricAt, setLastMetricAt] = useState<number | null | undefined>(undefined)
+	const studentId = selectedStudent ? parseInt(selectedStudent) : undefined
+
+	const resetMetrics = () => {
+		setHeartRate(0)
+		setActivityLevel(0)
+		setStressLevel(0)
+		setPrediction("NORMAL")
+		setAnomalyScore(0)
+	}
+
+	const applyMetric = (latest: MetricData) => {
+		setHeartRate(Math.round(latest.heart_rate))
+		setActivityLevel(Math.round(latest.motion_intensity))
+		// Use AI-detected anomaly confidence as stress level (0-100 range)
+		setStressLevel(Math.round(latest.confidence_anomaly))
+		setPrediction(latest.prediction)
+		setAnomalyScore(latest.anomaly_score ?? 0)
+		setLastMetricAt(new Date(latest.timestamp).getTime())
+	}
+
+	// Fetch latest metric for selected student (on selection and whenever the live stream resyncs)
+	const fetchMetrics = async (id: number) => {
+		const token = tokenManager.getToken()
+		if (!token) return
+
+		try {
+			const metrics = await metricsApi.getStudentLatestMetrics(token, id)
+			if (metrics && metrics.length > 0) {
+				applyMetric(metrics[0])
+			} else {
+				// No data available for this student
+				resetMetrics()
+				setLastMetricAt(null)
 			}
+		} catch (error) {
+			console.error('Error fetching student metrics:', error)
+			setLastMetricAt(null)
+		}
+	}
+
+	useEffect(() => {
+		// Reset metrics when the selection changes
+		resetMetrics()
+		setIsStale(false)
+		setLastMetricAt(undefined)
+
+		if (studentId) {
+			fetchMetrics(studentId)
+		}
+	}, [studentId])
+
+	// New readings of the selected student are pushed by the backend as soon as they are stored
+	useLiveStream((event) => {
+		if (!studentId) return
+		if (event.type === "metric" && event.user_id === studentId) {
+			applyMetric(event.data)
+		} else if (event.type === "subscribed" || event.type === "resync") {
+			fetchMetrics(studentId)
 		}
+	}, studentId, !!studentId)
 
-		// Fetch immediately
-		fetchMetrics()
+	// Check every second whether data is stale (older than 5 seconds) - local only, no request
+	useEffect(() => {
+		if (lastMetricAt === undefined) return
 
-		// Then fetch every 1 second for real-time updates
-		const interval = setInterval(fetchMetrics, 1000)
+		const checkStale = () => {
+			setIsStale(lastMetricAt === null || (Date.now() - lastMetricAt) / 1000 > 5)
+		}
+		checkStale()
+		const interval = setInterval(checkStale, 1000)
 
 		return () => clearInterval(interval)
-	}, [selectedStudent])
+	}, [lastMetricAt])
 
 	const filteredStudents = students.filter(
 		(student) =>
@@ -251,6 +299,22 @@ const AdminPage = () => {
 														ID: {student.student_id}
 													</span>
 												</div>
+												{fleet[student.id] && (
+													<div className="flex items-center gap-2 flex-shrink-0">
+														{fleet[student.id].unread_alerts > 0 && (
+															<span className="rounded-full bg-destructive px-2 text-xs text-white">
+																{fleet[student.id].unread_alerts}
+															</span>
+														)}
+														<span
+															title={fleet[student.id].device_status === 'no_device' ? 'No device' : fleet[student.id].device_status === 'online' ? 'Online' : 'Offline'}
+															className={cn(
+																"h-2 w-2 rounded-full",
+																fleet[student.id].device_status === 'online' ? 'bg-green-500' : fleet[student.id].device_status === 'offline' ? 'bg-red-500' : 'bg-muted-foreground/40'
+															)}
+														/>
+													</div>
+												)}
 											</Button>
 										))
 									) : (
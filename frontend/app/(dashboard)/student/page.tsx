@@ -7,7 +7,8 @@ import AlertCards from "@/components/AlertCards"
 import UserProfileCard from "@/components/UserProfileCard"
 import { Card, CardHeader, CardTitle, CardDescription } from "@/components/ui/card"
 import { useRoleProtection } from "@/hooks/use-role-protection"
-import { UserRole, metricsApi, tokenManager } from "@/lib/api"
+import { useLiveStream } from "@/hooks/use-live-stream"
+import { UserRole, metricsApi, tokenManager, type MetricData } from "@/lib/api"
 
 const page = () => {
   // Protect this route - only allow STUDENT role
@@ -21,47 +22,62 @@ const page = () => {
   const [anomalyScore, setAnomalyScore] = useState<number>(0)
   const [isStale, setIsStale] = useState<boolean>(false)
 
-  // Fetch metrics from backend
-  useEffect(() => {
-    const fetchMetrics = async () => {
-      const token = tokenManager.getToken()
-      if (!token) return
-
-      try {
-        const metrics = await metricsApi.getLatestMetrics(token)
-        if (metrics && metrics.length > 0) {
-          const latest = metrics[0] // Get the most recent metric
-
-          // Check if data is stale (older than 5 seconds)
-          const metricTimestamp = new Date(latest.timestamp).getTime()
-          const now = Date.now()
-          const ageInSeconds = (now - metricTimestamp) / 1000
-          const dataIsStale = ageInSeconds > 5
-
-          setHeartRate(Math.round(latest.heart_rate))
-          setActivityLevel(Math.round(latest.motion_intensity))
-          setStressLevel(Math.round(latest.confidence_anomaly))
-          setPrediction(latest.prediction)
-          setAnomalyScore(latest.anomaly_score)
-          setIsStale(dataIsStale)
-        } else {
-          // No data at all
-          setIsStale(true)
-        }
-      } catch (error) {
-        console.error('Error fetching metrics:', error)
-        setIsStale(true)
+  // Time of the newest reading; undefined until the first fetch finishes
+  const [lastMetricAt, setLastMetricAt] = useState<number | null | undefined>(undefined)
+
+  const applyMetric = (latest: MetricData) => {
+    setHeartRate(Math.round(latest.heart_rate))
+    setActivityLevel(Math.round(latest.motion_intensity))
+    setStressLevel(Math.round(latest.confidence_anomaly))
+    setPrediction(latest.prediction)
+    setAnomalyScore(latest.anomaly_score ?? 0)
+    setLastMetricAt(new Date(latest.timestamp).getTime())
+  }
+
+  // Fetch the latest metric from backend (on load and whenever the live stream resyncs)
+  const fetchMetrics = async () => {
+    const token = tokenManager.getToken()
+    if (!token) return
+
+    try {
+      const metrics = await metricsApi.getLatestMetrics(token)
+      if (metrics && metrics.length > 0) {
+        applyMetric(metrics[0]) // Get the most recent metric
+      } else {
+        // No data at all
+        setLastMetricAt(null)
       }
+    } catch (error) {
+      console.error('Error fetching metrics:', error)
+      setLastMetricAt(null)
     }
+  }
 
-    // Fetch immediately
+  useEffect(() => {
     fetchMetrics()
+  }, [])
 
-    // Then fetch every 1 second for real-time updates
-    const interval = setInterval(fetchMetrics, 1000)
+  // New readings are pushed by the backend as soon as they are stored
+  useLiveStream((event) => {
+    if (event.type === "metric") {
+      applyMetric(event.data)
+    } else if (event.type === "subscribed" || event.type === "resync") {
+      fetchMetrics()
+    }
+  })
+
+  // Check every second whether data is stale (older than 5 seconds) - local only, no request
+  useEffect(() => {
+    if (lastMetricAt === undefined) return
+
+    const checkStale = () => {
+      setIsStale(lastMetricAt === null || (Date.now() - lastMetricAt) / 1000 > 5)
+    }
+    checkStale()
+    const interval = setInterval(checkStale, 1000)
 
     return () => clearInterval(interval)
-  }, [])
+  }, [lastMetricAt])
 
   return (
     <div className="min-h-[calc(100vh-4rem)] lg:h-[calc(100vh-4rem)] pb-4 flex flex-col gap-4 overflow-y-auto lg:overflow-hidden">
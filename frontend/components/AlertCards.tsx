@@ -9,7 +9,8 @@ import { Button } from "./ui/button"
 import { ScrollArea } from "./ui/scroll-area"
 import { Select, SelectContent, SelectItem, SelectTrigger, SelectValue } from "./ui/select"
 import { cn } from "@/lib/utils"
-import { tokenManager } from "@/lib/api"
+import { tokenManager, type AlertData } from "@/lib/api"
+import { useLiveStream } from "@/hooks/use-live-stream"
 import {
   Empty,
   EmptyContent,
@@ -28,73 +29,64 @@ interface Student {
   avatar: string
 }
 
-interface Alert {
-  id: number
-  alert_type: string
-  severity: string
-  title: string
-  message: string
-  heart_rate?: number
-  motion_intensity?: number
-  stress_level?: number
-  anomaly_score?: number
-  is_read: boolean
-  created_at: string
-}
+type Alert = AlertData
 
 interface AlertCardsProps {
   student?: Student
   studentId?: number
-  isStale?: boolean
+  isStale?: boolean // No longer used: alerts are pushed, so there is nothing to pause while offline
 }
 
-const AlertCards = ({ student, studentId, isStale = false }: AlertCardsProps) => {
+const AlertCards = ({ student, studentId }: AlertCardsProps) => {
   const [alerts, setAlerts] = useState<Alert[]>([])
   const [loading, setLoading] = useState(true)
   const [readFilter, setReadFilter] = useState<"unread" | "all">("unread")
   const [typeFilter, setTypeFilter] = useState<"all" | "HIGH_HEART_RATE" | "HIGH_ACTIVITY" | "AI_ANOMALY">("all")
   const isAdmin = !!studentId // If studentId is provided, this is admin view
 
-  useEffect(() => {
-    // Don't fetch alerts if device is offline (stale data)
-    if (isStale) {
-      return
-    }
+  const fetchAlerts = async () => {
+    try {
+      const token = tokenManager.getToken()
+      if (!token) return
 
-    const fetchAlerts = async () => {
-      try {
-        const token = tokenManager.getToken()
-        if (!token) return
+      let url = `${API_BASE_URL}/metrics/alerts`
+      if (studentId) {
+        url = `${API_BASE_URL}/metrics/student/${studentId}/alerts`
+      }
 
-        let url = `${API_BASE_URL}/metrics/alerts`
-        if (studentId) {
-          url = `${API_BASE_URL}/metrics/student/${studentId}/alerts`
+      const response = await fetch(url, {
+        headers: {
+          "Authorization": `Bearer ${token}`
         }
+      })
 
-        const response = await fetch(url, {
-          headers: {
-            "Authorization": `Bearer ${token}`
-          }
-        })
-
-        if (response.ok) {
-          const data = await response.json()
-          setAlerts(data)
-        } else {
-          console.error("Failed to fetch alerts:", response.status, response.statusText)
-        }
-      } catch (error) {
-        console.error("Error fetching alerts:", error)
-      } finally {
-        setLoading(false)
+      if (response.ok) {
+        const data = await response.json()
+        setAlerts(data)
+      } else {
+        console.error("Failed to fetch alerts:", response.status, response.statusText)
       }
+    } catch (error) {
+      console.error("Error fetching alerts:", error)
+    } finally {
+      setLoading(false)
     }
+  }
 
+  useEffect(() => {
     fetchAlerts()
-    // Poll for new alerts every 1 second (only when device is online)
-    const interval = setInterval(fetchAlerts, 1000)
-    return () => clearInterval(interval)
-  }, [studentId, isStale])
+  }, [studentId])
+
+  // New alerts are pushed by the backend as soon as they are created (no polling)
+  useLiveStream((event) => {
+    if (event.type === "alert") {
+      setAlerts(prev => prev.some(a => a.id === event.data.id)
+        ? prev
+        : [event.data, ...prev].slice(0, 50)) // Same cap as the alerts endpoint
+    } else if (event.type === "subscribed" || event.type === "resync") {
+      fetchAlerts()
+    }
+  }, studentId)
 
   const markAsRead = async (alertId: number) => {
     try {
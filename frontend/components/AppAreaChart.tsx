@@ -25,7 +25,8 @@ import {
   SelectTrigger,
   SelectValue,
 } from "@/components/ui/select"
-import { metricsApi, tokenManager } from "@/lib/api"
+import { metricsApi, tokenManager, type HistoryResolution, type MetricData } from "@/lib/api"
+import { useLiveStream } from "@/hooks/use-live-stream"
 import { ChartFilters } from "@/components/ChartFilters"
 
 export const description = "An interactive area chart"
@@ -58,6 +59,18 @@ interface AppAreaChartProps {
   isStale?: boolean
 }
 
+// Window shown in live mode
+const LIVE_WINDOW_MS = 60 * 1000
+
+// Transform backend data to chart format
+const toChartPoint = (m: MetricData) => ({
+  date: m.timestamp,
+  HeartRate: Math.round(m.heart_rate),
+  ActivityLevel: Math.round(m.motion_intensity),
+  // Use AI-detected anomaly confidence as stress level (0-100 range)
+  StressLevel: Math.round(m.confidence_anomaly)
+})
+
 export function AppAreaChart({
   student,
   studentId,  // Admin mode: fetch data for specific student
@@ -72,6 +85,8 @@ export function AppAreaChart({
   // Internal state for filters
   const [selectedMetric, setSelectedMetric] = React.useState<"All" | "HeartRate" | "ActivityLevel" | "StressLevel">("All")
   const [timeRange, setTimeRange] = React.useState("live")
+  // Bumped when the live stream asks for a resync
+  const [resyncCount, setResyncCount] = React.useState(0)
 
   // Track time range changes and mark as pending until new data arrives
   React.useEffect(() => {
@@ -129,7 +144,7 @@ export function AppAreaChart({
           // For all other modes, use time-based filtering
           switch(timeRange) {
             case "live":
-              startTime = new Date(now.getTime() - 60 * 1000) // Last 60 seconds when live
+              startTime = new Date(now.getTime() - LIVE_WINDOW_MS) // Last 60 seconds when live
               break
             case "1h":
               startTime = new Date(now.getTime() - 60 * 60 * 1000) // Last 1 hour
@@ -150,6 +165,11 @@ export function AppAreaChart({
               startTime = new Date(now.getTime() - 7 * 24 * 60 * 60 * 1000)
           }
 
+          // Longer ranges read server-side rollups instead of raw per-second rows:
+          // per-minute buckets for 1h, hourly buckets for everything from 24h up
+          const resolution: HistoryResolution =
+            timeRange === "live" ? "raw" : timeRange === "1h" ? "1m" : "1h"
+
           // Fetch metrics - use student-specific endpoint if studentId is provided (admin mode)
           metrics = studentId
             ? await metricsApi.getStudentMetricsHistory(
@@ -157,24 +177,20 @@ export function AppAreaChart({
                 studentId,
                 startTime.toISOString(),
                 now.toISOString(),
-                10000
+                10000,
+                resolution
               )
             : await metricsApi.getMetricsHistory(
                 token,
                 startTime.toISOString(),
                 now.toISOString(),
-                10000
+                10000,
+                resolution
               )
         }
 
         // Transform backend data to chart format
-        let transformedData = metrics.map(m => ({
-          date: m.timestamp,
-          HeartRate: Math.round(m.heart_rate),
-          ActivityLevel: Math.round(m.motion_intensity),
-          // Use AI-detected anomaly confidence as stress level (0-100 range)
-          StressLevel: Math.round(m.confidence_anomaly)
-        }))
+        let transformedData = metrics.map(toChartPoint)
 
         // For stale live mode: Show only the most recent continuous session
         // This handles cases where device went online/offline multiple times
@@ -216,13 +232,27 @@ export function AppAreaChart({
 
     // Always fetch data on mount or when dependencies change
     fetchData()
+  }, [timeRange, studentId, isStale, resyncCount])
 
-    // Auto-refresh for live mode (only if device is online)
-    if (timeRange === "live" && !isStale) {
-      const interval = setInterval(() => fetchData(true), 1000) // Refresh every second for live data
-      return () => clearInterval(interval)
+  // Live mode: append readings pushed by the backend instead of refetching every second
+  useLiveStream((event) => {
+    if (timeRange !== "live" || isStale) return
+
+    if (event.type === "metric") {
+      const point = toChartPoint(event.data)
+      const pointTime = new Date(point.date).getTime()
+      const cutoff = pointTime - LIVE_WINDOW_MS
+
+      setChartData(prev => {
+        const last = prev[prev.length - 1]
+        if (last && new Date(last.date).getTime() >= pointTime) return prev // Already fetched
+        return [...prev.filter(p => new Date(p.date).getTime() >= cutoff), point]
+      })
+    } else if (event.type === "resync") {
+      // Events were dropped; refetch the live window
+      setResyncCount(count => count + 1)
     }
-  }, [timeRange, studentId, isStale])
+  }, studentId)
 
   // Aggregate data based on time range
   // Process raw per-second data from database according to filter requirements
@@ -240,8 +270,8 @@ export function AppAreaChart({
         return chartData
       
       case "1h": {
-        // Average per minute - group 60 per-second readings into 1-minute averages
-        // Takes all per-second data from last hour and calculates average per minute
+        // Average per minute - the server already returns 1-minute rollup buckets,
+        // so each group normally holds a single point
         const grouped = new Map<string, typeof chartData>()
         chartData.forEach(item => {
           const date = new Date(item.date)
@@ -264,8 +294,8 @@ export function AppAreaChart({
       }
       
       case "24h": {
-        // Average per hour - group 3600 per-second readings into 1-hour averages
-        // Takes all per-second data from last 24 hours and calculates average per hour
+        // Average per hour - the server already returns hourly rollup buckets,
+        // so each group normally holds a single point
         const grouped = new Map<string, typeof chartData>()
         chartData.forEach(item => {
           const date = new Date(item.date)
@@ -289,8 +319,7 @@ export function AppAreaChart({
       
       case "7d":
       case "30d": {
-        // Average per day - group 86400 per-second readings into 1-day averages
-        // Takes all per-second data from last 7/30 days and calculates average per day
+        // Average per day - groups the hourly rollup buckets of each day
         const grouped = new Map<string, typeof chartData>()
         chartData.forEach(item => {
           const date = new Date(item.date)
@@ -313,8 +342,7 @@ export function AppAreaChart({
       }
       
       case "12mo": {
-        // Average per month - group all per-second readings into monthly averages
-        // Takes all per-second data from last 12 months and calculates average per month
+        // Average per month - groups the hourly rollup buckets of each month
         const grouped = new Map<string, typeof chartData>()
         chartData.forEach(item => {
           const date = new Date(item.date)
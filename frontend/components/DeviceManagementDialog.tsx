@@ -9,6 +9,13 @@ import { Input } from "@/components/ui/input"
 import { tokenManager } from "@/lib/api"
 import { Loader2, Trash2, UserCircle, Smartphone, Calendar, Search } from "lucide-react"
 import { Alert, AlertDescription } from "@/components/ui/alert"
+import {
+  Select,
+  SelectContent,
+  SelectItem,
+  SelectTrigger,
+  SelectValue,
+} from "@/components/ui/select"
 import {
   AlertDialog,
   AlertDialogAction,
@@ -22,6 +29,12 @@ import {
 
 const API_BASE_URL = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000'
 
+// Devices per page; search and status filters run on the server
+const PAGE_SIZE = 50
+const SEARCH_DEBOUNCE_MS = 300
+
+type StatusFilter = "all" | "paired" | "unpaired" | "online" | "offline"
+
 interface Device {
   id: number
   device_id: string
@@ -29,8 +42,10 @@ interface Device {
   owner_name?: string
   owner_email?: string
   status: string
+  online: boolean
   paired_at?: string
   last_seen?: string
+  last_reading_at?: string | null
 }
 
 interface DeviceManagementDialogProps {
@@ -47,13 +62,27 @@ export function DeviceManagementDialog({ open, onOpenChange }: DeviceManagementD
   const [deleteDeviceDialogOpen, setDeleteDeviceDialogOpen] = useState(false)
   const [deviceToDeletePermanently, setDeviceToDeletePermanently] = useState<Device | null>(null)
   const [searchQuery, setSearchQuery] = useState("")
+  const [statusFilter, setStatusFilter] = useState<StatusFilter>("all")
+  // Keyset cursor of the next page; null when everything is loaded
+  const [nextAfterId, setNextAfterId] = useState<number | null>(null)
+  const [loadingMore, setLoadingMore] = useState(false)
 
-  const fetchDevices = async () => {
-    setLoading(true)
+  // First page, or the page after `afterId` appended to the list
+  const fetchDevices = async (afterId?: number) => {
+    if (afterId === undefined) {
+      setLoading(true)
+    } else {
+      setLoadingMore(true)
+    }
     setError(null)
     try {
       const token = tokenManager.getToken()
-      const response = await fetch(`${API_BASE_URL}/api/devices/all`, {
+      const params = new URLSearchParams({ limit: PAGE_SIZE.toString() })
+      if (statusFilter !== "all") params.append('status', statusFilter)
+      if (searchQuery.trim()) params.append('search', searchQuery.trim())
+      if (afterId !== undefined) params.append('after_id', afterId.toString())
+
+      const response = await fetch(`${API_BASE_URL}/api/devices/all?${params}`, {
         headers: {
           'Authorization': `Bearer ${token}`,
           'Content-Type': 'application/json',
@@ -65,19 +94,23 @@ export function DeviceManagementDialog({ open, onOpenChange }: DeviceManagementD
       }
 
       const data = await response.json()
-      setDevices(data)
+      setDevices((current) => afterId === undefined ? data.devices : [...current, ...data.devices])
+      setNextAfterId(data.next_after_id)
     } catch (err: any) {
       setError(err.message || "Failed to fetch devices")
     } finally {
       setLoading(false)
+      setLoadingMore(false)
     }
   }
 
+  // Reload from the first page when the dialog opens or a filter changes (search debounced)
   useEffect(() => {
-    if (open) {
-      fetchDevices()
-    }
-  }, [open])
+    if (!open) return
+
+    const timeout = setTimeout(() => fetchDevices(), searchQuery ? SEARCH_DEBOUNCE_MS : 0)
+    return () => clearTimeout(timeout)
+  }, [open, statusFilter, searchQuery])
 
   const handleUnpairDevice = async (device: Device) => {
     setDeviceToDelete(device)
@@ -165,15 +198,29 @@ export function DeviceManagementDialog({ open, onOpenChange }: DeviceManagementD
               </Alert>
             )}
 
-            {/* Search Input */}
-            <div className="relative">
-              <Search className="absolute left-3 top-1/2 -translate-y-1/2 h-4 w-4 text-muted-foreground" />
-              <Input
-                placeholder="Search by device ID, owner name, or email..."
-                value={searchQuery}
-                onChange={(e) => setSearchQuery(e.target.value)}
-                className="pl-9"
-              />
+            {/* Search Input and Status Filter */}
+            <div className="flex gap-2">
+              <div className="relative flex-1">
+                <Search className="absolute left-3 top-1/2 -translate-y-1/2 h-4 w-4 text-muted-foreground" />
+                <Input
+                  placeholder="Search by device ID, owner name, or email..."
+                  value={searchQuery}
+                  onChange={(e) => setSearchQuery(e.target.value)}
+                  className="pl-9"
+                />
+              </div>
+              <Select value={statusFilter} onValueChange={(value) => setStatusFilter(value as StatusFilter)}>
+                <SelectTrigger className="w-[140px]">
+                  <SelectValue placeholder="All devices" />
+                </SelectTrigger>
+                <SelectContent>
+                  <SelectItem value="all">All devices</SelectItem>
+                  <SelectItem value="paired">Paired</SelectItem>
+                  <SelectItem value="unpaired">Unpaired</SelectItem>
+                  <SelectItem value="online">Online</SelectItem>
+                  <SelectItem value="offline">Offline</SelectItem>
+                </SelectContent>
+              </Select>
             </div>
 
             {loading ? (
@@ -190,15 +237,6 @@ export function DeviceManagementDialog({ open, onOpenChange }: DeviceManagementD
                 <CardContent className="p-0">
                   <div className="max-h-[60vh] overflow-y-auto">
                     {devices
-                      .filter((device) => {
-                        const query = searchQuery.toLowerCase()
-                        return (
-                          device.device_id.toLowerCase().includes(query) ||
-                          device.owner_name?.toLowerCase().includes(query) ||
-                          device.owner_email?.toLowerCase().includes(query) ||
-                          device.status.toLowerCase().includes(query)
-                        )
-                      })
                       .map((device, index) => (
                         <div
                           key={device.id}
@@ -211,12 +249,20 @@ export function DeviceManagementDialog({ open, onOpenChange }: DeviceManagementD
                                 {device.device_id}
                               </div>
                             </div>
-                            <Badge
-                              variant={device.status === "paired" ? "default" : "secondary"}
-                              className={device.status === "paired" ? "bg-green-600 flex-shrink-0" : "flex-shrink-0"}
-                            >
-                              {device.status}
-                            </Badge>
+                            <div className="flex items-center gap-2 flex-shrink-0">
+                              {device.status === "paired" && (
+                                <Badge variant="outline" className="flex items-center gap-1.5">
+                                  <span className={`h-2 w-2 rounded-full ${device.online ? 'bg-green-500' : 'bg-red-500'}`}></span>
+                                  {device.online ? "online" : "offline"}
+                                </Badge>
+                              )}
+                              <Badge
+                                variant={device.status === "paired" ? "default" : "secondary"}
+                                className={device.status === "paired" ? "bg-green-600" : ""}
+                              >
+                                {device.status}
+                              </Badge>
+                            </div>
                           </div>
 
                           <div className="grid grid-cols-1 md:grid-cols-2 gap-4 mb-4">
@@ -275,6 +321,20 @@ export function DeviceManagementDialog({ open, onOpenChange }: DeviceManagementD
                           </div>
                         </div>
                       ))}
+                    {nextAfterId !== null && (
+                      <div className="border-t p-3">
+                        <Button
+                          variant="ghost"
+                          size="sm"
+                          className="w-full"
+                          disabled={loadingMore}
+                          onClick={() => fetchDevices(nextAfterId)}
+                        >
+                          {loadingMore && <Loader2 className="h-4 w-4 mr-2 animate-spin" />}
+                          Load more
+                        </Button>
+                      </div>
+                    )}
                   </div>
                 </CardContent>
               </Card>
@@ -0,0 +1,120 @@
+"use client"
+
+import * as React from "react"
+import { getLiveStreamUrl, tokenManager, type LiveEvent } from "@/lib/api"
+
+type Listener = (event: LiveEvent) => void
+
+interface SharedStream {
+  socket: WebSocket | null
+  listeners: Set<Listener>
+  retry: ReturnType<typeof setTimeout> | null
+  attempts: number
+  closed: boolean
+  fallback: ReturnType<typeof setInterval> | null
+  lastDataAt: number
+}
+
+// One socket per followed user, shared by every component on the page
+const streams = new Map<string, SharedStream>()
+
+// WebSocket close code the backend uses for a bad token or a forbidden student
+const POLICY_VIOLATION = 1008
+
+// Events are published in the backend process that ingested them. With several
+// uvicorn workers this socket may sit on another worker and never see them, so a
+// stream without metrics/alerts for this long tells listeners to refetch over HTTP
+const FALLBACK_POLL_MS = 5000
+
+function dispatch(stream: SharedStream, event: LiveEvent) {
+  stream.listeners.forEach(listener => listener(event))
+}
+
+function connect(stream: SharedStream, studentId?: number) {
+  const token = tokenManager.getToken()
+  if (!token || stream.closed) return
+
+  const socket = new WebSocket(getLiveStreamUrl(token, studentId ? [studentId] : undefined))
+  stream.socket = socket
+
+  socket.onopen = () => {
+    stream.attempts = 0
+  }
+
+  socket.onmessage = (message) => {
+    let event: LiveEvent
+    try {
+      event = JSON.parse(message.data)
+    } catch {
+      return
+    }
+    if (event.type === "metric" || event.type === "alert") {
+      stream.lastDataAt = Date.now()
+    }
+    dispatch(stream, event)
+  }
+
+  socket.onclose = (event) => {
+    stream.socket = null
+    if (stream.closed || event.code === POLICY_VIOLATION) return
+
+    // Reconnect with backoff: 1s, 2s, 4s ... up to 30s
+    const delay = Math.min(30000, 1000 * 2 ** stream.attempts)
+    stream.attempts += 1
+    stream.retry = setTimeout(() => connect(stream, studentId), delay)
+  }
+}
+
+/**
+ * Subscribe to live metrics and alerts pushed by the backend (/ws/dashboard).
+ * Without studentId the stream carries the current user's own data (student view).
+ * Pass enabled=false to stay disconnected (e.g. admin view with no student selected).
+ *
+ * Listeners should refetch over HTTP on "subscribed" (sent on every (re)connect)
+ * and "resync" (events were dropped, or none arrived for FALLBACK_POLL_MS), since
+ * events in between are not replayed.
+ */
+export function useLiveStream(onEvent: Listener, studentId?: number, enabled: boolean = true) {
+  const handlerRef = React.useRef(onEvent)
+
+  React.useEffect(() => {
+    handlerRef.current = onEvent
+  })
+
+  React.useEffect(() => {
+    if (!enabled) return
+
+    const key = studentId ? `student:${studentId}` : "self"
+    let stream = streams.get(key)
+    if (!stream) {
+      const created: SharedStream = {
+        socket: null, listeners: new Set(), retry: null, attempts: 0, closed: false,
+        fallback: null, lastDataAt: Date.now()
+      }
+      created.fallback = setInterval(() => {
+        if (Date.now() - created.lastDataAt >= FALLBACK_POLL_MS) {
+          created.lastDataAt = Date.now()
+          dispatch(created, { type: "resync" })
+        }
+      }, FALLBACK_POLL_MS)
+      stream = created
+      streams.set(key, stream)
+      connect(stream, studentId)
+    }
+
+    const shared = stream
+    const listener: Listener = (event) => handlerRef.current(event)
+    shared.listeners.add(listener)
+
+    return () => {
+      shared.listeners.delete(listener)
+      if (shared.listeners.size === 0) {
+        shared.closed = true
+        if (shared.retry) clearTimeout(shared.retry)
+        if (shared.fallback) clearInterval(shared.fallback)
+        shared.socket?.close()
+        streams.delete(key)
+      }
+    }
+  }, [studentId, enabled])
+}
@@ -265,16 +265,29 @@ export const tokenManager = {
 
 // Metrics types
 export interface MetricData {
-  id: number;
+  id: number | null; // null for rollup buckets
   heart_rate: number;
   motion_intensity: number;
   prediction: string;
-  anomaly_score: number;
+  anomaly_score: number | null; // null for rollup buckets
   confidence_normal: number;
   confidence_anomaly: number;
   timestamp: string;
+  // Only present on rollup buckets (resolution 1m/15m/1h); values above are bucket averages
+  resolution?: string;
+  sample_count?: number;
+  anomaly_count?: number;
+  heart_rate_min?: number;
+  heart_rate_max?: number;
+  motion_intensity_min?: number;
+  motion_intensity_max?: number;
+  confidence_anomaly_min?: number;
+  confidence_anomaly_max?: number;
 }
 
+// raw rows, a server-side rollup, LTTB downsampling, or let the server pick for the window
+export type HistoryResolution = 'raw' | '1m' | '15m' | '1h' | 'lttb' | 'auto';
+
 // Metrics API functions
 export const metricsApi = {
   // Get latest metrics for current user
@@ -302,12 +315,14 @@ export const metricsApi = {
     token: string,
     startTime?: string,
     endTime?: string,
-    limit?: number
+    limit?: number,
+    resolution?: HistoryResolution
   ): Promise<MetricData[]> {
     const params = new URLSearchParams();
     if (startTime) params.append('start_time', startTime);
     if (endTime) params.append('end_time', endTime);
     if (limit) params.append('limit', limit.toString());
+    if (resolution) params.append('resolution', resolution);
 
     const response = await fetch(`${API_BASE_URL}/metrics/history?${params}`, {
       method: 'GET',
@@ -353,12 +368,14 @@ export const metricsApi = {
     studentId: number,
     startTime?: string,
     endTime?: string,
-    limit?: number
+    limit?: number,
+    resolution?: HistoryResolution
   ): Promise<MetricData[]> {
     const params = new URLSearchParams();
     if (startTime) params.append('start_time', startTime);
     if (endTime) params.append('end_time', endTime);
     if (limit) params.append('limit', limit.toString());
+    if (resolution) params.append('resolution', resolution);
 
     const response = await fetch(`${API_BASE_URL}/metrics/student/${studentId}/history?${params}`, {
       method: 'GET',
@@ -377,4 +394,77 @@ export const metricsApi = {
 
     return response.json();
   },
+
+  // Newest reading, device status and unread alert count of many students in one request (admin only).
+  // Without studentIds: all students, a page at a time (pass next_after_id as afterId)
+  async getFleetSnapshot(token: string, studentIds?: number[], afterId?: number): Promise<FleetSnapshot> {
+    const params = new URLSearchParams();
+    if (studentIds && studentIds.length > 0) params.append('student_ids', studentIds.join(','));
+    if (afterId !== undefined) params.append('after_id', afterId.toString());
+
+    const response = await fetch(`${API_BASE_URL}/metrics/fleet?${params}`, {
+      method: 'GET',
+      headers: {
+        'Authorization': `Bearer ${token}`,
+        'Content-Type': 'application/json',
+      },
+    });
+
+    if (!response.ok) {
+      throw new Error('Failed to fetch fleet snapshot');
+    }
+
+    return response.json();
+  },
 };
+
+// One student in GET /metrics/fleet
+export interface FleetStudent {
+  id: number;
+  full_name: string;
+  student_id: string | null;
+  avatar_url: string | null;
+  device_id: string | null;
+  device_status: 'online' | 'offline' | 'no_device';
+  unread_alerts: number;
+  latest: MetricData | null;
+}
+
+export interface FleetSnapshot {
+  students: FleetStudent[];
+  next_after_id: number | null;
+  online_seconds: number;
+  generated_at: string;
+}
+
+// Alert as returned by /metrics/alerts and pushed on the live stream
+export interface AlertData {
+  id: number;
+  alert_type: string;
+  severity: string;
+  title: string;
+  message: string;
+  heart_rate?: number;
+  motion_intensity?: number;
+  stress_level?: number;
+  anomaly_score?: number;
+  is_read: boolean;
+  created_at: string;
+  read_at?: string | null;
+}
+
+// Messages pushed by the live dashboard stream (WebSocket /ws/dashboard)
+export type LiveEvent =
+  | { type: 'metric'; user_id: number; data: MetricData }
+  | { type: 'alert'; user_id: number; data: AlertData }
+  | { type: 'subscribed'; user_ids: number[] }
+  | { type: 'resync' } // events were dropped; refetch over HTTP
+  | { type: 'ping' }
+  | { type: 'error'; status_code: number; message: string };
+
+// Students get their own stream; admins pass the students they are watching
+export function getLiveStreamUrl(token: string, studentIds?: number[]): string {
+  const params = new URLSearchParams({ token });
+  if (studentIds && studentIds.length > 0) params.append('student_ids', studentIds.join(','));
+  return `${API_BASE_URL.replace(/^http/, 'ws')}/ws/dashboard?${params}`;
+}